@@ -1 +1,2 @@
 from .avito_api import *
+from .avito_client import AvitoClient, AvitoError
@@ -12,7 +12,7 @@ AVITO_SUBS_WEBHOOKS = 'https://api.avito.ru/messenger/v1/subscriptions'
 
 DOMAIN = 'http://185.239.142.177:5019'
 WEBHOOK = f'{DOMAIN}/webhook/v3/avito'
-# TODO нужно реализовать через ООП (написать класс AvitoClient)
+# Синхронные функции — для ручных скриптов; в обработчиках используется AvitoClient (avito_api/avito_client.py)
 def get_avito_token(client_id: str, client_secret: str) -> str:
     """
     Функция для получения токена авито
@@ -0,0 +1,210 @@
+import asyncio
+import time
+from typing import Any, ClassVar, Dict, Optional
+
+import aiohttp
+
+from avito_api.avito_settings import AVITO_INBOX_MAPPING
+from telegram.send_log import send_dev_telegram_log
+from utils.http_retry import RETRY_STATUSES, raise_for_status, request_with_retries
+
+AVITO_API_URL = "https://api.avito.ru"
+
+
+class AvitoError(Exception):
+    """Исключение клиента Avito API."""
+
+
+class AvitoClient:
+    """
+    Асинхронный клиент Avito API для одного источника (inbox) Chatwoot.
+    Один экземпляр, одна пуловая aiohttp-сессия и один OAuth-токен на inbox — см. for_inbox().
+    Токен обновляется заранее, за TOKEN_REFRESH_MARGIN секунд до истечения, в фоне;
+    параллельные запросы ждут одно и то же обновление, а не получают каждый свой токен.
+    """
+    TOKEN_REFRESH_MARGIN = 600
+    # если Avito не вернул expires_in
+    TOKEN_DEFAULT_TTL = 3600
+    MAX_RETRIES = 3
+    RETRY_BASE_DELAY = 1.0
+    RETRY_STATUSES = RETRY_STATUSES
+
+    _clients: ClassVar[Dict[int, "AvitoClient"]] = {}
+
+    def __init__(self, client_id: str, client_secret: str, timeout: float = 30.0, session: Optional[aiohttp.ClientSession] = None) -> None:
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.timeout = timeout
+
+        self._session = session
+        self._own_session = session is None
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def for_inbox(cls, inbox_id: int) -> "AvitoClient":
+        """Общий клиент источника Chatwoot; ValueError, если inbox не привязан к Avito"""
+        client = cls._clients.get(inbox_id)
+        if client is None:
+            settings = AVITO_INBOX_MAPPING.get(inbox_id)
+            if not settings:
+                raise ValueError(f"Inbox {inbox_id} не привязан к Avito")
+            client = cls._clients[inbox_id] = cls(settings["client_id"], settings["client_secret"])
+        return client
+
+    @classmethod
+    async def close_all(cls) -> None:
+        for client in cls._clients.values():
+            await client.aclose()
+
+    async def __aenter__(self) -> "AvitoClient":
+        if self._session is None or self._session.closed:
+            timeout = aiohttp.ClientTimeout(total=self.timeout)
+            self._session = aiohttp.ClientSession(base_url=AVITO_API_URL, timeout=timeout)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        if self._refresh_task is not None and not self._refresh_task.done():
+            self._refresh_task.cancel()
+        if self._own_session and self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _fetch_token(self) -> str:
+        """POST /token/ (client_credentials)"""
+        if self._session is None or self._session.closed:
+            await self.__aenter__()
+        data = {
+            "grant_type": "client_credentials",
+            "client_id": self.client_id,
+            "client_secret": self.client_secret,
+        }
+        try:
+            async with self._session.post("/token/", data=data) as resp:
+                if resp.status != 200:
+                    body = await resp.text()
+                    raise AvitoError(f"[Avito] HTTP {resp.status} при получении токена. Body: {body[:500]}")
+                payload = await resp.json(content_type=None)
+        except asyncio.TimeoutError as e:
+            raise AvitoError("[Avito] таймаут при получении токена") from e
+        except aiohttp.ClientError as e:
+            raise AvitoError(f"[Avito] Ошибка при получении токена: {e!r}") from e
+        token = payload.get("access_token")
+        if not token:
+            raise AvitoError(f"[Avito] В ответе нет access_token: {payload}")
+        self._token = token
+        self._expires_at = time.monotonic() + float(payload.get("expires_in") or self.TOKEN_DEFAULT_TTL)
+        return token
+
+    def _refresh(self) -> asyncio.Task:
+        """Запускает (или возвращает уже идущее) обновление токена"""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._fetch_token())
+            self._refresh_task.add_done_callback(self._log_refresh_error)
+        return self._refresh_task
+
+    @staticmethod
+    def _log_refresh_error(task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            asyncio.create_task(send_dev_telegram_log(f'[AvitoClient]\nНе удалось обновить токен\nerror: {task.exception()}', 'ERROR'))
+
+    async def get_token(self) -> str:
+        """Действующий токен; в сеть — только когда токена нет или он истёк"""
+        now = time.monotonic()
+        if self._token and now < self._expires_at:
+            if now >= self._expires_at - self.TOKEN_REFRESH_MARGIN:
+                # скоро истечёт — обновляем в фоне, текущий ещё годен
+                self._refresh()
+            return self._token
+        return await asyncio.shield(self._refresh())
+
+    async def _request(
+        self,
+        method: str,
+        path: str,
+        params: Optional[Dict[str, Any]] = None,
+        json: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Запрос к Avito API: повтор на 429/5xx и ошибках соединения (см. request_with_retries),
+        на 401 — один повтор с новым токеном. Ошибки сети и таймауты — AvitoError.
+        """
+        if self._session is None or self._session.closed:
+            # поддержка прямого вызова без контекст-менеджера
+            await self.__aenter__()
+
+        reauthorized = False
+
+        async def _attempt() -> Dict[str, Any]:
+            nonlocal reauthorized
+            while True:
+                token = await self.get_token()
+                headers = {"Authorization": f"Bearer {token}"}
+                async with self._session.request(method, path, params=params, json=json, headers=headers) as resp:
+                    if resp.status == 401 and not reauthorized:
+                        # токен отозван раньше срока — один повтор с новым, попыткой не считается
+                        reauthorized = True
+                        if self._token == token:
+                            self._token = None
+                        continue
+                    await raise_for_status(resp)
+                    return await resp.json(content_type=None) or {}
+
+        return await request_with_retries(
+            _attempt,
+            AvitoError,
+            f"[Avito] {method} {path}",
+            max_retries=self.MAX_RETRIES,
+            base_delay=self.RETRY_BASE_DELAY,
+            retry_statuses=self.RETRY_STATUSES,
+        )
+
+    async def subscribe(self, webhook_url: str) -> Dict[str, Any]:
+        """POST /messenger/v3/webhook"""
+        return await self._request("POST", "/messenger/v3/webhook", json={"url": webhook_url})
+
+    async def unsubscribe(self, webhook_url: str) -> Dict[str, Any]:
+        """POST /messenger/v1/webhook/unsubscribe"""
+        return await self._request("POST", "/messenger/v1/webhook/unsubscribe", json={"url": webhook_url})
+
+    async def get_subscriptions(self) -> Dict[str, Any]:
+        """POST /messenger/v1/subscriptions"""
+        return await self._request("POST", "/messenger/v1/subscriptions")
+
+    async def send_message(self, user_id: str, chat_id: str, text: str) -> Dict[str, Any]:
+        """Отправляет текстовое сообщение в чат Avito"""
+        payload = {"type": "text", "message": {"text": text}}
+        return await self._request("POST", f"/messenger/v1/accounts/{user_id}/chats/{chat_id}/messages", json=payload)
+
+    async def get_chats(self, user_id: str, limit: int = 20, offset: int = 0) -> Dict[str, Any]:
+        """Список чатов пользователя Avito"""
+        return await self._request("GET", f"/messenger/v2/accounts/{user_id}/chats", params={"limit": limit, "offset": offset})
+
+    async def get_chat_info(self, user_id: str, chat_id: str) -> Dict[str, Any]:
+        """Информация о чате Avito"""
+        return await self._request("GET", f"/messenger/v2/accounts/{user_id}/chats/{chat_id}")
+
+    async def get_chat_partner_id(self, user_id, chat_id):
+        """ID собеседника в чате (не нашего пользователя)"""
+        chat = await self.get_chat_info(user_id, chat_id)
+        for user in chat.get("users", []):
+            if user.get("id") != user_id:
+                return user.get("id")
+        return None
+
+    async def get_last_message(self, user_id, chat_id) -> str:
+        """Текст последнего сообщения в диалоге"""
+        chat = await self.get_chat_info(user_id, chat_id)
+        return chat.get("last_message", {}).get("content", {}).get("text", "")
+
+    async def get_item_info(self, user_id: int, item_id: int) -> Dict[str, Any]:
+        """Информация об объявлении"""
+        return await self._request("GET", f"/core/v1/accounts/{user_id}/items/{item_id}/")
+
+    async def get_item_url(self, user_id: int, item_id: int) -> Optional[str]:
+        """Публичная ссылка на объявление или None"""
+        return (await self.get_item_info(user_id, item_id)).get("url")
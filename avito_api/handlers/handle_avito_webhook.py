@@ -2,7 +2,7 @@ import traceback
 
 from aiohttp import web
 
-from avito_api import get_chat_partner_id, get_inbox_token, get_avito_item_url
+from avito_api import AvitoClient, AvitoError
 from avito_api.utils.parse_avito_item import parse_avito_ad
 from chatwoot_api.chatwoot_client import ChatwootClient, ChatwootError
 from telegram.send_log import send_dev_telegram_log
@@ -12,7 +12,7 @@ async def handle_avito_webhook(request):
     """Обработчик вебхука Авито"""
     try:
         inbox_id = int(request.match_info.get('inbox_id'))
-        avito_token = get_inbox_token(inbox_id)
+        avito = AvitoClient.for_inbox(inbox_id)
     except (TypeError, ValueError):
         return web.json_response({"error": "Invalid inbox_id"}, status=400)
 
@@ -29,7 +29,11 @@ async def handle_avito_webhook(request):
         message_type = 0
         if author_id == user_id:
             message_type = 1
-            author_id = get_chat_partner_id(avito_token, user_id, chat_id)
+            try:
+                author_id = await avito.get_chat_partner_id(user_id, chat_id)
+            except AvitoError as e:
+                await send_dev_telegram_log(f'[handle_avito_webhook]\nНе удалось получить собеседника чата {chat_id}\nerror: {e}', 'ERROR')
+                return web.json_response({"error": "Ошибка Avito API"}, status=502)
 
         try:
             async with ChatwootClient() as cw:
@@ -38,7 +42,7 @@ async def handle_avito_webhook(request):
                 conversation_id, created = await cw.get_or_create_conversation(chatwoot_contact_id, inbox_id, source_id)
                 if created:
                     # получаем ссылку на объявление
-                    # item_url = get_avito_item_url(avito_token, user_id, item_id)
+                    # item_url = await avito.get_item_url(user_id, item_id)
                     # item_info = await parse_avito_ad(item_url) # TODO доработать парсинг инфы про объявление
                     ...
 
@@ -0,0 +1,111 @@
+"""
+Бенчмарк движков транскрибации: OpenAI (gpt-4o-transcribe) против локального faster-whisper.
+Каталог с записями: рядом с каждым аудио — эталонная расшифровка с тем же именем и расширением .txt.
+Считает WER по каждому движку и пропускную способность (секунд аудио на секунду работы).
+Запуск: python bench_stt_engines.py ./stt_samples [--concurrency 4]
+"""
+import argparse
+import asyncio
+import re
+import subprocess
+import time
+from pathlib import Path
+
+from imageio_ffmpeg import get_ffmpeg_exe
+
+from openai_agents.llm_scheduler import LLMPriority
+from openai_agents.stt_engines import OpenAISTTEngine, FasterWhisperEngine
+from bx24.bx_utils.parse_call_info import _extract_transcription_text
+
+AUDIO_EXTENSIONS = (".ogg", ".oga", ".opus", ".mp3", ".m4a", ".wav", ".webm")
+
+
+def normalize_words(text: str) -> list[str]:
+    text = text.lower().replace("ё", "е")
+    return re.findall(r"\w+", text)
+
+
+def word_errors(reference: str, hypothesis: str) -> tuple[int, int]:
+    """(правки Левенштейна по словам, слов в эталоне)"""
+    ref, hyp = normalize_words(reference), normalize_words(hypothesis)
+    prev = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        cur = [i] + [0] * len(hyp)
+        for j, h in enumerate(hyp, 1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (r != h))
+        prev = cur
+    return prev[-1], len(ref)
+
+
+def audio_duration(path: Path) -> float:
+    """Длительность через декодирование в PCM 16 кГц моно"""
+    pcm = subprocess.run(
+        [get_ffmpeg_exe(), "-v", "error", "-i", str(path), "-ac", "1", "-ar", "16000", "-f", "s16le", "pipe:1"],
+        capture_output=True, check=True,
+    ).stdout
+    return len(pcm) / 32000
+
+
+async def run_engine(engine, samples: list[tuple[Path, str, float]], concurrency: int) -> dict:
+    sem = asyncio.Semaphore(concurrency)
+    errors = words = 0
+    failed = 0
+
+    async def _one(path: Path, reference: str):
+        nonlocal errors, words, failed
+        async with sem:
+            try:
+                transcript = await engine.transcribe((path.name, path.read_bytes()), "ru", LLMPriority.BACKGROUND)
+            except Exception as e:
+                print(f"  {engine.name}: {path.name}: {e}")
+                failed += 1
+                return
+        e, n = word_errors(reference, _extract_transcription_text(transcript) or "")
+        errors += e
+        words += n
+
+    started = time.perf_counter()
+    await asyncio.gather(*(_one(path, ref) for path, ref, _ in samples))
+    elapsed = time.perf_counter() - started
+    audio_total = sum(d for _, _, d in samples)
+    return {
+        "wer": errors / words if words else 0.0,
+        "elapsed": elapsed,
+        "speed": audio_total / elapsed if elapsed else 0.0,
+        "failed": failed,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("samples_dir")
+    parser.add_argument("--concurrency", type=int, default=1)
+    args = parser.parse_args()
+
+    samples = []
+    for path in sorted(Path(args.samples_dir).iterdir()):
+        ref = path.with_suffix(".txt")
+        if path.suffix.lower() in AUDIO_EXTENSIONS and ref.exists():
+            samples.append((path, ref.read_text(encoding="utf-8"), audio_duration(path)))
+    if not samples:
+        print("Нет записей с эталонными .txt")
+        return
+    print(f"записей: {len(samples)}, аудио: {sum(d for _, _, d in samples):.0f} с, параллельно: {args.concurrency}")
+
+    engines = [OpenAISTTEngine()]
+    if FasterWhisperEngine.is_available():
+        engines.append(FasterWhisperEngine())
+    else:
+        print("faster-whisper не установлен — локальный движок пропущен")
+
+    print(f"{'engine':>8} {'WER, %':>8} {'time, s':>9} {'x realtime':>11} {'failed':>7}")
+    for engine in engines:
+        if isinstance(engine, FasterWhisperEngine):
+            # загрузка модели — разовая на процесс, в замер не входит
+            await asyncio.to_thread(engine._get_model, engine.model_size)
+        res = await run_engine(engine, samples, args.concurrency)
+        print(f"{engine.name:>8} {res['wer'] * 100:>8.1f} {res['elapsed']:>9.1f} {res['speed']:>11.1f} {res['failed']:>7}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,69 @@
+"""
+Бенчмарк чтения xlsx: старая схема (pandas + второй проход openpyxl) против однопроходного iter_xlsx_sheets.
+Запуск: python bench_xlsx_reader.py
+"""
+import io
+import time
+import tracemalloc
+
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+from openpyxl.comments import Comment
+
+from utils.xlsx_reader import iter_xlsx_sheets
+
+SIZES = [(100, 10), (1_000, 20), (10_000, 20), (50_000, 30)]
+MAX_ROWS = 500
+
+
+def make_workbook(rows: int, cols: int) -> bytes:
+    wb = Workbook()
+    ws = wb.active
+    ws.append([f"col_{c}" for c in range(cols)])
+    for r in range(2, rows + 2):
+        ws.append([f"=A{r}*2" if c == cols - 1 else r * c for c in range(cols)])
+        if r % 50 == 0:
+            ws.cell(row=r, column=1).comment = Comment(f"комментарий {r}", "bench")
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+def read_legacy(data: bytes) -> None:
+    xls = pd.ExcelFile(io.BytesIO(data), engine="openpyxl")
+    xls.parse(sheet_name=xls.sheet_names[0], dtype=str, nrows=MAX_ROWS)
+    ws = load_workbook(io.BytesIO(data), data_only=False, read_only=True).worksheets[0]
+    for row in ws.iter_rows(max_row=MAX_ROWS):
+        for c in row:
+            _ = c.value
+    for row in ws.iter_rows(max_row=MAX_ROWS):
+        for c in row:
+            _ = getattr(c, "comment", None)
+
+
+def read_single_pass(data: bytes) -> None:
+    for _ in iter_xlsx_sheets(data, max_rows=MAX_ROWS + 1):
+        pass
+
+
+def measure(fn, data: bytes) -> tuple[float, float]:
+    tracemalloc.start()
+    started = time.perf_counter()
+    fn(data)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1024**2
+
+
+def main():
+    print(f"{'rows x cols':>12} {'size, KB':>9} {'legacy, s':>10} {'legacy, MB':>11} {'single, s':>10} {'single, MB':>11}")
+    for rows, cols in SIZES:
+        data = make_workbook(rows, cols)
+        legacy_t, legacy_m = measure(read_legacy, data)
+        single_t, single_m = measure(read_single_pass, data)
+        print(f"{rows:>7} x {cols:<3} {len(data) // 1024:>9} {legacy_t:>10.3f} {legacy_m:>11.1f} {single_t:>10.3f} {single_m:>11.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -152,10 +152,12 @@ def _do_rest_batch(bx_token,
                    *,
                    timeout: Optional[int],
                    chunk_size: int,
-                   build_query: callable) -> BatchResultDict:
+                   build_query: callable,
+                   halt: int = 1) -> BatchResultDict:
     """
     Выполняет REST-батчи через bx_token.call_api_method('batch', ...), разбивая по chunk_size (<=50).
     Возвращает BatchResultDict совместимый с _unwrap_batch_res().
+    halt=1 — остановка на первой ошибке, halt=0 — ошибки складываются в результат, выполнение продолжается.
     """
     assert 1 <= chunk_size <= 50
     br = BatchResultDict()
@@ -173,7 +175,7 @@ def _do_rest_batch(bx_token,
 
         batch = bx_token.call_api_method(
             'batch',
-            params={'halt': 1, 'cmd': cmd_payload},
+            params={'halt': halt, 'cmd': cmd_payload},
             timeout=timeout
         )
 
@@ -200,7 +202,11 @@ def _do_rest_batch(bx_token,
                 br[str(idx_global)] = {'result': ok_map[key]}
             elif key in err_keys:
                 br[str(idx_global)] = {'error': err_map[key]}
-                return br  # halt=1
+                if halt:
+                    return br
+            elif not halt:
+                # при halt=0 Битрикс не возвращает команды, упавшие на подстановке $result
+                br[str(idx_global)] = {'error': {'message': 'no result for batch slot', 'debug': {'expected_key': key}}}
             else:
                 br[str(idx_global)] = {
                     'error': {
@@ -218,6 +224,47 @@ def _do_rest_batch(bx_token,
     return br
 
 
+def _resolve_build_query(bx_token) -> callable:
+    """
+    Нужна функция сборки query-строки. Берём из используемого вами модуля api_call.
+    Если у токена нет такого атрибута, попробуем импортировать из bx24.bx_utils.bitrix_api_call.
+    """
+    build_query = getattr(bx_token, 'convert_params', None)
+    if build_query is None:
+        try:
+            from bx24.bx_utils.bitrix_api_call import convert_params as _convert_params
+            build_query = _convert_params
+        except Exception:
+            raise RuntimeError('Не найдена функция convert_params. Экспортируйте convert_params в токен или модуль.')
+    return build_query
+
+
+def batch_api_call(bx_token,
+                   methods: Union[Dict[str, Tuple[str, Optional[dict]]], Sequence[Tuple[str, Optional[dict]]]],
+                   timeout: Optional[int] = 120,
+                   chunk_size: int = 50,
+                   halt: int = 0,
+                   log_prefix: str = '') -> BatchResultDict:
+    """
+    Произвольный набор вызовов через REST batch.
+    methods — {имя: (метод, параметры)} или список (метод, параметры); во втором случае имена — "0", "1", ...
+    Возвращает BatchResultDict {имя: {"result": ...} | {"error": ...}} в исходном порядке.
+    """
+    if isinstance(methods, dict):
+        names = [str(k) for k in methods.keys()]
+        calls = list(methods.values())
+    else:
+        calls = list(methods)
+        names = [str(i) for i in range(len(calls))]
+
+    raw = _do_rest_batch(bx_token, calls, timeout=timeout, chunk_size=chunk_size,
+                         build_query=_resolve_build_query(bx_token), halt=halt)
+    result = BatchResultDict()
+    for idx, part in raw.items():
+        result[names[int(idx)]] = part
+    return result
+
+
 def call_list_method(
         bx_token,
         method: str,
@@ -242,15 +289,7 @@ def call_list_method(
     if force_total:
         limit = force_total
 
-    # Нужна функция сборки query-строки. Берём из используемого вами модуля api_call.
-    # Если у токена нет такого атрибута, попробуем импортировать из bx24.bx_utils.bitrix_api_call.
-    build_query = getattr(bx_token, 'convert_params', None)
-    if build_query is None:
-        try:
-            from bx24.bx_utils.bitrix_api_call import convert_params as _convert_params
-            build_query = _convert_params
-        except Exception:
-            raise RuntimeError('Не найдена функция convert_params. Экспортируйте convert_params в токен или модуль.')
+    build_query = _resolve_build_query(bx_token)
 
     fields = _check_params(method, fields)
 
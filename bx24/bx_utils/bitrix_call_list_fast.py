@@ -0,0 +1,225 @@
+import asyncio
+from copy import deepcopy
+from typing import Optional, Any, Dict, List, Iterator, AsyncIterator, Tuple
+
+from bx24.bx_utils.bitrix_api_call import RawStringParam
+from bx24.bx_utils.bitrix_call_list import METHOD_WRAPPERS, _build_batch_cmd, _resolve_build_query
+from bx24.bx_utils.exceptions import CallListException
+from bx24.bx_utils.portal_rate_limiter import get_portal_limiter
+
+PAGE_SIZE = 50
+
+# поле идентификатора для keyset-пагинации (по умолчанию 'ID')
+METHOD_TO_ID: Dict[str, str] = {
+    'crm.item.list': 'id',
+    'crm.item.productrow.list': 'id',
+    'crm.stagehistory.list': 'ID',
+    'tasks.task.list': 'ID',
+    'catalog.product.list': 'id',
+    'catalog.product.offer.list': 'id',
+    'catalog.storeproduct.list': 'id',
+    'catalog.section.list': 'id',
+    'sale.order.list': 'id',
+    'sale.basketItem.list': 'id',
+    'sale.propertyvalue.list': 'id',
+    'rpa.item.list': 'id',
+}
+
+
+def _id_key(method: str) -> str:
+    return METHOD_TO_ID.get(method, 'ID')
+
+
+def _page_items(method: str, payload: Any) -> list:
+    wrapper = METHOD_WRAPPERS.get(method)
+    if wrapper and isinstance(payload, dict):
+        return payload.get(wrapper) or []
+    return payload or []
+
+
+def _prepare_params(method: str, params: Optional[dict], descending: bool) -> Tuple[dict, Optional[Any]]:
+    """
+    Готовит базовые параметры: сортировка только по ID, start=-1 (без COUNT(*)).
+    Пользовательская граница >ID/<ID из фильтра вынимается и становится начальным курсором.
+    """
+    id_key = _id_key(method)
+    params = deepcopy(params or {})
+    params['order'] = {id_key: 'DESC' if descending else 'ASC'}
+    params['start'] = -1
+
+    flt = dict(params.get('filter') or {})
+    cursor = flt.pop(f"{'<' if descending else '>'}{id_key}", None)
+    params['filter'] = flt
+    select = params.get('select')
+    if select and '*' not in select and id_key not in select:
+        params['select'] = list(select) + [id_key]
+    return params, cursor
+
+
+def _chain_cmds(method: str, params: dict, cursor: Optional[Any], descending: bool,
+                n: int, upper: Optional[Any] = None) -> List[Tuple[str, dict]]:
+    """
+    n команд батча, где каждая следующая берёт курсор из последнего элемента предыдущей
+    через подстановку $result[cK][49][ID] — Битрикс разворачивает её на своей стороне.
+    upper — верхняя граница диапазона (<ID) для параллельного обхода по возрастанию.
+    """
+    id_key = _id_key(method)
+    op = '<' if descending else '>'
+    wrapper = METHOD_WRAPPERS.get(method)
+    cmds = []
+    for i in range(n):
+        p = deepcopy(params)
+        flt = p['filter']
+        if i == 0:
+            if cursor is not None:
+                flt[f'{op}{id_key}'] = cursor
+        else:
+            path = f'[{wrapper}]' if wrapper else ''
+            flt[f'{op}{id_key}'] = RawStringParam(f'$result[c{i - 1}]{path}[{PAGE_SIZE - 1}][{id_key}]')
+        if upper is not None:
+            flt[f'<{id_key}'] = upper
+        cmds.append((method, p))
+    return cmds
+
+
+def _run_chain(bx_token, method: str, cmds: List[Tuple[str, dict]], build_query, timeout: Optional[int]) -> Tuple[List[list], bool]:
+    """
+    Выполняет цепочку одним батчем (halt=0). Возвращает страницы до первой неполной
+    и признак того, что данные закончились.
+    """
+    payload = {f'c{i}': _build_batch_cmd(m, p, build_query) for i, (m, p) in enumerate(cmds)}
+    batch = bx_token.call_api_method('batch', params={'halt': 0, 'cmd': payload}, timeout=timeout)
+    root = (batch or {}).get('result') or {}
+    ok_map = root.get('result') or {}
+    err_map = root.get('result_error') or {}
+
+    pages = []
+    for i in range(len(cmds)):
+        key = f'c{i}'
+        if isinstance(ok_map, dict) and key in ok_map:
+            items = _page_items(method, ok_map[key])
+            if items:
+                pages.append(items)
+            if len(items) < PAGE_SIZE:
+                return pages, True
+            continue
+        if isinstance(err_map, dict) and key in err_map:
+            raise CallListException(err_map[key])
+        # подстановка $result не сработала — предыдущая страница была последней
+        return pages, True
+    return pages, False
+
+
+def call_list_fast(
+        bx_token,
+        method: str,
+        params: Optional[dict] = None,
+        descending: bool = False,
+        timeout: Optional[int] = 120,
+        log_prefix: str = '',
+        limit: Optional[int] = None,
+        batch_size: int = 50,
+) -> Iterator[Any]:
+    """
+    Списочный запрос с start=-1 и keyset-пагинацией по >ID (или <ID при descending).
+    Битрикс не считает COUNT(*), поэтому время не растёт со смещением — подходит для сотен тысяч записей.
+    Каждый батч — цепочка из batch_size страниц, связанных подстановкой $result.
+    Отдаёт элементы по мере получения. Сортировка, переданная в params, игнорируется (только по ID).
+    """
+    assert 1 <= batch_size <= 50, 'check: 1 <= batch_size <= 50'
+    build_query = _resolve_build_query(bx_token)
+    base, cursor = _prepare_params(method, params, descending)
+    id_key = _id_key(method)
+    yielded = 0
+
+    while True:
+        cmds = _chain_cmds(method, base, cursor, descending, batch_size)
+        pages, finished = _run_chain(bx_token, method, cmds, build_query, timeout)
+        for page in pages:
+            for item in page:
+                yield item
+                yielded += 1
+                if limit is not None and yielded >= limit:
+                    return
+        if finished or not pages:
+            return
+        cursor = pages[-1][-1][id_key]
+
+
+async def _edge_id(bx_token, method: str, base: dict, descending: bool, timeout: Optional[int]) -> Optional[int]:
+    """Первый ID в заданном направлении (минимальный или максимальный)"""
+    id_key = _id_key(method)
+    p = deepcopy(base)
+    p['order'] = {id_key: 'DESC' if descending else 'ASC'}
+    p['select'] = [id_key]
+    resp = await asyncio.to_thread(bx_token.call_api_method, method, p, timeout)
+    items = _page_items(method, resp.get('result'))
+    return int(items[0][id_key]) if items else None
+
+
+async def iter_list_pages(
+        bx_token,
+        method: str,
+        params: Optional[dict] = None,
+        timeout: Optional[int] = 120,
+        parallel: int = 4,
+        batch_size: int = 10,
+) -> AsyncIterator[list]:
+    """
+    Асинхронный вариант call_list_fast: отдаёт страницы (списки элементов) по мере прихода.
+    Диапазон ID [min, max] делится на parallel отрезков, каждый обходится своей keyset-цепочкой,
+    так что одновременно в полёте до parallel батчей. Каждый батч проходит через общий
+    лимитер портала. Порядок страниц между отрезками не гарантирован.
+    """
+    assert 1 <= batch_size <= 50, 'check: 1 <= batch_size <= 50'
+    build_query = _resolve_build_query(bx_token)
+    base, cursor = _prepare_params(method, params, descending=False)
+    id_key = _id_key(method)
+    limiter = get_portal_limiter(bx_token.domain)
+
+    if cursor is not None:
+        base['filter'][f'>{id_key}'] = cursor
+    await limiter.acquire()
+    lo = await _edge_id(bx_token, method, base, False, timeout)
+    if lo is None:
+        return
+    await limiter.acquire()
+    hi = await _edge_id(bx_token, method, base, True, timeout)
+    base['filter'].pop(f'>{id_key}', None)
+
+    step = max(1, (hi - lo + 1) // max(1, parallel) + 1)
+    bounds = [(start - 1, min(start + step, hi + 1)) for start in range(lo, hi + 1, step)]
+
+    queue: asyncio.Queue = asyncio.Queue(maxsize=parallel * batch_size)
+    done = object()
+
+    async def walk(after: int, upper: int):
+        try:
+            cur = after
+            while True:
+                cmds = _chain_cmds(method, base, cur, False, batch_size, upper=upper)
+                await limiter.acquire()
+                pages, finished = await asyncio.to_thread(_run_chain, bx_token, method, cmds, build_query, timeout)
+                for page in pages:
+                    await queue.put(page)
+                if finished or not pages:
+                    break
+                cur = pages[-1][-1][id_key]
+            await queue.put(done)
+        except Exception as e:
+            await queue.put(e)
+
+    tasks = [asyncio.create_task(walk(a, b)) for a, b in bounds]
+    remaining = len(tasks)
+    try:
+        while remaining:
+            item = await queue.get()
+            if item is done:
+                remaining -= 1
+            elif isinstance(item, Exception):
+                raise item
+            else:
+                yield item
+    finally:
+        for t in tasks:
+            t.cancel()
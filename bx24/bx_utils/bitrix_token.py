@@ -1,7 +1,8 @@
-from typing import Optional, Iterable, Any
+from typing import Optional, Iterable, Any, AsyncIterator
 
 from bx24.bx_utils.bitrix_api_call_v2 import api_call
-from bx24.bx_utils.bitrix_call_list import call_list_method
+from bx24.bx_utils.bitrix_call_list import call_list_method, batch_api_call
+from bx24.bx_utils.bitrix_call_list_fast import call_list_fast, iter_list_pages
 from bx24.bx_utils.exceptions import BitrixApiError, ExpiredToken
 
 
@@ -45,9 +46,9 @@ class BaseBitrixToken:
     call_api_method_v2 = call_api_method
 
     def batch_api_call(self, methods, timeout=DEFAULT_TIMEOUT, chunk_size=50, halt=0, log_prefix=''):
-        """:rtype: bitrix_utils.bitrix_auth.functions.batch_api_call3.BatchResultDict
+        """:rtype: bx24.bx_utils.bitrix_call_list.BatchResultDict
         """
-        ...
+        return batch_api_call(self, methods, timeout=timeout, chunk_size=chunk_size, halt=halt, log_prefix=log_prefix)
 
     batch_api_call_v3 = batch_api_call
 
@@ -63,12 +64,32 @@ class BaseBitrixToken:
     ):
         # type: (...) -> Iterable[Any]
         """Списочный запрос с параметром ?start=-1
-        см. описание bitrix_utils.bitrix_auth.functions.call_list_fast.call_list_fast
+        см. описание bx24.bx_utils.bitrix_call_list_fast.call_list_fast
 
-        Если происходит KeyError, надо добавить описание метода
-        в справочники METHOD_TO_* в bitrix_utils.bitrix_auth.functions.call_list_fast
+        Если у метода поле идентификатора не 'ID', надо добавить описание метода
+        в справочник METHOD_TO_ID в bx24.bx_utils.bitrix_call_list_fast
         """
-        ...
+        return call_list_fast(
+            self,
+            method,
+            params=params,
+            descending=descending,
+            timeout=timeout,
+            log_prefix=log_prefix,
+            limit=limit,
+            batch_size=batch_size,
+        )
+
+    def iter_list_pages(
+            self,
+            method: str,
+            params: Optional[dict] = None,
+            timeout: int = DEFAULT_TIMEOUT,
+            parallel: int = 4,
+            batch_size: int = 10,
+    ) -> AsyncIterator[list]:
+        """Асинхронный обход списка страницами, см. bx24.bx_utils.bitrix_call_list_fast.iter_list_pages"""
+        return iter_list_pages(self, method, params=params, timeout=timeout, parallel=parallel, batch_size=batch_size)
 
     def call_list_method(
             self,
@@ -0,0 +1,53 @@
+import asyncio
+import time
+from typing import Dict
+
+# Лимиты REST Bitrix24 (leaky bucket): ~2 запроса в секунду на портал, «запас» до 50 запросов
+PORTAL_RPS = 2.0
+PORTAL_BURST = 50
+
+
+class PortalRateLimiter:
+    """
+    Token bucket для одного портала Bitrix24.
+    Общий для всех корутин процесса, чтобы параллельные выгрузки не ловили 429 (QUERY_LIMIT_EXCEEDED).
+    """
+
+    def __init__(self, rps: float = PORTAL_RPS, burst: int = PORTAL_BURST):
+        self.rps = rps
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rps)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        """Ждёт, пока в ведре появится токен, и забирает его"""
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rps)
+                self._refill()
+            self._tokens -= 1
+
+    def has_token(self) -> bool:
+        """Есть ли токен прямо сейчас (не забирает его); False — ведро пусто или его уже ждут"""
+        if self._lock.locked():
+            return False
+        self._refill()
+        return self._tokens >= 1
+
+
+_limiters: Dict[str, PortalRateLimiter] = {}
+
+
+def get_portal_limiter(domain: str) -> PortalRateLimiter:
+    """Один лимитер на домен портала"""
+    limiter = _limiters.get(domain)
+    if limiter is None:
+        limiter = _limiters[domain] = PortalRateLimiter()
+    return limiter
@@ -7,7 +7,7 @@ FORESTVOLOGDA_DOMAIN = 'forestvologda.bitrix24.ru'
 
 but = BitrixToken(domain=FORESTVOLOGDA_DOMAIN, web_hook_auth=FORESTVOLOGDA_WEBHOOK_TOKEN)
 
-deals = but.call_list_method('crm.deal.list', {'filter': {'>DATE_MODIFY': '2025-08-21T16:00:00'}, 'select': ['ID', 'TITLE', 'DATE_MODIFY']})
+deals = but.call_list_fast('crm.deal.list', {'filter': {'>DATE_MODIFY': '2025-08-21T16:00:00'}, 'select': ['ID', 'TITLE', 'DATE_MODIFY']})
 
 deals_id = [deal.get('ID') for deal in deals]
 deals_id_vea = []
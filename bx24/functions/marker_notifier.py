@@ -0,0 +1,97 @@
+import asyncio
+import time
+from typing import Optional
+
+from settings import MARKER_NOTIFY_COOLDOWN
+from telegram.send_log import send_dev_telegram_log
+
+
+class MarkerNotifier:
+    """
+    Фоновая отправка уведомлений ответственным в Bitrix о найденных маркерах.
+    send_message только ставит событие в очередь и не ждёт Bitrix.
+    По одному диалогу уведомление не дублируется, пока предыдущее в очереди/в работе
+    и в течение cooldown секунд после отправки.
+    """
+
+    def __init__(self, cooldown: float = MARKER_NOTIFY_COOLDOWN):
+        self.cooldown = cooldown
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._pending: set[int] = set()
+        self._last_sent: dict[int, float] = {}
+
+    def emit(self, conversation_id: int, marker: str) -> bool:
+        """
+        Ставит уведомление в очередь. Возвращает False, если оно отброшено как дубль.
+        """
+        conversation_id = int(conversation_id)
+        now = time.monotonic()
+        if conversation_id in self._pending:
+            return False
+        last = self._last_sent.get(conversation_id)
+        if last is not None and now - last < self.cooldown:
+            return False
+
+        self._ensure_worker()
+        self._pending.add(conversation_id)
+        self._queue.put_nowait((conversation_id, marker))
+        return True
+
+    def _ensure_worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._worker is not None and not self._worker.done() and self._worker.get_loop() is loop:
+            return
+        if self._queue is None or self._worker is None or self._worker.get_loop() is not loop:
+            # очередь создаётся вместе с воркером в текущем loop: под asyncio.run каждый запуск — свой loop
+            self._queue = asyncio.Queue()
+            self._pending.clear()
+        self._worker = loop.create_task(self._run())
+
+    async def _run(self) -> None:
+        from db.models.bx24_deal import Bx24Deal
+
+        while True:
+            conversation_id, marker = await self._queue.get()
+            try:
+                await send_dev_telegram_log(f'Найден маркер "{marker}" в диалоге cw_id: {conversation_id}', 'MANAGERS')
+                await Bx24Deal.notify_responsible_by_conversation(conversation_id=conversation_id, marker=marker)
+            except Exception as e:
+                await send_dev_telegram_log(f'[MarkerNotifier]\nНепредвиденная ошибка при отправке уведомления в Битрикс\ncw_id: {conversation_id}\n ERROR: {e}')
+            finally:
+                self._pending.discard(conversation_id)
+                self._last_sent[conversation_id] = time.monotonic()
+                self._prune(self._last_sent[conversation_id])
+                self._queue.task_done()
+
+    def _prune(self, now: float) -> None:
+        if len(self._last_sent) > 10_000:
+            self._last_sent = {cid: ts for cid, ts in self._last_sent.items() if now - ts < self.cooldown}
+
+    async def drain(self, timeout: float | None = None) -> None:
+        """
+        Дожидается отправки всех поставленных уведомлений и останавливает воркер.
+        Вызывать перед завершением loop в разовых скриптах (asyncio.run), иначе очередь теряется.
+        """
+        if self._worker is None or self._worker.done():
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            await send_dev_telegram_log(f'[MarkerNotifier]\nНе дождались отправки уведомлений, в очереди: {self._queue.qsize()}', 'WARNING')
+        await self.stop()
+
+    async def stop(self) -> None:
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+        self._queue = None
+        self._pending.clear()
+
+
+marker_notifier = MarkerNotifier()
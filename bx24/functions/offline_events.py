@@ -0,0 +1,135 @@
+import asyncio
+from collections import defaultdict
+
+from bx24.functions.sync_deal import sync_deal
+from settings import (
+    but_map_dict,
+    BX_OFFLINE_EVENTS_PORTALS,
+    BX_OFFLINE_EVENTS_INTERVAL,
+    BX_OFFLINE_EVENTS_CONCURRENCY,
+    BX_OFFLINE_EVENTS_MAX_BATCHES,
+)
+from telegram.send_log import send_dev_telegram_log
+
+OFFLINE_EVENT_NAME = 'ONCRMDEALUPDATE'
+OFFLINE_BATCH_LIMIT = 50
+
+
+def _deal_id_from_event(event: dict) -> int | None:
+    fields = (event.get('EVENT_DATA') or {}).get('FIELDS') or {}
+    try:
+        return int(fields.get('ID'))
+    except (TypeError, ValueError):
+        return None
+
+
+async def _fetch_events(but, error: int) -> list[tuple[str, dict]]:
+    """
+    Забирает события пачками (clear=0): возвращает [(process_id, event)].
+    error=1 — события, ранее помеченные ошибочными через event.offline.error.
+    """
+    fetched: list[tuple[str, dict]] = []
+    for _ in range(BX_OFFLINE_EVENTS_MAX_BATCHES):
+        resp = await asyncio.to_thread(
+            but.call_api_method,
+            'event.offline.get',
+            {'filter': {'EVENT_NAME': OFFLINE_EVENT_NAME}, 'clear': 0, 'error': error, 'limit': OFFLINE_BATCH_LIMIT},
+        )
+        result = resp.get('result') or {}
+        events = result.get('events') or []
+        if not events:
+            break
+        fetched.extend((result.get('process_id'), e) for e in events)
+        if len(events) < OFFLINE_BATCH_LIMIT:
+            break
+    return fetched
+
+
+def _group_by_process(items: list[tuple[str, dict]], key: str) -> dict[str, list]:
+    grouped: dict[str, list] = defaultdict(list)
+    for process_id, event in items:
+        grouped[process_id].append(event.get(key))
+    return grouped
+
+
+async def drain_offline_events(session_maker, domain: str) -> int:
+    """
+    Выбирает накопившиеся офлайн-события обновления сделок портала (event.offline.get, clear=0),
+    включая ранее неудавшиеся (error=1), схлопывает их до уникальных сделок и прогоняет каждую
+    сделку через sync_deal с ограниченной параллельностью.
+    События успешно синхронизированных сделок удаляются (event.offline.clear), события сделок
+    с ошибкой помечаются ошибочными (event.offline.error) и забираются повторно при следующем проходе.
+    Возвращает количество успешно синхронизированных сделок.
+    """
+    but = but_map_dict.get(domain)
+    if but is None:
+        await send_dev_telegram_log(f'[drain_offline_events]\nНет токена для портала {domain}', 'ERROR')
+        return 0
+
+    fetched = await _fetch_events(but, error=0) + await _fetch_events(but, error=1)
+    if not fetched:
+        return 0
+
+    by_deal: dict[int, list[tuple[str, dict]]] = defaultdict(list)
+    without_deal: list[tuple[str, dict]] = []
+    for process_id, event in fetched:
+        deal_id = _deal_id_from_event(event)
+        if deal_id is None:
+            without_deal.append((process_id, event))
+        else:
+            by_deal[deal_id].append((process_id, event))
+
+    sem = asyncio.Semaphore(BX_OFFLINE_EVENTS_CONCURRENCY)
+
+    async def _sync(deal_id: int) -> bool:
+        async with sem:
+            try:
+                await sync_deal(session_maker, domain, deal_id)
+                return True
+            except Exception as e:
+                await send_dev_telegram_log(
+                    f'[drain_offline_events]\nОшибка синхронизации сделки\nportal: {domain}\ndeal_id: {deal_id}\n\nERROR: {e}',
+                    'ERROR',
+                )
+                return False
+
+    deal_ids = list(by_deal)
+    results = await asyncio.gather(*(_sync(deal_id) for deal_id in deal_ids))
+
+    done = list(without_deal)
+    failed: list[tuple[str, dict]] = []
+    for deal_id, ok in zip(deal_ids, results):
+        (done if ok else failed).extend(by_deal[deal_id])
+
+    for process_id, ids in _group_by_process(done, 'ID').items():
+        try:
+            await asyncio.to_thread(but.call_api_method, 'event.offline.clear', {'process_id': process_id, 'id': ids})
+        except Exception as e:
+            await send_dev_telegram_log(f'[drain_offline_events]\nОшибка event.offline.clear\nportal: {domain}\n\nERROR: {e}', 'ERROR')
+
+    for process_id, message_ids in _group_by_process(failed, 'MESSAGE_ID').items():
+        try:
+            await asyncio.to_thread(but.call_api_method, 'event.offline.error', {'process_id': process_id, 'message_id': message_ids})
+        except Exception as e:
+            await send_dev_telegram_log(f'[drain_offline_events]\nОшибка event.offline.error\nportal: {domain}\n\nERROR: {e}', 'ERROR')
+
+    synced = sum(results)
+    await send_dev_telegram_log(
+        f'[drain_offline_events]\nportal: {domain}\nсобытий: {len(fetched)}\nсделок: {len(deal_ids)}, с ошибкой: {len(deal_ids) - synced}',
+        'DEV',
+    )
+    return synced
+
+
+async def run_bx_offline_events_worker(app):
+    """
+    Периодически забирает офлайн-события сделок по порталам из BX_OFFLINE_EVENTS_PORTALS.
+    """
+    session_maker = app["db_sessionmaker"]
+    while True:
+        for domain in BX_OFFLINE_EVENTS_PORTALS:
+            try:
+                await drain_offline_events(session_maker, domain)
+            except Exception as e:
+                await send_dev_telegram_log(f'[run_bx_offline_events_worker]\nportal: {domain}\n\nERROR: {e}', 'ERROR')
+        await asyncio.sleep(BX_OFFLINE_EVENTS_INTERVAL)
@@ -0,0 +1,111 @@
+import asyncio
+import time
+
+from db.models.bx24_deal import Bx24Deal
+from db.models.bx_handler_process import BxHandlerProcess
+from db.models.transcription_job import enqueue_transcription_job
+from db.pool_metrics import short_transaction, track_request_pool_wait
+from telegram.send_log import send_dev_telegram_log
+
+
+async def _sync_deal_once(session_maker, domain: str, deal_id: int) -> str:
+    """
+    Один прогон синхронизации сделки: стадия, комменты из таймлайна, постановка транскрибации звонков.
+    Запросы в Bitrix/Chatwoot идут без открытой транзакции, в БД пишем короткими транзакциями.
+    """
+    deal_obj: Bx24Deal = await Bx24Deal.load_or_create(deal_id=int(deal_id), domain=domain)
+    if not deal_obj:
+        await send_dev_telegram_log(f'[sync_deal]\nНе уадлось получить/создать deal_obj\ndeal_id: {deal_id}', 'WARNING')
+        return "Не уадлось получить/создать deal_obj"
+    ok, conversation_ids, cw_contact_id = await deal_obj.init_chatwoot()
+    if not ok or not conversation_ids:
+        return "Сделка не связана с chatwoot"
+    # Синхронизация стадии сделки
+    await deal_obj.sync_deal_stage_to_chatwoot()
+    # Синхронизация комментов из таймлайна сделки
+    await deal_obj.sync_deal_timeline_comments_to_chatwoot()
+    # Ставим задачу на траснкрибацию звонков в сделке
+    async with short_transaction(session_maker) as session:
+        await enqueue_transcription_job(session, portal=domain, deal_bx_id=int(deal_id))
+    return "OK"
+
+
+async def sync_deal(session_maker, domain: str, deal_id: int) -> str:
+    """
+    Синхронизация сделки Bx24 с chatwoot.
+    Общая точка входа для вебхука /bx24/deal/update и потребителя event.offline.get.
+
+    Если сделка уже обрабатывается, событие не теряется: выставляется флаг повторного прогона,
+    и владелец блокировки после текущего прогона сделает ровно ещё один.
+    Возвращает короткий статус для ответа/логов; ошибка последнего прогона пробрасывается наружу.
+    """
+    with track_request_pool_wait('deal_update'):
+        return await _sync_deal_coalesced(session_maker, domain, deal_id)
+
+
+async def _sync_deal_coalesced(session_maker, domain: str, deal_id: int) -> str:
+    event_code = f"{domain}:DEAL:{deal_id}"
+    async with short_transaction(session_maker) as session:
+        run_id = await BxHandlerProcess.acquire_or_request_rerun(session, event_code)
+    if not run_id:
+        await send_dev_telegram_log(f'[sync_deal]\nЗанято другим процессом, запрошен повторный прогон\nevent_code: {event_code}', 'DEV')
+        return "Уже обрабатывается, повторный прогон запланирован"
+
+    run = asyncio.create_task(_run_with_reruns(session_maker, domain, deal_id, event_code, run_id))
+    heartbeat = asyncio.create_task(_heartbeat(session_maker, event_code, run_id, run))
+    try:
+        return await run
+    except asyncio.CancelledError:
+        if heartbeat.done() and not heartbeat.cancelled():
+            # блокировку потеряли — прогон прерван heartbeat'ом, дальше сделку ведёт новый владелец
+            return "Блокировка потеряна, прогон прерван"
+        raise
+    finally:
+        heartbeat.cancel()
+
+
+async def _heartbeat(session_maker, event_code: str, run_id: str, run: asyncio.Task) -> None:
+    """
+    Продлевает блокировку сделки, пока идёт прогон (долгие таймлайны, троттлинг Bitrix).
+    Если блокировка перехвачена или её не удаётся продлить STALE_LOCK_SEC — прерывает прогон.
+    """
+    last_ok = time.monotonic()
+    while True:
+        await asyncio.sleep(BxHandlerProcess.HEARTBEAT_SEC)
+        try:
+            async with short_transaction(session_maker) as session:
+                owned = await BxHandlerProcess.heartbeat(session, event_code, run_id)
+            last_ok = time.monotonic()
+        except Exception as e:
+            await send_dev_telegram_log(f'[sync_deal]\nОшибка heartbeat блокировки\nevent_code: {event_code}\n\nError: {e}', 'WARNING')
+            owned = time.monotonic() - last_ok < BxHandlerProcess.STALE_LOCK_SEC
+        if not owned:
+            await send_dev_telegram_log(f'[sync_deal]\nБлокировка сделки потеряна, прогон прерван\nevent_code: {event_code}', 'ERROR')
+            run.cancel()
+            return
+
+
+async def _run_with_reruns(session_maker, domain: str, deal_id: int, event_code: str, run_id: str) -> str:
+    while True:
+        status, failure = None, None
+        try:
+            status = await _sync_deal_once(session_maker, domain, deal_id)
+        except Exception as e:
+            failure = e
+
+        rerun = False
+        try:
+            async with short_transaction(session_maker) as session:
+                rerun = await BxHandlerProcess.release_or_rerun(
+                    session, event_code, run_id, error=str(failure)[:2000] if failure else None
+                )
+        except Exception as e:
+            await send_dev_telegram_log(f'[sync_deal]\nОшибка при process.release()\nevent_code: {event_code}\n\nError: {e}', 'ERROR')
+
+        if rerun:
+            # пока шёл прогон, пришли новые события — ещё один прогон (в том числе после ошибки)
+            await send_dev_telegram_log(f'[sync_deal]\nПовторный прогон после изменений во время синхронизации\nevent_code: {event_code}', 'DEV')
+            continue
+        if failure is not None:
+            raise failure
+        return status
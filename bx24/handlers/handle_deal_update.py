@@ -2,9 +2,7 @@ from urllib.parse import parse_qs
 
 from aiohttp import web
 
-from db.models.bx24_deal import Bx24Deal
-from db.models.bx_handler_process import BxHandlerProcess
-from db.models.transcription_job import enqueue_transcription_job
+from bx24.functions.sync_deal import sync_deal
 from telegram.send_log import send_dev_telegram_log
 
 
@@ -25,42 +23,14 @@ async def handle_deal_update(request):
         deal_id = deal_id[0]
         domain = domain[0]
 
-        session_maker = request.app["db_sessionmaker"]
         event_code = f"{domain}:DEAL:{deal_id}"
         try:
-            async with session_maker() as session:
-                async with session.begin():
-                    acquired = await BxHandlerProcess.acquire(session, event_code)
-                    if not acquired:
-                        await send_dev_telegram_log(f'[handle_deal_update]\nЗанято другим процессом\nevent_code: {event_code}', 'DEV')
-                        return web.Response(text="Уже обрабатывается", status=200)
-                    deal_obj: Bx24Deal = await Bx24Deal.get_or_create(session, deal_id=int(deal_id), domain=domain)
-                    if not deal_obj:
-                        await send_dev_telegram_log(f'[handle_deal_update]\nНе уадлось получить/создать deal_obj\ndeal_id: {deal_id}', 'WARNING')
-                        return web.Response(text="Не уадлось получить/создать deal_obj", status=200)
-                    ok, conversation_ids, cw_contact_id = await deal_obj.init_chatwoot(session)
-                    if not ok or not conversation_ids:
-                        return web.Response(text="Сделка не связана с chatwoot", status=200)
-                    # Синхронизация стадии сделки
-                    await deal_obj.sync_deal_stage_to_chatwoot(session)
-                    # Синхронизация комментов из таймлайна сделки
-                    await deal_obj.sync_deal_timeline_comments_to_chatwoot(session)
-                    # Ставим задачу на траснкрибацию звонков в сделке
-                    await enqueue_transcription_job(session, portal=domain, deal_bx_id=int(deal_id))
-                    return web.Response(text="OK", status=200)
-
-
+            status = await sync_deal(request.app["db_sessionmaker"], domain, int(deal_id))
+            return web.Response(text=status, status=200)
         except Exception as e:
             await send_dev_telegram_log(f'[handle_deal_update]\nОшибка в обработчике сделки!\nevent_code: {event_code}\n\nERROR: {e}', 'ERROR')
             return web.Response(text='error', status=500)
-        finally:
-            try:
-                async with session_maker() as session:
-                    async with session.begin():
-                        await BxHandlerProcess.release(session, event_code)
-            except Exception as e:
-                await send_dev_telegram_log(f'[handle_deal_update]\nОшибка при process.release()\nevent_code: {event_code}\n\nError: {e}','ERROR')
 
     except Exception as e:
         await send_dev_telegram_log(f'[handle_deal_update]\nКритическая ошибка при обновлении сделки!\n\nERROR: {e}', 'ERROR')
-        return web.Response(text='error', status=500)
\ No newline at end of file
+        return web.Response(text='error', status=500)
@@ -1,23 +1,50 @@
+import asyncio
+import copy
+import json as jsonlib
+import re
+import time
 from datetime import datetime, timezone, timedelta
-from typing import Any, Dict, List, Optional, Tuple, Union
+from typing import Any, ClassVar, Dict, List, Optional, Sequence, Tuple, Union
 
 import aiohttp
 from openai import AsyncOpenAI
 
 from openai_agents.functions.write_warm_up_message import warm_up_prompt
-from settings import CHATWOOT_API_TOKEN, CHATWOOT_HOST, CHATWOOT_ACCOUNT_ID, OPENAI_TOKEN
+from openai_agents.llm_scheduler import llm_scheduler, LLMPriority
+from bx24.functions.marker_notifier import marker_notifier
+from settings import CHATWOOT_API_TOKEN, CHATWOOT_HOST, CHATWOOT_ACCOUNT_ID, OPENAI_TOKEN, CHATWOOT_GET_CACHE_TTL, \
+    CHATWOOT_GET_CACHE_MAX_ITEMS, CHATWOOT_LIST_CONCURRENCY, CHATWOOT_BULK_CONCURRENCY
 from telegram.send_log import send_dev_telegram_log
 from utils.check_message_for_markers import check_message_for_markers
 
 
 class ChatwootError(RuntimeError):
-    pass
+    def __init__(self, message: str, status: Optional[int] = None) -> None:
+        super().__init__(message)
+        # HTTP-статус ответа Chatwoot, если ошибка пришла от API
+        self.status = status
+
+
+# пометка массовых рассылок (прогревы): транспорт отправляет их после ответов агентов
+BULK_SEND_ATTRIBUTES = {"outbound_priority": "bulk"}
+
+
+# тип ресурса по относительному URL — для TTL кэша GET-ответов и инвалидации после записи
+_RESOURCE_PATTERNS: list[tuple[str, re.Pattern]] = [
+    ("conversation", re.compile(r"^/api/v1/accounts/[^/]+/conversations/\d+$")),
+    ("contact", re.compile(r"^/api/v1/accounts/[^/]+/contacts/\d+$")),
+]
+_RESOURCE_ROOT = re.compile(r"^/api/v1/accounts/[^/]+/(?:conversations|contacts)/\d+")
 
 
 class ChatwootClient:
     """
     Клиент для работы с Chatwoot
     """
+    # общие для всех экземпляров: клиенты создаются на каждое событие, а схлопывать нужно между ними
+    _inflight: ClassVar[Dict[tuple, asyncio.Future]] = {}
+    _get_cache: ClassVar[Dict[tuple, tuple[float, Any]]] = {}
+
     def __init__(
             self,
             base_url: str = CHATWOOT_HOST,
@@ -25,11 +52,13 @@ class ChatwootClient:
             account_id: int = CHATWOOT_ACCOUNT_ID,
             timeout: float = 15.0,
             session: Optional[aiohttp.ClientSession] = None,
+            cache_ttl: Optional[Dict[str, float]] = None,
     ) -> None:
         self.base_url = base_url.rstrip("/")
         self.token = token
         self.account_id = account_id
         self.timeout = timeout
+        self.cache_ttl = CHATWOOT_GET_CACHE_TTL if cache_ttl is None else cache_ttl
 
         self._headers = {"api_access_token": self.token}
         self._session = session
@@ -58,7 +87,62 @@ class ChatwootClient:
             expected_status: Union[int, Tuple[int, ...]] = (200, 201),
             log: Optional[str] = None,
     ):
-        """Асинхронный запрос"""
+        """
+        Асинхронный запрос.
+        Одинаковые одновременные GET (URL + params) выполняются одним HTTP-запросом,
+        ответы ресурсов из cache_ttl дополнительно кэшируются на короткое время.
+        Каждый вызывающий получает свою копию ответа — кэш и ожидающие её не видят.
+        """
+        if method != "GET":
+            self._invalidate_cache(url)
+            return await self._send(method, url, params, json, expected_status)
+
+        # params могут содержать списки (фильтры вида labels[]) — ключ через JSON, а не tuple(items)
+        params_key = jsonlib.dumps(params or {}, sort_keys=True, default=str)
+        key = (self.base_url, self.token, url, params_key, expected_status)
+        ttl = self._resource_ttl(url)
+        if ttl:
+            cached = self._get_cache.get(key)
+            if cached is not None and cached[0] > time.monotonic():
+                return copy.deepcopy(cached[1])
+
+        fut = self._inflight.get(key)
+        if fut is not None:
+            try:
+                return copy.deepcopy(await asyncio.shield(fut))
+            except asyncio.CancelledError:
+                if not fut.cancelled():
+                    raise
+                # отменили ведущий запрос, а не нас — делаем свой
+
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            data = await self._send(method, url, params, json, expected_status)
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except BaseException as e:
+            fut.set_exception(e)
+            fut.exception()  # помечаем как полученное, чтобы не было предупреждения без ожидающих
+            raise
+        else:
+            fut.set_result(data)
+            if ttl:
+                self._put_cache(key, ttl, data)
+            return copy.deepcopy(data)
+        finally:
+            if self._inflight.get(key) is fut:
+                del self._inflight[key]
+
+    async def _send(
+            self,
+            method: str,
+            url: str,
+            params: Optional[Dict[str, Any]],
+            json: Optional[Dict[str, Any]],
+            expected_status: Union[int, Tuple[int, ...]],
+    ):
         if self._session is None:
             # поддержка прямого вызова без контекст-менеджера
             await self.__aenter__()
@@ -73,7 +157,32 @@ class ChatwootClient:
             body = await resp.text()
             msg = f"[Chatwoot] HTTP {resp.status} for {method} {full_url}. Body: {body}"
             await send_dev_telegram_log(f'Ошибка при запросе в chatwoot: {msg}')
-            raise ChatwootError(msg)
+            raise ChatwootError(msg, status=resp.status)
+
+    def _resource_ttl(self, url: str) -> float:
+        for resource, pattern in _RESOURCE_PATTERNS:
+            if pattern.match(url):
+                return self.cache_ttl.get(resource, 0)
+        return 0
+
+    def _put_cache(self, key: tuple, ttl: float, data: Any) -> None:
+        cache = self._get_cache
+        now = time.monotonic()
+        if len(cache) >= CHATWOOT_GET_CACHE_MAX_ITEMS:
+            for k in [k for k, (expires, _) in cache.items() if expires <= now]:
+                del cache[k]
+            while len(cache) >= CHATWOOT_GET_CACHE_MAX_ITEMS:
+                del cache[next(iter(cache))]
+        cache[key] = (now + ttl, data)
+
+    def _invalidate_cache(self, url: str) -> None:
+        """Запись в диалог/контакт сбрасывает закэшированные GET этого ресурса"""
+        root = _RESOURCE_ROOT.match(url)
+        if not root:
+            return
+        prefix = root.group(0)
+        for k in [k for k in self._get_cache if k[2] == prefix or k[2].startswith(prefix + "/")]:
+            del self._get_cache[k]
 
     async def search_contacts(self, identifier: str) -> List[Dict[str, Any]]:
         """
@@ -279,10 +388,18 @@ class ChatwootClient:
         last = await self.get_last_message(conversation_id)
         return None if not last else last.get("id")
 
-    async def send_message(self, conversation_id: int, content: str, message_type: int = 1, private: bool = False) -> Dict[str, Any]:
+    async def send_message(
+            self,
+            conversation_id: int,
+            content: str,
+            message_type: int = 1,
+            private: bool = False,
+            content_attributes: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
         """
         Отправляет сообщение в chatwoot
         message_type: 1 - от лица оператора, 0 - от лица клиента
+        content_attributes приходят обратно в вебхуке исходящего сообщения (например, BULK_SEND_ATTRIBUTES)
         """
         if message_type in (0, 1):
             message_type = "outgoing" if message_type == 1 else "incoming"
@@ -296,21 +413,54 @@ class ChatwootClient:
             "message_type": message_type,
             "private": private,
         }
+        if content_attributes:
+            payload["content_attributes"] = content_attributes
         resp = await self._request(
             "POST", url, json=payload, expected_status=(200, 201),
             log=f"Отправлено сообщение conversation_id={conversation_id}, type={message_type}, private={private}"
         )
 
-        if (marker := check_message_for_markers(content)) and not private and message_type != 2:
-            try:
-                from db.models.bx24_deal import Bx24Deal
-                await send_dev_telegram_log(f'Найден маркер "{marker}" в диалоге cw_id: {conversation_id}', 'MANAGERS')
-                await Bx24Deal.notify_responsible_by_conversation(conversation_id=conversation_id,marker=marker)
-            except Exception as e:
-                await send_dev_telegram_log(f'[cw.send_message]\nНепредвиденная ошибка при отправке уведомления в Битрикс\n ERROR: {e}')
+        if not private and message_type != 2 and (marker := check_message_for_markers(content)):
+            # уведомление в Bitrix уходит в фоне, отправка сообщения его не ждёт
+            marker_notifier.emit(conversation_id, marker)
 
         return resp
 
+    async def send_private_notes(
+            self,
+            items: Sequence[Tuple[int, str]],
+            concurrency: int = CHATWOOT_BULK_CONCURRENCY,
+    ) -> List[Union[Dict[str, Any], Exception]]:
+        """
+        Рассылает приватные заметки по парам (conversation_id, content).
+        Разные диалоги — параллельно (не больше concurrency запросов), внутри диалога — строго по порядку.
+        Возвращает результаты в порядке items: ответ Chatwoot или исключение.
+        После первой ошибки в диалоге остальные его заметки не отправляются (ChatwootError),
+        чтобы при повторе порядок не нарушился.
+        """
+        results: List[Union[Dict[str, Any], Exception]] = [None] * len(items)
+        by_conversation: Dict[int, List[int]] = {}
+        for idx, (conversation_id, _) in enumerate(items):
+            by_conversation.setdefault(conversation_id, []).append(idx)
+
+        sem = asyncio.Semaphore(concurrency)
+
+        async def _send_chain(conversation_id: int, indexes: List[int]) -> None:
+            failed = False
+            for idx in indexes:
+                if failed:
+                    results[idx] = ChatwootError(f"Заметка не отправлена после ошибки в диалоге {conversation_id}")
+                    continue
+                try:
+                    async with sem:
+                        results[idx] = await self.send_message(conversation_id, items[idx][1], private=True)
+                except Exception as e:
+                    results[idx] = e
+                    failed = True
+
+        await asyncio.gather(*(_send_chain(cid, idxs) for cid, idxs in by_conversation.items()))
+        return results
+
     async def is_active_conversation(self, conversation_id: int) -> bool:
         """
         Проверяет, является ли диалог "активным":
@@ -335,6 +485,33 @@ class ChatwootClient:
             for msg in messages
         )
 
+    async def has_public_message(self, conversation_id: int) -> bool:
+        """
+        Лёгкая проверка активности диалога: ищет первое не приватное и не системное сообщение,
+        листая историю с конца и останавливаясь на первой же подходящей странице.
+        Ошибку Chatwoot трактуем как неактивный диалог.
+        """
+        url = f"/api/v1/accounts/{self.account_id}/conversations/{conversation_id}/messages"
+        params: Dict[str, Any] = {}
+        try:
+            while True:
+                resp = await self._request("GET", url, params=params)
+                page: List[Dict[str, Any]] = resp.get("payload", []) or []
+                if not page:
+                    return False
+                if any((not msg.get("private", False)) and msg.get("message_type") != 2 for msg in page):
+                    return True
+                try:
+                    oldest_id = min(msg["id"] for msg in page if "id" in msg)
+                except ValueError:
+                    return False
+                params = {"before": oldest_id}
+        except ChatwootError:
+            await send_dev_telegram_log(
+                f"[has_public_message] Не удалось получить сообщения в диалоге chatwoot: {conversation_id}"
+            )
+            return False
+
     async def has_client_message(self, conversation_id: int) -> bool:
         """
         Проверяет, есть ли в диалоге сообщение от клиента (входящее).
@@ -430,38 +607,67 @@ class ChatwootClient:
             )
             return False
 
-    async def get_conversation_ids_by_status(self, status: str, inbox_id: Optional[int] = None) -> List[int]:
+    async def _get_conversations_page(self, status: str, page: int, inbox_id: Optional[int]) -> Dict[str, Any]:
+        url = f"/api/v1/accounts/{self.account_id}/conversations"
+        params: Dict[str, Any] = {"status": status, "page": str(page), "assignee_type": "all"}
+        if inbox_id is not None:
+            params["inbox_id"] = inbox_id
+        resp = await self._request(
+            "GET",
+            url,
+            params=params,
+            log=f"cw.get_conversation_ids_by_status: status={status}, page={page}, inbox_id={inbox_id}",
+        )
+        return resp.get("data", {}) or {}
+
+    async def get_conversation_ids_by_status(
+            self,
+            status: str,
+            inbox_id: Optional[int] = None,
+            concurrency: int = CHATWOOT_LIST_CONCURRENCY,
+    ) -> List[int]:
         """
         Возвращает список ID диалогов по заданному статусу.
+        Число страниц берётся из meta первой страницы, остальные запрашиваются параллельно
+        (не больше concurrency одновременно). Список собирается целиком до обработки —
+        закрытие диалогов потребителем иначе сдвигало бы пагинацию.
         """
-        url = f"/api/v1/accounts/{self.account_id}/conversations"
-        page = "1"
+        seen: set[int] = set()
         ids: List[int] = []
 
-        while True:
-            params: Dict[str, Any] = {"status": status, "page": page, "assignee_type": "all"}
-            if inbox_id is not None:
-                params["inbox_id"] = inbox_id
-
-            resp = await self._request(
-                "GET",
-                url,
-                params=params,
-                log=f"cw.get_conversation_ids_by_status: status={status}, page={page}, "
-                    f"inbox_id={inbox_id}",
-            )
-
-            payload: List[Dict[str, Any]] = resp.get('data', {}).get("payload", [])
-            if not payload:
-                break
-
+        def _collect(payload: List[Dict[str, Any]]) -> None:
             for conv in payload:
                 cid = conv.get("id")
-                if isinstance(cid, int):
+                if isinstance(cid, int) and cid not in seen:
+                    seen.add(cid)
                     ids.append(cid)
 
-            page = str(int(page) + 1)
-
+        first = await self._get_conversations_page(status, 1, inbox_id)
+        payload: List[Dict[str, Any]] = first.get("payload", []) or []
+        if not payload:
+            return ids
+        _collect(payload)
+        page_size = len(payload)
+        total = (first.get("meta") or {}).get("all_count")
+        last_page = -(-int(total) // page_size) if isinstance(total, int) else 1
+
+        sem = asyncio.Semaphore(concurrency)
+
+        async def _fetch(page: int) -> List[Dict[str, Any]]:
+            async with sem:
+                return (await self._get_conversations_page(status, page, inbox_id)).get("payload", []) or []
+
+        pages = await asyncio.gather(*(_fetch(page) for page in range(2, last_page + 1)))
+        for page_payload in pages:
+            _collect(page_payload)
+
+        # без meta или если счётчик устарел (появились новые диалоги) — последняя страница полная,
+        # добираем хвост последовательно
+        page, last_payload = last_page, (pages[-1] if pages else payload)
+        while len(last_payload) >= page_size:
+            page += 1
+            last_payload = (await self._get_conversations_page(status, page, inbox_id)).get("payload", []) or []
+            _collect(last_payload)
         return ids
 
     async def get_open_conversation_ids(self, inbox_id: Optional[int] = None) -> List[int]:
@@ -571,28 +777,41 @@ class ChatwootClient:
         )
         return isinstance(resp, dict) and "custom_attributes" in resp
 
-    async def get_inbox_id_by_conversation(self, conversation_id: int) -> Optional[int]:
+    async def get_conversation_meta(self, conversation_id: int) -> Optional[Dict[str, Any]]:
         """
-        Возвращает inbox_id для указанного диалога Chatwoot.
+        Возвращает inbox_id, contact_id и phone диалога Chatwoot одним запросом /conversations/{id}.
+        None — если диалог получить не удалось.
         """
         url = f"/api/v1/accounts/{self.account_id}/conversations/{conversation_id}"
         try:
             resp = await self._request("GET", url, expected_status=200)
         except ChatwootError as e:
-            await send_dev_telegram_log(f"[get_inbox_id_by_conversation] Ошибка при получении диалога {conversation_id}: {e}")
+            await send_dev_telegram_log(f"[get_conversation_meta]\nОшибка при получении диалога {conversation_id}\nerror: {e}", "ERROR")
             return None
 
         inbox_id = resp.get("inbox_id")
-        if isinstance(inbox_id, int):
-            return inbox_id
-
-        for msg in resp.get("messages", []) or []:
-            mid = msg.get("inbox_id")
-            if isinstance(mid, int):
-                return mid
+        if not isinstance(inbox_id, int):
+            inbox_id = next(
+                (msg.get("inbox_id") for msg in resp.get("messages", []) or [] if isinstance(msg.get("inbox_id"), int)),
+                None,
+            )
+        sender = resp.get("meta", {}).get("sender", {})
+        return {
+            "inbox_id": inbox_id,
+            "contact_id": sender.get("id", None),
+            "phone": sender.get("phone_number", ""),
+        }
 
-        await send_dev_telegram_log(f"[get_inbox_id_by_conversation] Не удалось определить inbox_id для диалога {conversation_id}", 'DEV')
-        return None
+    async def get_inbox_id_by_conversation(self, conversation_id: int) -> Optional[int]:
+        """
+        Возвращает inbox_id для указанного диалога Chatwoot.
+        """
+        meta = await self.get_conversation_meta(conversation_id)
+        if meta is None:
+            return None
+        if meta["inbox_id"] is None:
+            await send_dev_telegram_log(f"[get_inbox_id_by_conversation] Не удалось определить inbox_id для диалога {conversation_id}", 'DEV')
+        return meta["inbox_id"]
 
     async def get_contact_phone(self, contact_id: int) -> Optional[str]:
         """
@@ -614,28 +833,16 @@ class ChatwootClient:
         """
         Возвращает Chatwoot contact_id по conversation_id.
         """
-        url = f"/api/v1/accounts/{self.account_id}/conversations/{conversation_id}"
-        try:
-            resp = await self._request("GET", url, expected_status=200)
-        except ChatwootError as e:
-            await send_dev_telegram_log(f"[get_contact_id_by_conversation]\nОшибка при получении диалога {conversation_id}\nerror: {e}", "ERROR")
-            return None
-
-        return resp.get('meta', {}).get('sender', {}).get('id', None)
+        meta = await self.get_conversation_meta(conversation_id)
+        return meta["contact_id"] if meta else None
 
 
     async def get_contact_phone_by_conversation(self, conversation_id: int) -> Optional[str]:
         """
         Возвращает номер телефон контакта Chatwoot по conversation_id.
         """
-        url = f"/api/v1/accounts/{self.account_id}/conversations/{conversation_id}"
-        try:
-            resp = await self._request("GET", url, expected_status=200)
-        except ChatwootError as e:
-            await send_dev_telegram_log(f"[get_contact_id_by_conversation]\nОшибка при получении диалога {conversation_id}\nerror: {e}", "ERROR")
-            return None
-
-        return resp.get('meta', {}).get('sender', {}).get('phone_number', '')
+        meta = await self.get_conversation_meta(conversation_id)
+        return meta["phone"] if meta else None
 
 
     async def send_warmup_message(self, conversation_id: int):
@@ -667,7 +874,9 @@ class ChatwootClient:
 
         openai_client = AsyncOpenAI(api_key=OPENAI_TOKEN)
 
-        resp = await openai_client.responses.create(
+        resp = await llm_scheduler.create_response(
+            openai_client,
+            LLMPriority.BACKGROUND,
             model="gpt-5",
             instructions=warm_up_prompt,
             input=chat_history,
@@ -675,5 +884,5 @@ class ChatwootClient:
         )
 
         message = resp.output_text
-        await self.send_message(conversation_id, message)
+        await self.send_message(conversation_id, message, content_attributes=BULK_SEND_ATTRIBUTES)
         await send_dev_telegram_log(f'[warm_up_newsletter]\nОтправлено прогревающее собщеение!\nID диалога CW: {conversation_id}\n\nСообщение:\n\n{message}','WARMUP')
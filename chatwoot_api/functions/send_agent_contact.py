@@ -7,6 +7,7 @@ from green_api.functions.get_instance_settings import get_instance_phone
 from green_api.send_contact import green_api_send_agent_contact
 from green_api.send_text import send_text_message
 from telegram.send_log import send_dev_telegram_log
+from utils.instance_settings_cache import instance_settings_cache
 
 
 async def send_agent_contact_card(data, kind, inbox_id):
@@ -31,7 +32,7 @@ async def send_agent_contact_card(data, kind, inbox_id):
             return web.json_response({"status": "received"})
         elif transport_cfg.kind == 'tg':
             tg_client = transport_cfg.get_wappi_client()
-            agent_phone = await tg_client.get_instance_phone()
+            agent_phone = await instance_settings_cache.get_phone(transport_cfg)
             await tg_client.send_message(client_phone, msg)
             await tg_client.send_contact(client_phone, agent_phone)
             return web.json_response({"status": "received"})
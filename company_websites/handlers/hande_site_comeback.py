@@ -18,8 +18,12 @@ async def handle_site_comeback(request):
         async with ChatwootClient() as cw:
             contact_id = await cw.get_contact_id(phone)
             conversations = await cw.get_conversations(contact_id)
-            for conversation in conversations:
-                await cw.send_message(conversation['id'], f'Клиент посетил наш сайт: {domain}', private=True)
+            results = await cw.send_private_notes(
+                [(conversation['id'], f'Клиент посетил наш сайт: {domain}') for conversation in conversations]
+            )
+        errors = [r for r in results if isinstance(r, Exception)]
+        if errors:
+            await send_dev_telegram_log(f'[handle_site_comeback]\nНе удалось отправить {len(errors)} из {len(results)} заметок\nDATA: {data}\nERROR: {errors[0]}', 'WARNING')
         await send_dev_telegram_log(f'[handle_site_comeback]\ndata: {data}', 'DEV')
         return web.Response(text="Повторное посещение зафиксированно!", status=200)
     except Exception as e:
@@ -6,8 +6,11 @@ from sqlalchemy.ext.asyncio import (
     AsyncEngine,
 )
 
+from bx24.functions.marker_notifier import marker_notifier
+from bx24.functions.offline_events import run_bx_offline_events_worker
 from db.models.transcription_job import run_transcription_worker
-from settings import DATABASE_URL
+from outbound.dispatcher import run_outbound_dispatcher
+from settings import DATABASE_URL, BX_OFFLINE_EVENTS_PORTALS, OUTBOUND_QUEUE_ENABLED, BOTS_CFG
 
 from db.models.bx24_deal import Bx24Deal  # noqa: F401
 from db.models.chatwoot_conversation import ChatwootConversation  # noqa: F401
@@ -19,8 +22,14 @@ from db.models.transport_activation import TransportActivation # noqa: F401
 from db.models.bx_deal_cw_link import BxDealCwLink  # noqa: F401
 from db.models.bx_contact_cw_map import  BxContactCwMap  # noqa: F401
 from db.models.transcription_job import  TranscriptionJob  # noqa: F401
+from db.models.media_analysis_cache import MediaAnalysisCache  # noqa: F401
+from db.models.outbound_message import OutboundMessage  # noqa: F401
 
 from db.models.transport_activation import bootstrap_transport_activation
+from avito_api.avito_client import AvitoClient
+from green_api.green_api_client import GreenApiClient
+from utils.document_convert_pool import document_convert_pool
+from utils.instance_settings_cache import instance_settings_cache
 from telegram.send_log import send_dev_telegram_log
 
 
@@ -40,6 +49,7 @@ async def init_db(app):
         app["db_sessionmaker"] = local_session
 
         Bx24Deal.configure_sessionmaker(local_session)
+        MediaAnalysisCache.configure_sessionmaker(local_session)
 
         async with local_session() as session:
             await bootstrap_transport_activation(session)
@@ -53,10 +63,24 @@ async def close_db(app):
 
 async def setup_workers(app):
     app['transcription_worker'] = app.loop.create_task(run_transcription_worker(app))
+    if BX_OFFLINE_EVENTS_PORTALS:
+        app['bx_offline_events_worker'] = app.loop.create_task(run_bx_offline_events_worker(app))
+    if OUTBOUND_QUEUE_ENABLED:
+        app['outbound_dispatcher'] = app.loop.create_task(run_outbound_dispatcher(app))
+    # прогрев кэша настроек инстансов, старт сервиса не ждёт
+    app['instance_settings_warm_up'] = app.loop.create_task(instance_settings_cache.warm_up(BOTS_CFG))
 
 async def _cleanup_workers(app):
-    app['transcription_worker'].cancel()
-    try:
-        await app['transcription_worker']
-    except asyncio.CancelledError:
-        pass
\ No newline at end of file
+    document_convert_pool.shutdown()
+    await marker_notifier.stop()
+    await GreenApiClient.close_all()
+    await AvitoClient.close_all()
+    for key in ('transcription_worker', 'bx_offline_events_worker', 'outbound_dispatcher', 'instance_settings_warm_up'):
+        task = app.get(key)
+        if task is None:
+            continue
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
\ No newline at end of file
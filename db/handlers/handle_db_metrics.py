@@ -0,0 +1,20 @@
+from aiohttp import web
+
+from db.pool_metrics import pool_wait_metrics
+
+
+async def handle_db_metrics(request: web.Request) -> web.Response:
+    """
+    Возвращает метрики пула соединений БД:
+    время ожидания соединения (на каждый checkout и суммарно на запрос) и текущее состояние пула.
+    """
+    pool = request.app["db_engine"].pool
+    data = {
+        'pool': {
+            'size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'overflow': pool.overflow(),
+        },
+        'wait': pool_wait_metrics.snapshot(),
+    }
+    return web.json_response(data, status=200)
@@ -1,21 +1,24 @@
 from __future__ import annotations
 
+import asyncio
 import traceback
 from typing import Optional, Dict, Any, ClassVar
 from datetime import datetime, timezone, timedelta
 
 from aiohttp import web
 from sqlalchemy import Integer, String, DateTime, UniqueConstraint, select, or_, and_, update
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.orm.attributes import set_committed_value
 
 from bx24.bx_utils.parse_call_info import parse_call_info
-from chatwoot_api.chatwoot_client import ChatwootClient
+from chatwoot_api.chatwoot_client import ChatwootClient, ChatwootError
 from db.models.base import Base
+from db.pool_metrics import short_transaction
 
 from bx24.bx_utils.bitrix_token import BitrixToken
-from db.models.bx_deal_cw_link import link_deal_with_conversation, get_conversation_ids_for_deal, BxDealCwLink
+from db.models.bx_deal_cw_link import link_deal_with_conversations, get_conversation_ids_for_deal, BxDealCwLink
 from settings import but_map_dict, PORTAL_AGENTS
 from telegram.send_log import send_dev_telegram_log
 from utils.normalize_phone import normalize_phone
@@ -63,28 +66,27 @@ class Bx24Deal(Base):
     async def get_bx_data(self, bx_):
         ...
 
-    async def get_timeline_comments(self):
+    async def get_timeline_comments(self, after_id: Optional[int] = None) -> list[dict]:
         """
-        Получаем комментарии к сделке из Bitrix24.
+        Получаем комментарии к сделке из Bitrix24, новее after_id.
+        Курсор уходит в фильтр Битрикса (>ID), страницы добираются keyset-пагинацией
+        только пока они полные — объём ответа пропорционален числу новых комментариев.
         """
-        #TODO сделать call_list (у обычного call_api
-        response = self.but.call_api_method(
-            'crm.timeline.comment.list',
-            {
-                'filter': {
-                    'ENTITY_ID': self.bx_id,
-                    'ENTITY_TYPE': 'deal',
-                },
-                'select': ['ID', 'CREATED', 'COMMENT']
-            }
-        )
+        filter_ = {'ENTITY_ID': self.bx_id, 'ENTITY_TYPE': 'deal'}
+        if after_id:
+            filter_['>ID'] = after_id
 
-        return response.get('result', [])
+        return await asyncio.to_thread(lambda: list(self.but.call_list_fast(
+            'crm.timeline.comment.list',
+            {'filter': filter_, 'select': ['ID', 'CREATED', 'COMMENT']},
+            batch_size=1,
+        )))
 
 
-    async def get_calls_since(self):
+    async def get_calls_since(self) -> list[dict]:
         """
-        Получает звонки из timeline сделки Bitrix24.
+        Получает звонки из timeline сделки Bitrix24 новее last_transcribed_call.
+        Фильтр >START_TIME применяется на стороне Битрикса, все страницы добираются keyset-пагинацией.
         """
         filter_ = {'OWNER_TYPE_ID': 2, 'OWNER_ID': self.bx_id, 'PROVIDER_TYPE_ID': "CALL"}
 
@@ -93,15 +95,14 @@ class Bx24Deal(Base):
             since_utc = since_utc + timedelta(seconds=1)
             filter_[">START_TIME"] = since_utc.strftime("%Y-%m-%dT%H:%M:%SZ")
 
-        response = self.but.call_api_method(
+        calls = await asyncio.to_thread(lambda: list(self.but.call_list_fast(
             'crm.activity.list',
-            {
-                'filter': filter_,
-                'select': ['*'],
-                'order': {'START_TIME': 'ASC'},
-            }
-        )
-        return response.get('result', [])
+            {'filter': filter_, 'select': ['*']},
+            batch_size=1,
+        )))
+        # keyset идёт по ID, а обрабатывать звонки нужно в хронологическом порядке
+        calls.sort(key=lambda c: c.get('START_TIME') or '')
+        return calls
 
     async def handle_new_call(self, call: dict[str, Any]):
         """
@@ -126,7 +127,7 @@ class Bx24Deal(Base):
                 await send_dev_telegram_log(f"[handle_new_call]\nНет file_id для call_id={info.id}")
                 return result
 
-            file_url = self.but.call_api_method('disk.file.get', {'id': info.file_id}).get('result', {}).get(
+            file_url = (await asyncio.to_thread(self.but.call_api_method, 'disk.file.get', {'id': info.file_id})).get('result', {}).get(
                 'DOWNLOAD_URL')
             if not file_url:
                 await send_dev_telegram_log(
@@ -156,8 +157,10 @@ class Bx24Deal(Base):
                     await send_dev_telegram_log(f"[handle_new_call]\nФайл пустой, call_id={info.id}")
                     return result
 
+                from openai_agents.llm_scheduler import LLMPriority
                 from openai_agents.transcribation_client import TranscribeClient
-                transcribation = await TranscribeClient().transcribe(tmp_path)
+                duration = (info.end - info.start).total_seconds() if info.start and info.end else None
+                transcribation = await TranscribeClient().transcribe(tmp_path, priority=LLMPriority.BACKGROUND, duration=duration)
 
                 result['transcribation'] = transcribation.text
                 return result
@@ -179,56 +182,61 @@ class Bx24Deal(Base):
             await send_dev_telegram_log(f"[handle_new_call]\nОшибка при обработке звонка: {str(e)}\nCALL: {call}")
             return {'error': str(e)}
 
-    async def init_chatwoot(self, session: AsyncSession) -> tuple[bool, list[Optional[int]], Optional[int]]:
+    async def init_chatwoot(self) -> tuple[bool, list[Optional[int]], Optional[int]]:
         """
         Инициализация связки с Chatwoot.
+        Запросы в Bitrix/Chatwoot идут без открытой транзакции, связи пишутся одной короткой транзакцией в конце.
         """
         false_response = (False, [], None)
         try:
-            persistent: Bx24Deal = await session.merge(self, load=True)
-
-            if not persistent.bx_contact_id:
-                await send_dev_telegram_log(f'[init_chatwoot]\nУ сделки нет контакта!\nbx portal: {persistent.bx_portal}'
-                                            f'\nbx deal id: {persistent.bx_id}', "WARNING")
+            self._ensure_sessionmaker()
+            if not self.bx_contact_id:
+                await send_dev_telegram_log(f'[init_chatwoot]\nУ сделки нет контакта!\nbx portal: {self.bx_portal}'
+                                            f'\nbx deal id: {self.bx_id}', "WARNING")
                 return false_response
 
-            bx_contact = persistent.but.call_api_method('crm.contact.get', {'id': persistent.bx_contact_id}).get('result')
+            bx_contact = (await asyncio.to_thread(self.but.call_api_method, 'crm.contact.get', {'id': self.bx_contact_id})).get('result')
             phone = bx_contact.get('PHONE', [{}])
             phone = normalize_phone(phone[0].get('VALUE'))
             if not phone:
                 await send_dev_telegram_log(
-                    f"[init_chatwoot]\nНевалидный номер у контакта!\nbx contact id: {persistent.bx_contact_id}\nphone: {phone}\n"
-                    f"ID сделки: {persistent.bx_id}\nПортал: {persistent.bx_portal}", "WARNING"
+                    f"[init_chatwoot]\nНевалидный номер у контакта!\nbx contact id: {self.bx_contact_id}\nphone: {phone}\n"
+                    f"ID сделки: {self.bx_id}\nПортал: {self.bx_portal}", "WARNING"
                 )
                 return false_response
 
             identifier = phone.lstrip("+")
-            conversation_ids = []
             async with ChatwootClient() as cw:
                 chatwoot_contact_id = await cw.get_contact_id(identifier=identifier)
                 if not chatwoot_contact_id:
                     await send_dev_telegram_log(f'[init_chatwoot]\nНе найден контакт в CW с identifier: {identifier}', "INFO")
                     return false_response
 
-                inboxes_id = await cw.get_conversation_inboxes(chatwoot_contact_id)
-
-                for inbox_id in inboxes_id:
-                    conv_id = await cw.get_conversation_id(contact_id=chatwoot_contact_id, inbox_id=inbox_id)
-                    if not conv_id:
-                        await send_dev_telegram_log(f'[init_chatwoot]\nНе нашли диалог в CW для:\ncw_contact_id: {chatwoot_contact_id}\ninbox_id: {inbox_id}', "DEV")
-                        continue
-                    if not await cw.is_active_conversation(conv_id):
-                        continue
-                    await cw.set_bx24_deal_link(conv_id,f'https://{self.bx_portal}/crm/deal/details/{self.bx_id}/')
-                    await link_deal_with_conversation(
+                # один запрос диалогов контакта; по каждому inbox берём первый диалог, как и раньше
+                candidates: dict[int, int] = {}  # inbox_id -> conversation_id
+                for conv in await cw.get_conversations(chatwoot_contact_id):
+                    inbox_id, conv_id = conv.get("inbox_id"), conv.get("id")
+                    if inbox_id is not None and conv_id and inbox_id not in candidates:
+                        candidates[inbox_id] = conv_id
+
+                # проверки активности — параллельно и только до первого публичного сообщения
+                active = await asyncio.gather(*(cw.has_public_message(conv_id) for conv_id in candidates.values()))
+                links = [(conv_id, inbox_id) for (inbox_id, conv_id), is_active in zip(candidates.items(), active) if is_active]
+
+                deal_url = f'https://{self.bx_portal}/crm/deal/details/{self.bx_id}/'
+                await asyncio.gather(*(cw.set_bx24_deal_link(conv_id, deal_url) for conv_id, _ in links))
+                conversation_ids = [conv_id for conv_id, _ in links]
+
+            if links:
+                async with short_transaction(self._session_maker) as session:
+                    await link_deal_with_conversations(
                         session=session,
-                        bx_portal=persistent.bx_portal,
-                        bx_deal_id=persistent.bx_id,
-                        cw_conversation_id=conv_id,
-                        cw_inbox_id=inbox_id,
+                        bx_portal=self.bx_portal,
+                        bx_deal_id=self.bx_id,
                         cw_contact_id=chatwoot_contact_id,
+                        links=links,
                     )
-                    conversation_ids.append(conv_id)
+                for conv_id, _ in links:
                     await send_dev_telegram_log(f'Связан диалог CW со сделкой в BX24\n\n'
                                                 f'ID диалога CW: {conv_id}\nID контакта CW: {chatwoot_contact_id}\n'
                                                 f'Портал BX24: {self.bx_portal}\nID сделки BX24: {self.bx_id}\n', 'INFO')
@@ -239,35 +247,40 @@ class Bx24Deal(Base):
             await send_dev_telegram_log(f'[init_chatwoot]\nКритическая ошибка!\nerror: {e}')
             return false_response
 
-    @staticmethod
-    async def get_or_create(session: AsyncSession, deal_id, domain):
-        stmt = select(Bx24Deal).where(
-            Bx24Deal.bx_id == deal_id,
-            Bx24Deal.bx_portal == domain,
+    @classmethod
+    async def load_or_create(cls, deal_id: int, domain: str) -> Optional[Bx24Deal]:
+        """
+        Читает сделку из БД. Если её нет — получает из Bitrix вне транзакции
+        и вставляет (ON CONFLICT DO NOTHING), затем перечитывает.
+        Возвращает отсоединённый объект (expire_on_commit=False).
+        """
+        cls._ensure_sessionmaker()
+        stmt = select(cls).where(
+            cls.bx_id == deal_id,
+            cls.bx_portal == domain,
         )
-        obj = await session.scalar(stmt)
+        async with short_transaction(cls._session_maker) as session:
+            obj = await session.scalar(stmt)
         if obj:
             return obj
 
         but = but_map_dict[domain]
-        bx_deal = but.call_api_method('crm.deal.get', {'id': deal_id})['result']
-
-        async with session.begin_nested():
-            obj = Bx24Deal(
-                bx_id=deal_id,
-                bx_portal=domain,
-                bx_funnel_id=str(bx_deal.get('CATEGORY_ID')),
-                bx_contact_id=int(bx_deal.get('CONTACT_ID')),
-                stage_id=bx_deal.get('STAGE_ID'),
-            )
-            session.add(obj)
-            try:
-                await session.flush()
-            except IntegrityError as e:
-                tb = traceback.format_exc()
-                await send_dev_telegram_log(f'[Bx24Deal.get_or_create]\nОшибка!\n{tb}', 'ERROR')
+        bx_deal = (await asyncio.to_thread(but.call_api_method, 'crm.deal.get', {'id': deal_id}))['result']
+        contact_id = bx_deal.get('CONTACT_ID')
 
-        return await session.scalar(stmt)
+        async with short_transaction(cls._session_maker) as session:
+            await session.execute(
+                pg_insert(cls)
+                .values(
+                    bx_id=deal_id,
+                    bx_portal=domain,
+                    bx_funnel_id=str(bx_deal.get('CATEGORY_ID')),
+                    bx_contact_id=int(contact_id) if contact_id else None,
+                    stage_id=bx_deal.get('STAGE_ID'),
+                )
+                .on_conflict_do_nothing(constraint="uq_bx_deals_bx_id_portal")
+            )
+            return await session.scalar(stmt)
 
     async def save_max_last_transcribed_call(self, session: AsyncSession, latest_call_dt: datetime) -> None:
         """
@@ -286,6 +299,9 @@ class Bx24Deal(Base):
                 ))
                 .values(last_transcribed_call=latest_call_dt)
             )
+            # без пометки dirty: иначе flush перезапишет курсор безусловно
+            if self.last_transcribed_call is None or self.last_transcribed_call < latest_call_dt:
+                set_committed_value(self, 'last_transcribed_call', latest_call_dt)
         except Exception as e:
             await send_dev_telegram_log(f'[save_max_last_transcribed_call]\nОшибка при сохранении даты последнего транскрибированного звонка: {e}')
             raise e
@@ -307,64 +323,79 @@ class Bx24Deal(Base):
                 ))
                 .values(last_sync_comment_id=max_comment_id)
             )
+            if self.last_sync_comment_id is None or self.last_sync_comment_id < max_comment_id:
+                set_committed_value(self, 'last_sync_comment_id', max_comment_id)
         except Exception as e:
             await send_dev_telegram_log(f'[save_max_last_sync_comment_id]\nОшибка при сохранении id посленднего синхронизированного коммента: {e}', 'ERROR')
             raise e
 
-    async def sync_deal_stage_to_chatwoot(self, session: AsyncSession) -> bool:
+    async def sync_deal_stage_to_chatwoot(self) -> bool:
         """
         Отслеживает изменения стадии сделки в BX24
-        Сохраняет актуальную стадию в БД, и транслирует информацию в приватные комментарии диалога Chatwoot
+        Сохраняет актуальную стадию в БД, и транслирует информацию в приватные комментарии диалога Chatwoot.
+        Смена стадии пишется с оптимистичной проверкой (stage_id в БД всё ещё старый):
+        заметку о смене отправляет только тот прогон, который выиграл запись.
         """
         try:
-            persistent: Bx24Deal = await session.merge(self, load=True)
-
-            bx_deal = persistent.but.call_api_method('crm.deal.get', {'id': persistent.bx_id}).get('result')
+            self._ensure_sessionmaker()
+            bx_deal = (await asyncio.to_thread(self.but.call_api_method, 'crm.deal.get', {'id': self.bx_id})).get('result')
             if not bx_deal:
                 await send_dev_telegram_log(
                     f"[sync_deal_stage_to_chatwoot]\nНе удалось получить сделку.\n"
-                    f"Портал: {persistent.bx_portal}\nСделка: {persistent.bx_id}", 'WARNING'
+                    f"Портал: {self.bx_portal}\nСделка: {self.bx_id}", 'WARNING'
                 )
                 return False
-            funnel_changed = False
+
             new_funnel_raw = bx_deal.get('CATEGORY_ID')
-            if new_funnel_raw:
-                new_funnel_id = str(new_funnel_raw)
-                old_funnel_id = persistent.bx_funnel_id
-                if new_funnel_id != old_funnel_id:
-                    persistent.bx_funnel_id = new_funnel_id
-                    funnel_changed = True
+            new_funnel_id = str(new_funnel_raw) if new_funnel_raw else self.bx_funnel_id
 
             new_stage_id: Optional[str] = bx_deal.get('STAGE_ID')
             if not new_stage_id:
                 await send_dev_telegram_log(
                     f"[sync_deal_stage_to_chatwoot]\nНе удалось получить STAGE_ID.\n"
-                    f"Портал: {persistent.bx_portal}\nСделка: {persistent.bx_id}\nbx_deal: {bx_deal}", "WARNING"
+                    f"Портал: {self.bx_portal}\nСделка: {self.bx_id}\nbx_deal: {bx_deal}", "WARNING"
                 )
                 return False
 
-            old_stage_id = persistent.stage_id
-
-            if new_stage_id == old_stage_id:
-                if funnel_changed:
-                    await session.flush()
+            old_stage_id = self.stage_id
+            if new_stage_id == old_stage_id and new_funnel_id == self.bx_funnel_id:
                 return True
 
-            persistent.stage_id = new_stage_id
+            async with short_transaction(self._session_maker) as session:
+                res = await session.execute(
+                    update(Bx24Deal)
+                    .where(
+                        Bx24Deal.id == self.id,
+                        Bx24Deal.stage_id.is_not_distinct_from(old_stage_id),
+                    )
+                    .values(stage_id=new_stage_id, bx_funnel_id=new_funnel_id)
+                    .returning(Bx24Deal.id)
+                )
+                won = res.first() is not None
+                conversation_ids = list(await get_conversation_ids_for_deal(session, bx_portal=self.bx_portal, bx_id=self.bx_id))
 
-            conversation_ids = await get_conversation_ids_for_deal(session, bx_portal=persistent.bx_portal, bx_id=persistent.bx_id)
+            if not won:
+                await send_dev_telegram_log(
+                    f"[sync_deal_stage_to_chatwoot]\nСтадию уже обновил другой процесс.\n"
+                    f"Портал: {self.bx_portal}\nСделка: {self.bx_id}", 'DEV'
+                )
+                return True
+            set_committed_value(self, 'stage_id', new_stage_id)
+            set_committed_value(self, 'bx_funnel_id', new_funnel_id)
+
+            if new_stage_id == old_stage_id:
+                return True
 
             if not conversation_ids:
                 await send_dev_telegram_log('[sync_deal_stage_to_chatwoot]\nПопытка синхронизации сделки без связи с CW\nСюда такое не должно попадать!!', 'ERROR')
                 return False
 
             if old_stage_id is None:
-                await session.flush()
                 return True
 
             def _stage_name(status_id: str) -> str:
                 try:
-                    res = persistent.but.call_api_method(
+                    res = self.but.call_api_method(
                         'crm.status.list',
                         {'filter': {'STATUS_ID': status_id}}
                     ).get('result', [])
@@ -372,25 +403,23 @@ class Bx24Deal(Base):
                 except Exception:
                     return status_id
 
-            old_stage_name = _stage_name(old_stage_id)
-            new_stage_name = _stage_name(new_stage_id)
+            old_stage_name, new_stage_name = await asyncio.gather(
+                asyncio.to_thread(_stage_name, old_stage_id),
+                asyncio.to_thread(_stage_name, new_stage_id),
+            )
 
             msg = f'[смена стадии сделки BX24]\n\n{old_stage_name} → {new_stage_name}'
 
-            try:
-                async with ChatwootClient() as cw:
-                    for conversation_id in conversation_ids:
-                        await cw.send_message(conversation_id, msg, private=True)
-                return True
-            except Exception as e:
+            async with ChatwootClient() as cw:
+                results = await cw.send_private_notes([(conversation_id, msg) for conversation_id in conversation_ids])
+            errors = [(cid, r) for cid, r in zip(conversation_ids, results) if isinstance(r, Exception)]
+            if errors:
                 await send_dev_telegram_log(
-                    f"[sync_deal_stage_to_chatwoot]\nОшибка отправки заметки в Chatwoot: {e}\n"
-                    f"Портал: {persistent.bx_portal}\nСделка: {persistent.bx_id}", 'ERROR'
+                    f"[sync_deal_stage_to_chatwoot]\nОшибка отправки заметки в Chatwoot: {errors}\n"
+                    f"Портал: {self.bx_portal}\nСделка: {self.bx_id}", 'ERROR'
                 )
                 return False
-            finally:
-                await session.flush()
-
+            return True
 
         except Exception as e:
             await send_dev_telegram_log(
@@ -402,7 +431,8 @@ class Bx24Deal(Base):
     @classmethod
     async def notify_responsible_by_conversation(cls, conversation_id: int, marker: str):
         """
-        Открывает read-only сессию, читает сделки по conversation_id и отправляет уведомления в Bitrix.
+        Читает сделки по conversation_id короткой сессией и отправляет уведомления в Bitrix.
+        Вызовы Bitrix выполняются в отдельном потоке, чтобы не блокировать event loop.
         """
 
         cls._ensure_sessionmaker()
@@ -422,44 +452,44 @@ class Bx24Deal(Base):
                 result = await session.execute(stmt)
                 deals: list[Bx24Deal] = result.unique().scalars().all()
 
-                if not deals:
-                    await send_dev_telegram_log(
-                        f"[notify_responsible_by_conversation]\n"
-                        f"Сделка не найдена для conversation_id={conversation_id}\n"
-                        f"некуда отправить уведомление!",
-                        "MANAGERS",
-                    )
-                    return False
-
-                for deal in deals:
-                    deal_bx_data = deal.but.call_api_method('crm.deal.get', {'id': deal.bx_id}).get('result')
-                    if not deal_bx_data or deal_bx_data.get('CLOSED') == 'Y':
-                        continue
-
-                    assigned_id = deal_bx_data.get('ASSIGNED_BY_ID')
-                    if not assigned_id:
-                        await send_dev_telegram_log(
-                            f"[notify_responsible_by_conversation]\nНет ответственного в сделке bx_id: {deal.bx_id}\nconversation_id={conversation_id}\nнекому отправить уведомление!", 'MANAGERS')
-                        continue
-                    # ID bx user МОЙ, Кати и Артёма Костецкого + ответственный за сделку
-                    users_id = [182, 6784, 6014, int(assigned_id)]
-
-                    # Получаем/создаём чат по сделке в BX24
-                    bx_chat_resp = deal.but.call_api_method('im.chat.get', {'ENTITY_TYPE': 'CRM', 'ENTITY_ID': f'DEAL|{deal.bx_id}'}).get('result')
-                    bx_chat_id = bx_chat_resp.get('ID') if bx_chat_resp else None
-                    if not bx_chat_id:
-                        bx_chat_id = deal.but.call_api_method('im.chat.add', {
-                            'TITLE': f'СДЕЛКА: {deal_bx_data.get("TITLE", "Не удалось получить название сделки.")}',
-                            'USERS': users_id,
-                            'ENTITY_TYPE': 'CRM',
-                            'ENTITY_ID': f'DEAL|{deal.bx_id}'
-                        }).get('result')
-
-                    message = f'Обратите внимание на переписку Агента с клиентом в mbk-chat!\nОбнаруженно слово: {marker}\nID диалога в CW: {conversation_id}'
-                    deal.but.call_api_method('im.message.add',{'DIALOG_ID': f'chat{bx_chat_id}', 'MESSAGE': message}).get('result')
-                    # TODO: выставить в сделке поле был призыва менеджера в True
+            if not deals:
+                await send_dev_telegram_log(
+                    f"[notify_responsible_by_conversation]\n"
+                    f"Сделка не найдена для conversation_id={conversation_id}\n"
+                    f"некуда отправить уведомление!",
+                    "MANAGERS",
+                )
+                return False
 
-                return True
+            for deal in deals:
+                deal_bx_data = (await asyncio.to_thread(deal.but.call_api_method, 'crm.deal.get', {'id': deal.bx_id})).get('result')
+                if not deal_bx_data or deal_bx_data.get('CLOSED') == 'Y':
+                    continue
+
+                assigned_id = deal_bx_data.get('ASSIGNED_BY_ID')
+                if not assigned_id:
+                    await send_dev_telegram_log(
+                        f"[notify_responsible_by_conversation]\nНет ответственного в сделке bx_id: {deal.bx_id}\nconversation_id={conversation_id}\nнекому отправить уведомление!", 'MANAGERS')
+                    continue
+                # ID bx user МОЙ, Кати и Артёма Костецкого + ответственный за сделку
+                users_id = [182, 6784, 6014, int(assigned_id)]
+
+                # Получаем/создаём чат по сделке в BX24
+                bx_chat_resp = (await asyncio.to_thread(deal.but.call_api_method, 'im.chat.get', {'ENTITY_TYPE': 'CRM', 'ENTITY_ID': f'DEAL|{deal.bx_id}'})).get('result')
+                bx_chat_id = bx_chat_resp.get('ID') if bx_chat_resp else None
+                if not bx_chat_id:
+                    bx_chat_id = (await asyncio.to_thread(deal.but.call_api_method, 'im.chat.add', {
+                        'TITLE': f'СДЕЛКА: {deal_bx_data.get("TITLE", "Не удалось получить название сделки.")}',
+                        'USERS': users_id,
+                        'ENTITY_TYPE': 'CRM',
+                        'ENTITY_ID': f'DEAL|{deal.bx_id}'
+                    })).get('result')
+
+                message = f'Обратите внимание на переписку Агента с клиентом в mbk-chat!\nОбнаруженно слово: {marker}\nID диалога в CW: {conversation_id}'
+                await asyncio.to_thread(deal.but.call_api_method, 'im.message.add', {'DIALOG_ID': f'chat{bx_chat_id}', 'MESSAGE': message})
+                # TODO: выставить в сделке поле был призыва менеджера в True
+
+            return True
 
         except Exception as e:
             tb = traceback.format_exc()
@@ -467,39 +497,66 @@ class Bx24Deal(Base):
             return False
 
 
-    async def sync_deal_timeline_comments_to_chatwoot(self, session: AsyncSession):
+    async def sync_deal_timeline_comments_to_chatwoot(self) -> bool:
         """
-        Cинхронизирует комменты из таймлайна сделки с приватными комментариями чата в chatwoot
+        Cинхронизирует комменты из таймлайна сделки с приватными комментариями чата в chatwoot.
+        Комменты и отправка — вне транзакции, курсор сдвигается короткой условной записью.
         """
-        comments = await self.get_timeline_comments()
-        comments.sort(key=lambda c: int(c["ID"]))
-
+        self._ensure_sessionmaker()
         last_id = self.last_sync_comment_id or 0
-        new_comments = [c for c in comments if int(c["ID"]) > last_id]
+        new_comments = await self.get_timeline_comments(after_id=last_id)
+        # на случай, если портал проигнорировал >ID в фильтре
+        new_comments = [c for c in new_comments if int(c["ID"]) > last_id]
+        new_comments.sort(key=lambda c: int(c["ID"]))
         if not new_comments:
-            return web.Response(text="OK", status=200)
+            return True
 
-        conversation_ids = await get_conversation_ids_for_deal(session, bx_portal=self.bx_portal, bx_id=self.bx_id)
+        async with short_transaction(self._session_maker) as session:
+            conversation_ids = list(await get_conversation_ids_for_deal(session, bx_portal=self.bx_portal, bx_id=self.bx_id))
         if not conversation_ids:
             await send_dev_telegram_log(
                 '[sync_deal_timeline_comments_to_chatwoot]\nПопытка синхронизации сделки без связи с CW\nСюда такое не должно попадать!!',
                 'ERROR')
             return False
 
+        # комменты идут по одному: следующий — только после доставки предыдущего во все диалоги,
+        # иначе при ошибке в одном диалоге остальные получали бы все комменты повторно на каждой синхронизации
+        max_id = None
+        failed = None
+        dead = []
         async with ChatwootClient() as cw:
             for c in new_comments:
-                comment_text = c.get('COMMENT')
-                for conversation_id in conversation_ids:
-                    await cw.send_message(
-                        conversation_id,
-                        f'Комментарий из сделки BX24:\n {comment_text}',
-                        private=True
-                    )
-
-        max_id = int(new_comments[-1]["ID"])
+                content = f'Комментарий из сделки BX24:\n {c.get("COMMENT")}'
+                results = await cw.send_private_notes([(cid, content) for cid in conversation_ids])
+                errors = []
+                for cid, r in zip(conversation_ids, results):
+                    if isinstance(r, ChatwootError) and r.status == 404:
+                        # диалог удалён в Chatwoot — не держим из-за него курсор
+                        dead.append(cid)
+                    elif isinstance(r, Exception):
+                        errors.append(r)
+                conversation_ids = [cid for cid in conversation_ids if cid not in dead]
+                if errors:
+                    failed = (c["ID"], errors[0])
+                    break
+                max_id = int(c["ID"])
+
+        if dead:
+            await send_dev_telegram_log(
+                f'[sync_deal_timeline_comments_to_chatwoot]\nДиалоги Chatwoot не найдены (404), комменты в них пропущены\n'
+                f'Портал: {self.bx_portal}\nСделка: {self.bx_id}\nДиалоги: {dead}', 'WARNING'
+            )
 
-        await self.save_max_last_sync_comment_id(session, max_id)
+        if max_id is not None:
+            async with short_transaction(self._session_maker) as session:
+                await self.save_max_last_sync_comment_id(session, max_id)
 
+        if failed:
+            await send_dev_telegram_log(
+                f'[sync_deal_timeline_comments_to_chatwoot]\nНе удалось отправить коммент в Chatwoot\n'
+                f'Портал: {self.bx_portal}\nСделка: {self.bx_id}\nID коммента: {failed[0]}\nERROR: {failed[1]}', 'ERROR'
+            )
+            return False
         return True
 
     @classmethod
@@ -152,6 +152,33 @@ async def link_deal_with_conversation(
     await session.execute(stmt)
 
 
+async def link_deal_with_conversations(
+    session: AsyncSession,
+    bx_portal: str,
+    bx_deal_id: int,
+    cw_contact_id: int,
+    links: Sequence[tuple[int, int]],
+) -> None:
+    """
+    Пакетная версия link_deal_with_conversation: все связи (conversation_id, inbox_id) одним INSERT.
+    """
+    if not links:
+        return
+    stmt = pg_insert(BxDealCwLink).values([
+        {
+            "bx_portal": bx_portal,
+            "bx_deal_id": bx_deal_id,
+            "cw_conversation_id": conv_id,
+            "cw_inbox_id": inbox_id,
+            "cw_contact_id": cw_contact_id,
+        }
+        for conv_id, inbox_id in links
+    ]).on_conflict_do_nothing(
+        constraint="uq_link_portal_deal_conv"
+    )
+    await session.execute(stmt)
+
+
 async def get_conversation_ids_for_deal(session: AsyncSession, bx_portal: str, bx_id: str):
     return await session.scalars(
         select(BxDealCwLink.cw_conversation_id).where(
@@ -1,61 +1,140 @@
-from sqlalchemy import Column, String, Boolean, DateTime, Text, update
+import uuid
+
+from sqlalchemy import Column, String, Boolean, DateTime, Text, update, or_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.dialects.postgresql import insert
-from datetime import datetime, timezone
+from datetime import datetime, timezone, timedelta
 
 from db.models.base import Base
 
 
 class BxHandlerProcess(Base):
+    """
+    Пер-сделочный планировщик с «грязным флагом».
+    Пока сделка обрабатывается, новые события только выставляют rerun_requested;
+    по окончании прогона выполняется ровно один повторный прогон, сколько бы событий ни пришло.
+    """
     __tablename__ = "bx_handler_process"
 
+    # через сколько секунд без обновления updated_at блокировка считается зависшей
+    STALE_LOCK_SEC = 900
+    # как часто владелец продлевает блокировку (heartbeat) во время прогона
+    HEARTBEAT_SEC = 60
+
     event_code = Column(String(255), primary_key=True, unique=True, index=True)
     is_running = Column(Boolean, default=False, nullable=False)
+    rerun_requested = Column(Boolean, default=False, server_default="false", nullable=False)
     updated_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False)
     error = Column(Text, nullable=True)
+    # владелец текущей блокировки: heartbeat/release чужого прогона ничего не меняют
+    run_id = Column(String(36), nullable=True)
 
     @classmethod
-    async def acquire(cls, session: AsyncSession, event_code: str) -> bool:
+    async def acquire(cls, session: AsyncSession, event_code: str) -> str | None:
         """
         Попытка занять процесс для event_code.
-        Возвращает True, если удалось захватить, иначе False.
+        Возвращает run_id владельца, если удалось захватить, иначе None.
+        Зависшая блокировка (updated_at старше STALE_LOCK_SEC) перехватывается.
         """
         now = datetime.now(timezone.utc)
+        stale_before = now - timedelta(seconds=cls.STALE_LOCK_SEC)
+        run_id = str(uuid.uuid4())
 
         stmt = (
             insert(cls.__table__)
             .values(
                 event_code=event_code,
                 is_running=True,
+                rerun_requested=False,
                 updated_at=now,
                 error=None,
+                run_id=run_id,
             )
             .on_conflict_do_update(
                 index_elements=["event_code"],
                 set_={
                     "is_running": True,
+                    "rerun_requested": False,
                     "updated_at": now,
                     "error": None,
+                    "run_id": run_id,
                 },
-                where=(cls.is_running == False),
+                where=or_(cls.is_running == False, cls.updated_at < stale_before),
             )
-            .returning(cls.is_running)
+            .returning(cls.run_id)
         )
 
         res = await session.execute(stmt)
         row = res.fetchone()
+        return row[0] if row and row[0] == run_id else None
+
+    @classmethod
+    async def acquire_or_request_rerun(cls, session: AsyncSession, event_code: str) -> str | None:
+        """
+        Занимает процесс и возвращает run_id; если он уже занят — выставляет rerun_requested и возвращает None.
+        Владелец блокировки после текущего прогона сделает ещё один.
+        """
+        for _ in range(3):
+            run_id = await cls.acquire(session, event_code)
+            if run_id:
+                return run_id
+            res = await session.execute(
+                update(cls)
+                .where(cls.event_code == event_code, cls.is_running == True)
+                .values(rerun_requested=True)
+                .returning(cls.event_code)
+            )
+            if res.fetchone():
+                return None
+            # владелец успел освободить процесс между запросами — пробуем захватить снова
+        return None
+
+    @classmethod
+    async def heartbeat(cls, session: AsyncSession, event_code: str, run_id: str) -> bool:
+        """
+        Продлевает занятую блокировку (updated_at = now), чтобы долгий прогон не сочли зависшим.
+        Возвращает False, если блокировка уже не у этого прогона (освобождена или перехвачена).
+        """
+        res = await session.execute(
+            update(cls)
+            .where(cls.event_code == event_code, cls.is_running == True, cls.run_id == run_id)
+            .values(updated_at=datetime.now(timezone.utc))
+            .returning(cls.event_code)
+        )
+        return res.fetchone() is not None
+
+    @classmethod
+    async def release_or_rerun(cls, session: AsyncSession, event_code: str, run_id: str, error: str | None = None) -> bool:
+        """
+        Завершает прогон. Если за время прогона был запрошен повторный —
+        блокировка остаётся за текущим владельцем, флаг сбрасывается и возвращается True.
+        Блокировку, перехваченную другим прогоном, не трогает и возвращает False.
+        """
+        res = await session.execute(
+            update(cls)
+            .where(cls.event_code == event_code, cls.run_id == run_id)
+            .values(
+                is_running=cls.rerun_requested,
+                rerun_requested=False,
+                updated_at=datetime.now(timezone.utc),
+                error=error,
+            )
+            .returning(cls.is_running)
+        )
+        row = res.fetchone()
         return bool(row and row[0])
 
     @classmethod
-    async def release(cls, session: AsyncSession, event_code: str, error: str | None = None):
+    async def release(cls, session: AsyncSession, event_code: str, run_id: str, error: str | None = None):
         """
-        Освободить процесс по коду.
+        Освободить процесс по коду, если блокировка всё ещё у прогона run_id.
         """
         await session.execute(
             update(cls)
-            .where(cls.event_code == event_code)
+            .where(cls.event_code == event_code, cls.run_id == run_id)
             .values(
                 is_running=False,
+                rerun_requested=False,
                 updated_at=datetime.now(timezone.utc),
                 error=error,
             )
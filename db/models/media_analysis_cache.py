@@ -0,0 +1,117 @@
+import hashlib
+from datetime import datetime, timezone
+from typing import ClassVar, Optional, Sequence
+
+from sqlalchemy import Integer, String, DateTime, Text, UniqueConstraint, Index, select, update, delete, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Mapped, mapped_column
+
+from db.models.base import Base
+from settings import MEDIA_CACHE_MAX_BYTES
+from telegram.send_log import send_dev_telegram_log
+
+
+def content_cache_key(data: bytes) -> str:
+    """Ключ кэша по содержимому файла"""
+    return f"sha256:{hashlib.sha256(data).hexdigest()}"
+
+
+def url_cache_key(url: str) -> str:
+    """Ключ кэша по ссылке/идентификатору файла у провайдера"""
+    return f"url:{hashlib.sha256(url.encode('utf-8')).hexdigest()}"
+
+
+class MediaAnalysisCache(Base):
+    """
+    Кэш результатов analyze_image/analyze_document.
+    Один и тот же summary хранится под ключом содержимого (sha256) и под ключом ссылки провайдера.
+    Общий объём ограничен MEDIA_CACHE_MAX_BYTES, вытесняются давно не использованные записи (LRU).
+    """
+    __tablename__ = "media_analysis_cache"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    cache_key: Mapped[str] = mapped_column(String(128), nullable=False)
+    model: Mapped[str] = mapped_column(String(64), nullable=False)
+    kind: Mapped[str] = mapped_column(String(16), nullable=False)  # image | document
+    summary: Mapped[str] = mapped_column(Text, nullable=False)
+    size_bytes: Mapped[int] = mapped_column(Integer, nullable=False)
+    hits: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    last_used_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("cache_key", "model", name="uq_media_cache_key_model"),
+        Index("ix_media_cache_last_used_at", "last_used_at"),
+    )
+
+    _session_maker: ClassVar[Optional[async_sessionmaker[AsyncSession]]] = None
+
+    @classmethod
+    def configure_sessionmaker(cls, sm: async_sessionmaker[AsyncSession]) -> None:
+        cls._session_maker = sm
+
+    @classmethod
+    async def get_summary(cls, keys: Sequence[str], model: str) -> Optional[str]:
+        """
+        Возвращает сохранённый summary по первому найденному ключу и обновляет last_used_at.
+        Если кэш не сконфигурирован или недоступен — None.
+        """
+        keys = [k for k in keys if k]
+        if cls._session_maker is None or not keys:
+            return None
+        try:
+            async with cls._session_maker() as session:
+                async with session.begin():
+                    row = (await session.execute(
+                        update(cls)
+                        .where(cls.cache_key.in_(keys), cls.model == model)
+                        .values(last_used_at=func.now(), hits=cls.hits + 1)
+                        .returning(cls.summary)
+                    )).first()
+                    return row[0] if row else None
+        except Exception as e:
+            await send_dev_telegram_log(f'[MediaAnalysisCache.get_summary]\nОшибка чтения кэша: {e}', 'WARNING')
+            return None
+
+    @classmethod
+    async def put_summary(cls, keys: Sequence[str], model: str, kind: str, summary: str) -> None:
+        """
+        Сохраняет summary под всеми переданными ключами и вытесняет старые записи сверх лимита.
+        """
+        keys = list(dict.fromkeys(k for k in keys if k))
+        if cls._session_maker is None or not keys or not summary:
+            return
+        size = len(summary.encode("utf-8"))
+        now = datetime.now(timezone.utc)
+        rows = [
+            {"cache_key": k, "model": model, "kind": kind, "summary": summary, "size_bytes": size, "last_used_at": now}
+            for k in keys
+        ]
+        stmt = pg_insert(cls.__table__).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_media_cache_key_model",
+            set_={"summary": stmt.excluded.summary, "size_bytes": stmt.excluded.size_bytes, "last_used_at": now},
+        )
+        try:
+            async with cls._session_maker() as session:
+                async with session.begin():
+                    await session.execute(stmt)
+                    await cls._evict(session)
+        except Exception as e:
+            await send_dev_telegram_log(f'[MediaAnalysisCache.put_summary]\nОшибка записи в кэш: {e}', 'WARNING')
+
+    @classmethod
+    async def _evict(cls, session: AsyncSession, max_bytes: int = MEDIA_CACHE_MAX_BYTES) -> None:
+        """Удаляет самые давно использованные записи, пока суммарный объём превышает max_bytes"""
+        running = (
+            select(
+                cls.id,
+                func.sum(cls.size_bytes).over(order_by=(cls.last_used_at.desc(), cls.id.desc())).label("running"),
+            )
+            .subquery()
+        )
+        await session.execute(
+            delete(cls).where(cls.id.in_(select(running.c.id).where(running.c.running > max_bytes)))
+        )
@@ -0,0 +1,80 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import Integer, String, DateTime, Text, Index
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Mapped, mapped_column
+
+from db.models.base import Base
+
+# приоритеты отправки: меньше — раньше
+PRIORITY_INTERACTIVE = 0    # ответы агента/операторов клиенту
+PRIORITY_DEFAULT = 50
+PRIORITY_BULK = 100         # прогревы и прочие рассылки
+
+
+class OutboundMessage(Base):
+    """
+    Очередь исходящих сообщений в транспорты (Green API / Wappi).
+    Внутри чата сообщения уходят строго по id, между чатами — по priority, с лимитом скорости на инстанс.
+    """
+    __tablename__ = "outbound_message"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    transport: Mapped[str] = mapped_column(String(8), nullable=False)  # wa|tg
+    instance_id: Mapped[str] = mapped_column(String(64), nullable=False)
+    inbox_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    chat_id: Mapped[str] = mapped_column(String(64), nullable=False)  # телефон получателя
+    content: Mapped[str] = mapped_column(Text, nullable=False)
+
+    status: Mapped[str] = mapped_column(String(16), default="new", nullable=False)  # new|sending|retry|done|failed
+    priority: Mapped[int] = mapped_column(Integer, default=PRIORITY_DEFAULT, nullable=False)
+    attempt: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+    next_run_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False)
+    locked_until: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    last_error: Mapped[str | None] = mapped_column(Text, nullable=True)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False)
+    sent_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index(
+            "ix_outbound_message_pending",
+            "priority",
+            "id",
+            postgresql_where=(status.in_(["new", "sending", "retry"])),
+        ),
+        Index(
+            "ix_outbound_message_chat_pending",
+            "instance_id",
+            "chat_id",
+            "id",
+            postgresql_where=(status.in_(["new", "sending", "retry"])),
+        ),
+    )
+
+
+async def enqueue_outbound_message(
+        session: AsyncSession,
+        transport: str,
+        instance_id: str,
+        inbox_id: int,
+        chat_id: str,
+        content: str,
+        priority: int = PRIORITY_DEFAULT,
+) -> int:
+    """
+    Ставит сообщение в очередь отправки, возвращает его id
+    """
+    msg = OutboundMessage(
+        transport=transport,
+        instance_id=str(instance_id),
+        inbox_id=inbox_id,
+        chat_id=chat_id,
+        content=content,
+        priority=priority,
+        status="new",
+    )
+    session.add(msg)
+    await session.flush()
+    return msg.id
@@ -0,0 +1,76 @@
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+
+class PoolWaitMetrics:
+    """
+    Время ожидания соединения из пула SQLAlchemy.
+    checkout — каждое получение соединения, остальные имена — суммарное ожидание за один запрос/задачу.
+    """
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._stats: dict[str, dict] = {}
+
+    def observe(self, name: str, seconds: float) -> None:
+        st = self._stats.get(name)
+        if st is None:
+            st = self._stats[name] = {'count': 0, 'total': 0.0, 'max': 0.0, 'samples': deque(maxlen=self.window)}
+        st['count'] += 1
+        st['total'] += seconds
+        st['max'] = max(st['max'], seconds)
+        st['samples'].append(seconds)
+
+    def snapshot(self) -> dict:
+        out = {}
+        for name, st in self._stats.items():
+            samples = sorted(st['samples'])
+            p95 = samples[int(len(samples) * 0.95) - 1] if samples else 0.0
+            out[name] = {
+                'count': st['count'],
+                'avg_ms': round(st['total'] / st['count'] * 1000, 2) if st['count'] else 0.0,
+                'p95_ms': round(p95 * 1000, 2),
+                'max_ms': round(st['max'] * 1000, 2),
+            }
+        return out
+
+
+pool_wait_metrics = PoolWaitMetrics()
+
+# накопитель ожидания пула для текущего запроса (см. track_request_pool_wait)
+_request_pool_wait: ContextVar[Optional[list]] = ContextVar('_request_pool_wait', default=None)
+
+
+@asynccontextmanager
+async def short_transaction(session_maker: async_sessionmaker[AsyncSession]) -> AsyncIterator[AsyncSession]:
+    """
+    Короткая транзакция для фазы записи/чтения без удалённых вызовов внутри.
+    Замеряет, сколько ждали соединение из пула.
+    """
+    async with session_maker() as session:
+        async with session.begin():
+            started = time.perf_counter()
+            await session.connection()
+            waited = time.perf_counter() - started
+            pool_wait_metrics.observe('checkout', waited)
+            acc = _request_pool_wait.get()
+            if acc is not None:
+                acc[0] += waited
+            yield session
+
+
+@contextmanager
+def track_request_pool_wait(name: str):
+    """Суммирует ожидание пула по всем short_transaction внутри блока и пишет в метрику name"""
+    acc = [0.0]
+    token = _request_pool_wait.set(acc)
+    try:
+        yield acc
+    finally:
+        _request_pool_wait.reset(token)
+        pool_wait_metrics.observe(name, acc[0])
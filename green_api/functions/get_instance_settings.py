@@ -1,15 +1,11 @@
-import requests
+from green_api.green_api_client import GreenApiClient
+from utils.instance_settings_cache import instance_settings_cache
 
 
 async def get_instance_settings(wa_config):
     """Получает настройки инстанса GreenApi"""
-    base_url, instance_id, api_token = wa_config.get_green_api_params()
-    url = f"{base_url}/waInstance{instance_id}/getSettings/{api_token}"
-    headers = {"Content-Type": "application/json"}
-    response = requests.request("GET", url, headers=headers)
-    return response.json()
+    return await GreenApiClient.for_config(wa_config).get_settings()
 
 async def get_instance_phone(wa_config):
-    data = await get_instance_settings(wa_config)
-    phone = data.get('wid', '').split('@')[0]
-    return phone
\ No newline at end of file
+    """Номер инстанса из кэша настроек (см. InstanceSettingsCache)"""
+    return await instance_settings_cache.get_phone(wa_config) or ''
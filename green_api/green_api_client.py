@@ -0,0 +1,192 @@
+import asyncio
+import re
+import weakref
+from dataclasses import dataclass
+from typing import Any, ClassVar, Dict, List, Optional, Set, Tuple
+
+import aiohttp
+
+from telegram.send_log import send_dev_telegram_log
+from utils.http_retry import RETRY_STATUSES, raise_for_status, request_with_retries
+from utils.split_message_by_links import split_message_by_links, FILE_LINK_REGEX
+
+
+class GreenApiError(Exception):
+    """Исключение клиента Green API."""
+
+
+@dataclass
+class GreenApiSendResult:
+    """Результат отправки одного фрагмента сообщения"""
+    kind: str  # 'text' | 'file'
+    content: str
+    ok: bool
+    id_message: Optional[str] = None
+    error: Optional[str] = None
+
+
+class GreenApiClient:
+    """
+    Асинхронный клиент Green API (WhatsApp).
+    Один экземпляр и одна пуловая aiohttp-сессия на инстанс — см. for_config().
+    Фрагменты сообщений в один чат уходят строго по порядку, разные чаты — параллельно.
+    """
+    # повторы на 429/5xx и ошибки соединения
+    MAX_RETRIES = 3
+    RETRY_BASE_DELAY = 1.0
+    RETRY_STATUSES = RETRY_STATUSES
+
+    _clients: ClassVar[Dict[Tuple[str, str], "GreenApiClient"]] = {}
+    _closing: ClassVar[Set[asyncio.Task]] = set()
+
+    def __init__(self, base_url: str, instance_id: str, api_token: str, timeout: float = 30.0, session: Optional[aiohttp.ClientSession] = None) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.instance_id = instance_id
+        self.api_token = api_token
+        self.timeout = timeout
+
+        self._session = session
+        self._own_session = session is None
+        self._chat_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+    @classmethod
+    def for_config(cls, wa_config) -> "GreenApiClient":
+        """
+        Общий клиент инстанса: сессия и соединения переиспользуются между запросами.
+        """
+        base_url, instance_id, api_token = wa_config.get_green_api_params()
+        key = (base_url, str(instance_id))
+        client = cls._clients.get(key)
+        if client is None or client.api_token != api_token:
+            if client is not None:
+                cls._close_later(client)
+            client = cls._clients[key] = cls(base_url, instance_id, api_token)
+        return client
+
+    @classmethod
+    def _close_later(cls, client: "GreenApiClient") -> None:
+        """
+        Закрывает сессию заменённого клиента (сменился токен), дав запросам в полёте
+        завершиться — не дольше таймаута запроса.
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+
+        async def _close() -> None:
+            try:
+                await asyncio.sleep(client.timeout)
+            finally:
+                await client.aclose()
+
+        task = loop.create_task(_close())
+        cls._closing.add(task)
+        task.add_done_callback(cls._closing.discard)
+
+    @classmethod
+    async def close_all(cls) -> None:
+        # заменённые клиенты закрываем сразу, не дожидаясь паузы
+        closing = list(cls._closing)
+        for task in closing:
+            task.cancel()
+        await asyncio.gather(*closing, return_exceptions=True)
+        for client in cls._clients.values():
+            await client.aclose()
+
+    async def __aenter__(self) -> "GreenApiClient":
+        if self._session is None or self._session.closed:
+            timeout = aiohttp.ClientTimeout(total=self.timeout)
+            self._session = aiohttp.ClientSession(timeout=timeout)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        if self._own_session and self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _request(self, http_method: str, api_method: str, json: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Запрос к методу Green API с повтором на 429/5xx и ошибках соединения (см. request_with_retries).
+        """
+        if self._session is None or self._session.closed:
+            # поддержка прямого вызова без контекст-менеджера
+            await self.__aenter__()
+
+        url = f"{self.base_url}/waInstance{self.instance_id}/{api_method}/{self.api_token}"
+
+        async def _attempt() -> Dict[str, Any]:
+            async with self._session.request(http_method, url, json=json) as resp:
+                await raise_for_status(resp)
+                return await resp.json(content_type=None) or {}
+
+        return await request_with_retries(
+            _attempt,
+            GreenApiError,
+            f"[GreenAPI] {http_method} {api_method} (instance {self.instance_id})",
+            max_retries=self.MAX_RETRIES,
+            base_delay=self.RETRY_BASE_DELAY,
+            retry_statuses=self.RETRY_STATUSES,
+        )
+
+    async def send_message(self, chat_id: str, text: str) -> Dict[str, Any]:
+        """POST sendMessage"""
+        return await self._request("POST", "sendMessage", json={"chatId": chat_id, "message": text})
+
+    async def send_file_by_url(self, chat_id: str, url: str, file_name: Optional[str] = None) -> Dict[str, Any]:
+        """POST sendFileByUrl"""
+        payload = {
+            "chatId": chat_id,
+            "urlFile": url,
+            "fileName": file_name or url.split('/')[-1],
+        }
+        return await self._request("POST", "sendFileByUrl", json=payload)
+
+    async def send_contact(self, chat_id: str, contact: Dict[str, Any]) -> Dict[str, Any]:
+        """POST sendContact"""
+        return await self._request("POST", "sendContact", json={"chatId": chat_id, "contact": contact})
+
+    async def get_settings(self) -> Dict[str, Any]:
+        """GET getSettings — настройки инстанса"""
+        return await self._request("GET", "getSettings")
+
+    def chat_lock(self, chat_id: str) -> asyncio.Lock:
+        """Блокировка чата: пока её держат, другие сообщения в этот чат ждут"""
+        lock = self._chat_locks.get(chat_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._chat_locks[chat_id] = lock
+        return lock
+
+    async def send_split_message(self, phone: str, message: str, limiter=None) -> List[GreenApiSendResult]:
+        """
+        Разбивает сообщение по ссылкам на файлы и отправляет фрагменты по порядку.
+        limiter (token bucket инстанса) — токен на каждый запрос отправки фрагмента.
+        Ошибка фрагмента не прерывает отправку остальных — она попадает в результат.
+        """
+        chat_id = f"{phone}@c.us"
+        results: List[GreenApiSendResult] = []
+        async with self.chat_lock(chat_id):
+            for part in split_message_by_links(message or ""):
+                txt = part.lstrip(".,!? \t;:-").strip()
+                if not len(txt) > 1:
+                    continue
+                is_file = bool(re.match(FILE_LINK_REGEX, txt, re.IGNORECASE))
+                result = GreenApiSendResult(kind='file' if is_file else 'text', content=txt, ok=False)
+                if limiter is not None:
+                    await limiter.acquire()
+                try:
+                    resp = await (self.send_file_by_url(chat_id, txt) if is_file else self.send_message(chat_id, txt))
+                    result.ok = True
+                    result.id_message = resp.get("idMessage")
+                except Exception as e:
+                    result.error = str(e)
+                    await send_dev_telegram_log(
+                        f'[GreenApiClient.send_split_message]\nОшибка при отправке фрагмента\nchat_id: {chat_id}\n{txt}\nerror: {e}',
+                        'ERROR'
+                    )
+                results.append(result)
+        return results
@@ -1,8 +1,6 @@
-import contextlib
-import os
-import tempfile
+import asyncio
 import traceback
-from pathlib import Path
+from typing import Callable
 
 import aiohttp
 from aiohttp import web
@@ -16,12 +14,30 @@ from openai_agents.functions.analyze_document import analyze_document
 from openai_agents.functions.analyze_image import analyze_image
 from openai_agents.transcribation_client import TranscribeClient
 from telegram.send_log import send_dev_telegram_log
-from utils.download_to_temp_file import download_to_temp
-from utils.ffmpeg_convert_to_wav import convert_to_wav_via_imageio_ffmpeg
+from utils.instance_settings_cache import instance_settings_cache
+from utils.ffmpeg_stream_audio import fetch_audio_for_stt
 from utils.normalize_phone import normalize_phone
 from settings import INBOX_TO_TRANSPORT
 
 
+_state_log_tasks: set[asyncio.Task] = set()
+
+
+def _log_instance_state(refresh: asyncio.Task, wa_config, make_text: Callable[[str], str]) -> None:
+    """
+    Пишет смену состояния инстанса в STATUS уже с новым номером: ждёт обновления кэша настроек в фоне,
+    чтобы вебхук не ходил в Green API.
+    """
+    async def _log() -> None:
+        await asyncio.shield(refresh)
+        phone = await get_instance_phone(wa_config)
+        await send_dev_telegram_log(make_text(phone), "STATUS")
+
+    task = asyncio.create_task(_log())
+    _state_log_tasks.add(task)
+    task.add_done_callback(_state_log_tasks.discard)
+
+
 async def inbound_green_api(request, agent_code, inbox_id):
     """
     Обработчик входящих уведомлений от GREEN API
@@ -36,24 +52,25 @@ async def inbound_green_api(request, agent_code, inbox_id):
         # Cмена статуса инстанса
         if type_webhook == "stateInstanceChanged":
             state_instance = data.get("stateInstance")
-            phone = await get_instance_phone(wa_config)
+            # номер/статус инстанса могли смениться — кэш обновляется в фоне, номер пишем в лог после обновления
+            refresh = instance_settings_cache.refresh(wa_config)
             if state_instance == 'notAuthorized':
                 session_maker = request.app["db_sessionmaker"]
                 async with session_maker() as session:
                     await TransportActivation.deactivate(session, inbox_id)
-                await send_dev_telegram_log(f"[inbound_green_api]\n\nИнстанс разлогинился!\n@pivograd\n@kateradzivil\n@Im_Artem\n\nномер телефона: {phone}\ninbox_id={inbox_id}\nсостояние инстанса={state_instance} → is_active=False","STATUS", )
+                _log_instance_state(refresh, wa_config, lambda phone: f"[inbound_green_api]\n\nИнстанс разлогинился!\n@pivograd\n@kateradzivil\n@Im_Artem\n\nномер телефона: {phone}\ninbox_id={inbox_id}\nсостояние инстанса={state_instance} → is_active=False")
                 return web.json_response({"status": "ok"})
             elif state_instance == 'authorized':
                 session_maker = request.app["db_sessionmaker"]
                 async with session_maker() as session:
                     await TransportActivation.activate(session, inbox_id)
-                await send_dev_telegram_log(f"[inbound_green_api]\n\nАвторизовали инстанс!\n\nномер телефона: {phone}\ninbox_id={inbox_id}: состояние инстанса={state_instance} → is_active=True","STATUS", )
+                _log_instance_state(refresh, wa_config, lambda phone: f"[inbound_green_api]\n\nАвторизовали инстанс!\n\nномер телефона: {phone}\ninbox_id={inbox_id}: состояние инстанса={state_instance} → is_active=True")
                 return web.json_response({"status": "ok"})
             elif state_instance == 'blocked':
                 session_maker = request.app["db_sessionmaker"]
                 async with session_maker() as session:
                     await TransportActivation.deactivate(session, inbox_id)
-                await send_dev_telegram_log(f"[inbound_green_api]\n\nИнстанс заблокирован!\n@pivograd\n@kateradzivil\n@Im_Artem\n\nномер телефона: {phone}\ninbox_id={inbox_id}: состояние инстанса={state_instance} → is_active=False","STATUS", )
+                _log_instance_state(refresh, wa_config, lambda phone: f"[inbound_green_api]\n\nИнстанс заблокирован!\n@pivograd\n@kateradzivil\n@Im_Artem\n\nномер телефона: {phone}\ninbox_id={inbox_id}: состояние инстанса={state_instance} → is_active=False")
                 return web.json_response({"status": "ok"})
 
         elif type_webhook == "incomingCall":
@@ -139,13 +156,9 @@ async def inbound_green_api(request, agent_code, inbox_id):
                     return web.json_response({"status": "ok"})
                 download_url, file_name = res
 
-                tmp_path = None
                 try:
-                    tmp_path = await download_to_temp(session, download_url, file_name)
-                    wav_path = Path(tempfile.gettempdir()) / (Path(file_name).stem + ".wav")
-                    await convert_to_wav_via_imageio_ffmpeg(tmp_path, str(wav_path))
-
-                    transcript = await TranscribeClient().transcribe(audio_file_path=str(wav_path))
+                    audio_name, audio = await fetch_audio_for_stt(session, download_url, file_name)
+                    transcript = await TranscribeClient().transcribe_bytes(audio, audio_name)
                     text = _extract_transcription_text(transcript)
                     if text and text.strip():
                         header = "🎤 Голосовое сообщение"
@@ -160,14 +173,6 @@ async def inbound_green_api(request, agent_code, inbox_id):
                         f"[inbound_green_api.audioMessage]\nОшибка транскрибации: {e}", 'WARNING')
                     fallback_msg = f"{file_name}: {download_url}"
                     await safe_send_to_chatwoot(phone, name, fallback_msg, cw_config, message_type=0)
-                finally:
-                    if tmp_path and os.path.exists(tmp_path):
-                        with contextlib.suppress(Exception):
-                            os.remove(tmp_path)
-
-                    if wav_path and os.path.exists(wav_path):
-                        with contextlib.suppress(Exception):
-                            os.remove(wav_path)
 
         # 4d. Сообщение с документом
         elif message_type == "documentMessage":
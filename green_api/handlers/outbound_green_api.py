@@ -1,6 +1,9 @@
 from aiohttp import web
 
 from green_api.send_to_greenapi import send_to_greenapi
+from outbound.dispatcher import enqueue_outbound, priority_from_webhook
+from settings import OUTBOUND_QUEUE_ENABLED
+from telegram.send_log import send_dev_telegram_log
 
 
 async def outbound_green_api(request, agent_code, inbox_id):
@@ -16,6 +19,17 @@ async def outbound_green_api(request, agent_code, inbox_id):
     if not phone:
         return web.json_response({"status": "not phone"})
 
-    send_to_greenapi(agent_code, phone, message, inbox_id)
+    if OUTBOUND_QUEUE_ENABLED:
+        # отправку делает диспетчер инстанса с учётом очереди чата и лимитов
+        await enqueue_outbound(request.app["db_sessionmaker"], "wa", inbox_id, phone, message, priority_from_webhook(data))
+        return web.json_response({"status": "queued"})
 
-    return web.json_response({"status": "received"})
+    results = await send_to_greenapi(agent_code, phone, message, inbox_id)
+    failed = [r for r in results if not r.ok]
+    if failed:
+        await send_dev_telegram_log(
+            f'[outbound_green_api]\nНе доставлено {len(failed)} из {len(results)} фрагментов\ninbox_id: {inbox_id}\nconversation_id: {conversation.get("id")}',
+            'WARNING'
+        )
+
+    return web.json_response({"status": "received", "sent": len(results) - len(failed), "failed": len(failed)})
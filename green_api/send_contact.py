@@ -1,9 +1,9 @@
 import traceback
 
-import requests
 from typing import Dict, Any, Optional
 
 from classes.config import WAConfig
+from green_api.green_api_client import GreenApiClient
 from settings import AGENTS_BY_CODE
 from telegram.send_log import send_dev_telegram_log
 from utils.normalize_phone import normalize_phone
@@ -35,17 +35,10 @@ async def send_contact(
     Отправляет контакт клиенту в WhatsApp через Green API.
     """
     try:
-        base_url, instance_id, api_token = wa_config.get_green_api_params()
-
-        url = f"{base_url}/waInstance{instance_id}/sendContact/{api_token}"
         payload = _build_contact_payload(client_phone=client_phone, contact_phone=contact_phone, first_name=first_name, last_name=last_name)
-
-        headers = {"Content-Type": "application/json"}
-
-        resp = requests.post(url, json=payload, headers=headers)
-        ok = 200 <= resp.status_code < 300
-
-        return ok
+        client = GreenApiClient.for_config(wa_config)
+        await client.send_contact(payload["chatId"], payload["contact"])
+        return True
 
     except Exception as e:
         tb = traceback.format_exc()
@@ -57,9 +50,6 @@ async def green_api_send_agent_contact(wa_config, agent_phone, client_phone):
     """
     Отправляет контакт клиенту в WhatsApp через Green API.
     """
-    base_url, instance_id, api_token = wa_config.get_green_api_params()
-    url = f"{base_url}/waInstance{instance_id}/sendContact/{api_token}"
     payload = _build_contact_payload(client_phone=client_phone, contact_phone=agent_phone)
-    headers = {"Content-Type": "application/json"}
-
-    return requests.post(url, json=payload, headers=headers)
+    client = GreenApiClient.for_config(wa_config)
+    return await client.send_contact(payload["chatId"], payload["contact"])
@@ -1,8 +1,8 @@
 import traceback
-import requests
 from typing import Dict, Any, Optional
 
 from classes.config import WAConfig
+from green_api.green_api_client import GreenApiClient
 from telegram.send_log import send_dev_telegram_log
 from utils.normalize_phone import normalize_phone
 
@@ -20,17 +20,10 @@ async def send_text_message(message: str, client_phone: str, wa_config: Optional
     Отправляет текстовое сообщение клиенту в WhatsApp через Green API.
     """
     try:
-        base_url, instance_id, api_token = wa_config.get_green_api_params()
-
-        url = f"{base_url}/waInstance{instance_id}/sendMessage/{api_token}"
         payload = _build_message_payload(client_phone=client_phone, message=message)
-
-        headers = {"Content-Type": "application/json"}
-
-        resp = requests.post(url, json=payload, headers=headers)
-        ok = 200 <= resp.status_code < 300
-
-        return ok
+        client = GreenApiClient.for_config(wa_config)
+        await client.send_message(payload["chatId"], payload["message"])
+        return True
 
     except Exception:
         tb = traceback.format_exc()
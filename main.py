@@ -24,9 +24,12 @@ from bx24.handlers.handle_bx24_customfield_dialog import handle_bx24_customfield
 from bx24.handlers.handle_message_bitrix_webhook import handle_message_bitrix_webhook
 from company_websites.handlers.handle_form_website_webhook import handle_form_website_webhook
 from db.core import init_db, close_db, setup_workers, _cleanup_workers
+from db.handlers.handle_db_metrics import handle_db_metrics
 from db.migrate import alembic_upgrade_head
 from settings import BOTS_CFG, CLIENT_MAX_SIZE
+from openai_agents.handlers.handle_llm_metrics import handle_llm_metrics
 from openai_agents.handlers.handle_sdk_agent_webhook import handle_sdk_agent_webhook
+from outbound.handlers.handle_outbound_metrics import handle_outbound_metrics
 
 app = web.Application(client_max_size=CLIENT_MAX_SIZE)
 BASE_DIR = pathlib.Path(__file__).parent
@@ -51,6 +54,9 @@ app.router.add_post("/bx24/mbkchat/select_dialog", handle_bx24_customfield_selec
 
 # OpenAI
 app.router.add_post("/sdk_agent_webhook/{agent_code}", handle_sdk_agent_webhook)
+app.router.add_get("/metrics/llm", handle_llm_metrics)
+app.router.add_get("/metrics/db", handle_db_metrics)
+app.router.add_get("/metrics/outbound", handle_outbound_metrics)
 
 # Chatwoot
 app.router.add_get("/sdk/conversations/{conversation_id}/history", get_chat_sdk_history)
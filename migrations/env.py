@@ -25,6 +25,8 @@ from db.models.transport_activation import TransportActivation  # noqa: F401
 from db.models.bx_deal_cw_link import BxDealCwLink  # noqa: F401
 from db.models.bx_contact_cw_map import  BxContactCwMap  # noqa: F401
 from db.models.transcription_job import  TranscriptionJob  # noqa: F401
+from db.models.media_analysis_cache import MediaAnalysisCache  # noqa: F401
+from db.models.outbound_message import OutboundMessage  # noqa: F401
 
 config = context.config
 if config.config_file_name is not None:
@@ -1,4 +1,4 @@
-from chatwoot_api.chatwoot_client import ChatwootClient
+from chatwoot_api.chatwoot_client import ChatwootClient, BULK_SEND_ATTRIBUTES
 from openai_agents.functions.analyze_conversation import analyze_conversation
 from openai_agents.functions.write_warm_up_message import main_send
 from telegram.send_log import send_dev_telegram_log
@@ -21,7 +21,7 @@ async def warm_up_newsletter(inbox_id):
                     analyze_resp = await analyze_conversation(c_id)
                     if analyze_resp.should_send is True:
                         message = await main_send(c_id)
-                        await cw.send_message(c_id, message)
+                        await cw.send_message(c_id, message, content_attributes=BULK_SEND_ATTRIBUTES)
                         await cw.send_message(c_id, f'!!!Отправлено прогревающее собщеение из рассылки {analyze_resp.warm_up_number}!!!', private=True)
                         await send_dev_telegram_log(f'[warm_up_newsletter]\nОтправлено прогревающее собщеение!\nID диалога CW: {c_id}\n\nСообщение:\n\n{message}', 'WARMUP')
                         ids_count += 1
@@ -5,6 +5,7 @@ from openai import AsyncOpenAI
 from pydantic import BaseModel, Field, conlist, confloat
 
 from chatwoot_api.chatwoot_client import ChatwootClient
+from openai_agents.llm_scheduler import llm_scheduler, LLMPriority
 from openai_agents.utils.formation_contact_correspondence import formation_contact_correspondence
 from settings import OPENAI_TOKEN
 from wazzup_collector_api.get_contact_chats import get_contact_chats
@@ -150,7 +151,9 @@ async def analyze_conversation(conv_id):
 
     openai_client = AsyncOpenAI(api_key=OPENAI_TOKEN) # в проде прокси не нужен
 
-    resp = await openai_client.responses.parse(
+    resp = await llm_scheduler.parse_response(
+        openai_client,
+        LLMPriority.BACKGROUND,
         model="gpt-5-mini",
         instructions=get_analyze_prompt(),
         input=chat_history,
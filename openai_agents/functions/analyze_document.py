@@ -5,12 +5,12 @@ from pathlib import Path
 
 from openai import AsyncOpenAI
 
-from settings import OPENAI_TOKEN, MODEL_MAIN
+from db.models.media_analysis_cache import MediaAnalysisCache, content_cache_key, url_cache_key
+from openai_agents.llm_scheduler import llm_scheduler, LLMPriority
+from settings import OPENAI_TOKEN, MODEL_MAIN, DOC_TEXT_MAX_CHARS, DOC_DOWNLOAD_MAX_BYTES
 from telegram.send_log import send_dev_telegram_log
-from utils.docx_to_html import docx_to_html
-from utils.download_bytes import download_bytes
-from utils.html_to_pdf_bytes import html_to_pdf_bytes
-from utils.xlsx_to_html import xlsx_to_html
+from utils.document_convert_pool import document_convert_pool
+from utils.download_bytes import download_bytes, DownloadTooLarge
 
 DOCUMENT_PROMPT = """
 Ты — эксперт по сжатому изложению документов. Твоя задача — внимательно ПРОЧИТАТЬ ВЕСЬ документ и выдать краткое описание на русском языке.
@@ -60,52 +60,68 @@ async def analyze_document(
     model: str = MODEL_MAIN,
 ) -> str:
     """
+    Скачивает документ и возвращает краткое саммари. DOCX/XLSX уходят в LLM извлечённым текстом,
+    PDF — текстовым слоем или, для сканов, файлом; у длинных PDF берётся выборка страниц (utils.pdf_budget).
+    Результат кэшируется по ссылке и по sha256 содержимого: повторный файл не скачивается/не конвертируется.
     """
+    url_key = url_cache_key(document_url)
+    cached = await MediaAnalysisCache.get_summary([url_key], model)
+    if cached:
+        return cached
 
     ext = Path(document_url).suffix.lower()
-    raw = await download_bytes(document_url)
-
-    # — конвертация к PDF
-    html: str | None = None
+    try:
+        raw = await download_bytes(document_url, max_bytes=DOC_DOWNLOAD_MAX_BYTES)
+    except DownloadTooLarge as e:
+        await send_dev_telegram_log(f"[analyze_document]\n{e}\n{document_url}", "WARNING")
+        return f"Документ слишком большой для автоматического анализа (больше {DOC_DOWNLOAD_MAX_BYTES // 1024**2} МБ)."
+    content_key = content_cache_key(raw)
+    cached = await MediaAnalysisCache.get_summary([content_key], model)
+    if cached:
+        await MediaAnalysisCache.put_summary([url_key, content_key], model, "document", cached)
+        return cached
+
+    filename = os.path.basename(document_url) or "document"
     if ext == ".pdf":
-        pdf_bytes = raw
-    elif ext in (".docx",):
-        html = docx_to_html(raw)
-        pdf_bytes = html_to_pdf_bytes(html, title=os.path.basename(document_url) or "DOCX")
-    elif ext in (".xlsx", ".xls"):
-        html = xlsx_to_html(raw, include_formulas=True, include_comments=True)
-        pdf_bytes = html_to_pdf_bytes(html, title=os.path.basename(document_url) or "XLSX")
+        try:
+            pdf = await document_convert_pool.prepare_pdf(raw, label=filename)
+        except ValueError as e:
+            await send_dev_telegram_log(f"[analyze_document]\n{e}", "ERROR")
+            raise RuntimeError(str(e))
+        pages_note = f"Документ «{filename}», страниц: {pdf['pages_total']}."
+        if len(pdf["pages"]) < pdf["pages_total"]:
+            pages_note += f" Для анализа выбраны страницы: {', '.join(map(str, pdf['pages']))}."
+        if pdf["mode"] == "text":
+            content_items = [{"type": "input_text", "text": f"{pages_note}\n\n{pdf['text']}"}]
+        else:
+            # текстового слоя нет (скан/макет) — отдаём файлом, модель прочитает страницы как изображения
+            base64_string = base64.b64encode(pdf["pdf"]).decode("ascii")
+            content_items = [
+                {"type": "input_text", "text": pages_note},
+                {
+                    "type": "input_file",
+                    "filename": filename,
+                    "file_data": f"data:application/pdf;base64,{base64_string}",
+                },
+            ]
     else:
-        # Попытка эвристик: DOCX → затем XLSX
-        tried = []
+        # DOCX/XLSX/текст — извлекаем текст напрямую, без рендера в PDF
         try:
-            html = docx_to_html(raw)
-            pdf_bytes = html_to_pdf_bytes(html, title="Document")
-        except Exception as e1:
-            tried.append(f"DOCX:{e1}")
-            try:
-                html = xlsx_to_html(raw, include_formulas=True, include_comments=True)
-                pdf_bytes = html_to_pdf_bytes(html, title="Workbook")
-            except Exception as e2:
-                tried.append(f"XLSX:{e2}")
-                await send_dev_telegram_log(
-                    f"[analyze_document]\nНеподдерживаемый формат. Попытки: {', '.join(tried)}", "ERROR"
-                )
-                raise RuntimeError(f"Неподдерживаемый формат. Попытки: {', '.join(tried)}")
-
-    base64_string = base64.b64encode(pdf_bytes).decode("ascii")
+            text = await document_convert_pool.extract_text(raw, ext, label=filename)
+        except ValueError as e:
+            await send_dev_telegram_log(f"[analyze_document]\n{e}", "ERROR")
+            raise RuntimeError(str(e))
+        if len(text) > DOC_TEXT_MAX_CHARS:
+            text = text[:DOC_TEXT_MAX_CHARS] + "\n\n[документ обрезан]"
+        content_items = [{"type": "input_text", "text": f"Документ «{filename}»:\n\n{text}"}]
+
     client = AsyncOpenAI(api_key=OPENAI_TOKEN)
-    content_items = [
-        {
-            "type": "input_file",
-            "filename": f"somedoc.{ext}",
-            "file_data": f"data:application/pdf;base64,{base64_string}",
-        }
-    ]
-
-    resp = await client.responses.create(
+    resp = await llm_scheduler.create_response(
+        client,
+        LLMPriority.MEDIA,
         model=model,
         instructions=DOCUMENT_PROMPT,
         input=[{"role": "user", "content": content_items}],
     )
+    await MediaAnalysisCache.put_summary([url_key, content_key], model, "document", resp.output_text)
     return resp.output_text
@@ -1,8 +1,16 @@
+import asyncio
+import base64
+import time
 from typing import Optional
 
 from openai import AsyncOpenAI
 
-from settings import OPENAI_TOKEN, MODEL_MAIN
+from db.models.media_analysis_cache import MediaAnalysisCache, content_cache_key, url_cache_key
+from openai_agents.llm_scheduler import llm_scheduler, LLMPriority
+from settings import OPENAI_TOKEN, MODEL_MAIN, IMAGE_PREPROCESS_ENABLED, IMAGE_DETAIL_DEFAULT
+from telegram.send_log import send_dev_telegram_log
+from utils.download_bytes import download_bytes
+from utils.image_preprocess import prepare_image, detect_image_mime
 
 # Твой системный промпт (оставил как есть)
 image_prompt = """
@@ -16,25 +24,109 @@ image_prompt = """
 - Пиши по-русски, просто и естественно.
 """.strip()
 
+
+class VisionMetrics:
+    """
+    Статистика запросов к vision по режимам: "prepared" — после prepare_image, "original" — как пришло.
+    Позволяет сравнить токены, объём и задержку до и после предобработки.
+    """
+
+    def __init__(self):
+        self._stats: dict[str, dict] = {}
+
+    def observe(self, mode: str, input_tokens: Optional[int], image_bytes: int, latency_sec: float) -> None:
+        st = self._stats.setdefault(mode, {'count': 0, 'input_tokens': 0, 'image_bytes': 0, 'latency': 0.0})
+        st['count'] += 1
+        st['input_tokens'] += input_tokens or 0
+        st['image_bytes'] += image_bytes
+        st['latency'] += latency_sec
+
+    def snapshot(self) -> dict:
+        return {
+            mode: {
+                'count': st['count'],
+                'avg_input_tokens': round(st['input_tokens'] / st['count']),
+                'avg_image_kb': round(st['image_bytes'] / st['count'] / 1024, 1),
+                'avg_latency_s': round(st['latency'] / st['count'], 2),
+            }
+            for mode, st in self._stats.items()
+        }
+
+
+vision_metrics = VisionMetrics()
+
+
 async def analyze_image(
     image_url: Optional[str] = None,
     base64_image: Optional[str] = None,
-    model: str = MODEL_MAIN) -> str:
+    model: str = MODEL_MAIN,
+    detail: str = IMAGE_DETAIL_DEFAULT) -> str:
     """
     Анализирует изображение и возвращает русскоязычное описание.
-    Можно передать либо публичный image_url, либо локальный image_path.
+    Можно передать либо публичный image_url, либо base64_image.
+    detail — "low" | "high" | "auto": low для превью и проверок «что на фото», high — когда важен мелкий текст.
+    Перед отправкой картинка уменьшается и перекодируется (prepare_image), в LLM уходит data URL.
+    Результат кэшируется по ссылке и по sha256 содержимого: повторная картинка не уходит в LLM.
     """
+    url_key = url_cache_key(image_url) if image_url else None
+    if url_key:
+        cached = await MediaAnalysisCache.get_summary([url_key], model)
+        if cached:
+            return cached
+
+    content_key = None
+    raw = None
+    if base64_image:
+        raw = base64.b64decode(base64_image)
+        content_key = content_cache_key(raw)
+    elif image_url:
+        try:
+            raw = await download_bytes(image_url)
+            base64_image = base64.b64encode(raw).decode("ascii")
+            content_key = content_cache_key(raw)
+        except Exception as e:
+            await send_dev_telegram_log(f'[analyze_image]\nНе удалось скачать {image_url}, передаю ссылку в LLM: {e}', 'WARNING')
+
+    keys = [url_key, content_key]
+    if content_key:
+        cached = await MediaAnalysisCache.get_summary([content_key], model)
+        if cached:
+            await MediaAnalysisCache.put_summary(keys, model, "image", cached)
+            return cached
+
     client = AsyncOpenAI(api_key=OPENAI_TOKEN) # , base_url='http://150.241.122.84:3333/v1/'
     content_items =[]
     image = image_url
+    mode, image_bytes = "original", len(raw or b"")
     if base64_image:
-        image = f"data:image/jpeg;base64,{base64_image}"
-    content_items.append({"type": "input_image", "image_url": image})
+        prepared = None
+        if IMAGE_PREPROCESS_ENABLED:
+            try:
+                prepared = await asyncio.to_thread(prepare_image, raw)
+            except Exception as e:
+                # формат, который Pillow не открывает (HEIC и т.п.) — отправляем как есть
+                await send_dev_telegram_log(f'[analyze_image]\nНе удалось подготовить изображение, отправляю оригинал: {e}', 'WARNING')
+        mime = detect_image_mime(raw)
+        if prepared is not None:
+            image, mode, image_bytes = prepared.data_url, "prepared", prepared.prepared_bytes
+        elif mime or not image_url:
+            # без ссылки тип неизвестен — как раньше, image/jpeg
+            image = f"data:{mime or 'image/jpeg'};base64,{base64_image}"
+        else:
+            # неизвестный формат по ссылке — пусть его скачает и разберёт сам OpenAI
+            image_bytes = 0
+    content_items.append({"type": "input_image", "image_url": image, "detail": detail})
 
-    resp = await client.responses.create(
+    started = time.monotonic()
+    resp = await llm_scheduler.create_response(
+        client,
+        LLMPriority.MEDIA,
         model=model,
         instructions=image_prompt,
         input=[{"role": "user", "content": content_items}]
     )
+    usage = getattr(resp, "usage", None)
+    vision_metrics.observe(mode, getattr(usage, "input_tokens", None), image_bytes, time.monotonic() - started)
 
+    await MediaAnalysisCache.put_summary(keys, model, "image", resp.output_text)
     return resp.output_text
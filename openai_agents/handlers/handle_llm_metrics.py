@@ -0,0 +1,13 @@
+from aiohttp import web
+
+from openai_agents.functions.analyze_image import vision_metrics
+from openai_agents.llm_scheduler import llm_scheduler
+
+
+async def handle_llm_metrics(request: web.Request) -> web.Response:
+    """
+    Возвращает метрики планировщика запросов в OpenAI:
+    глубину очередей по приоритетам, остаток бюджетов RPM/TPM и статистику 429.
+    В ключе "vision" — токены/объём/задержка запросов с картинками до и после предобработки.
+    """
+    return web.json_response({**llm_scheduler.snapshot(), "vision": vision_metrics.snapshot()}, status=200)
@@ -0,0 +1,455 @@
+import asyncio
+import dataclasses
+import heapq
+import itertools
+import json
+import re
+import time
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import openai
+from agents import Runner, RunConfig
+from agents.models.default_models import get_default_model
+from agents.models.interface import Model, ModelProvider
+from agents.models.multi_provider import MultiProvider
+
+from settings import LLM_MODEL_LIMITS, LLM_DEFAULT_LIMITS, OPENAI_TOKEN
+from telegram.send_log import send_dev_telegram_log
+
+
+class LLMPriority(IntEnum):
+    """Классы приоритета запросов в OpenAI (меньше — важнее)"""
+    INTERACTIVE = 0  # живые ответы клиентам
+    MEDIA = 1        # входящие картинки/документы/голосовые
+    BACKGROUND = 2   # прогревы, транскрибация звонков из BX24 и прочие кроны
+
+
+# Доля бюджета модели, которую запрос данного приоритета обязан оставить свободной.
+# Фоновые задачи не могут выбрать квоту до нуля — остаток гарантирован живым диалогам.
+PRIORITY_HEADROOM = {
+    LLMPriority.INTERACTIVE: 0.0,
+    LLMPriority.MEDIA: 0.1,
+    LLMPriority.BACKGROUND: 0.3,
+}
+
+DEFAULT_OUTPUT_TOKENS = 2048
+INLINE_FILE_TOKENS = 1500  # условная цена картинки/файла, переданных data-url
+MAX_RATE_LIMIT_RETRIES = 3
+MAX_BACKOFF_SEC = 60.0
+
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def _parse_duration(value: Optional[str]) -> Optional[float]:
+    """Парсит длительность из заголовков OpenAI ('1s', '6m0s', '20ms') в секунды"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_RE.findall(value)
+    if not parts:
+        return None
+    return sum(float(num) * _DURATION_UNITS[unit] for num, unit in parts)
+
+
+def _header_int(headers, name: str) -> Optional[int]:
+    try:
+        raw = headers.get(name)
+        return int(raw) if raw is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _count_chars(payload: Any) -> Tuple[int, int]:
+    """Возвращает (кол-во символов текста, кол-во инлайн-файлов) во входе запроса"""
+    if isinstance(payload, str):
+        if payload.startswith("data:"):
+            return 0, 1
+        return len(payload), 0
+    if isinstance(payload, dict):
+        chars = files = 0
+        for value in payload.values():
+            c, f = _count_chars(value)
+            chars += c
+            files += f
+        return chars, files
+    if isinstance(payload, (list, tuple)):
+        chars = files = 0
+        for value in payload:
+            c, f = _count_chars(value)
+            chars += c
+            files += f
+        return chars, files
+    return len(json.dumps(payload, ensure_ascii=False, default=str)), 0
+
+
+def estimate_tokens(*payload: Any, output_tokens: int = DEFAULT_OUTPUT_TOKENS) -> int:
+    """
+    Грубая оценка токенов запроса до отправки (≈3 символа на токен для кириллицы).
+    Точное значение досчитывается по usage после ответа.
+    """
+    chars, files = _count_chars(list(payload))
+    return chars // 3 + files * INLINE_FILE_TOKENS + output_tokens
+
+
+class _ModelBudget:
+    """Токен-бакеты запросов и токенов одной модели + очередь ожидающих по приоритету"""
+
+    def __init__(self, model: str, rpm: int, tpm: int) -> None:
+        self.model = model
+        self.rpm = float(rpm)
+        self.tpm = float(tpm)
+        self.requests = float(rpm)
+        self.tokens = float(tpm)
+        self.updated = time.monotonic()
+
+        self.blocked_until = 0.0
+        self.backoff = 0.0
+
+        self.waiters: List[Tuple[int, int]] = []
+        self.waiting_by_priority: Dict[LLMPriority, int] = {p: 0 for p in LLMPriority}
+        self.in_flight = 0
+        self._event = asyncio.Event()
+
+        self.granted = 0
+        self.rate_limited = 0
+        self.wait_seconds_total = 0.0
+        self.tokens_used_total = 0
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.requests = min(self.rpm, self.requests + elapsed * self.rpm / 60.0)
+            self.tokens = min(self.tpm, self.tokens + elapsed * self.tpm / 60.0)
+        self.updated = now
+
+    def reserve(self, tokens: int, priority: LLMPriority, now: float) -> float:
+        """
+        Пытается списать 1 запрос и tokens токенов.
+        Возвращает 0, если удалось, иначе сколько секунд подождать до следующей попытки.
+        """
+        self._refill(now)
+        if now < self.blocked_until:
+            return self.blocked_until - now
+
+        headroom = PRIORITY_HEADROOM[priority]
+        tokens = min(tokens, self.tpm * (1.0 - headroom))  # иначе большой запрос не пройдёт никогда
+        need_requests = 1.0 + self.rpm * headroom
+        need_tokens = tokens + self.tpm * headroom
+
+        if self.requests >= need_requests and self.tokens >= need_tokens:
+            self.requests -= 1.0
+            self.tokens -= tokens
+            return 0.0
+
+        wait_requests = (need_requests - self.requests) * 60.0 / self.rpm
+        wait_tokens = (need_tokens - self.tokens) * 60.0 / self.tpm
+        return max(wait_requests, wait_tokens, 0.05)
+
+    def settle(self, reserved: int, used: Optional[int]) -> None:
+        """Корректирует бакет на разницу между оценкой и фактическим usage"""
+        if used is None:
+            return
+        self.tokens_used_total += used
+        self.tokens = min(self.tpm, self.tokens - (used - reserved))
+
+    def observe_headers(self, headers, now: float) -> None:
+        """Подстраивает бюджет под фактические лимиты из заголовков x-ratelimit-*"""
+        if not headers:
+            return
+        limit_requests = _header_int(headers, "x-ratelimit-limit-requests")
+        limit_tokens = _header_int(headers, "x-ratelimit-limit-tokens")
+        remaining_requests = _header_int(headers, "x-ratelimit-remaining-requests")
+        remaining_tokens = _header_int(headers, "x-ratelimit-remaining-tokens")
+
+        self._refill(now)
+        if limit_requests:
+            self.rpm = float(limit_requests)
+        if limit_tokens:
+            self.tpm = float(limit_tokens)
+        if remaining_requests is not None:
+            self.requests = min(self.requests, float(remaining_requests))
+        if remaining_tokens is not None:
+            self.tokens = min(self.tokens, float(remaining_tokens))
+
+        if remaining_requests == 0 or remaining_tokens == 0:
+            reset = max(
+                _parse_duration(headers.get("x-ratelimit-reset-requests")) or 0.0,
+                _parse_duration(headers.get("x-ratelimit-reset-tokens")) or 0.0,
+            )
+            if reset:
+                self.blocked_until = max(self.blocked_until, now + reset)
+
+    def on_success(self) -> None:
+        self.backoff = 0.0
+
+    def on_rate_limited(self, headers, now: float) -> float:
+        """Обрабатывает 429: блокирует модель на retry-after либо экспоненциальный backoff"""
+        self.rate_limited += 1
+        self.observe_headers(headers, now)
+
+        delay = None
+        if headers:
+            retry_after_ms = _header_int(headers, "retry-after-ms")
+            if retry_after_ms is not None:
+                delay = retry_after_ms / 1000.0
+            else:
+                delay = _parse_duration(headers.get("retry-after"))
+        if delay is None:
+            self.backoff = min(MAX_BACKOFF_SEC, max(1.0, self.backoff * 2))
+            delay = self.backoff
+
+        self.requests = 0.0
+        self.blocked_until = max(self.blocked_until, now + delay)
+        return delay
+
+    def wakeup(self) -> None:
+        self._event.set()
+        self._event = asyncio.Event()
+
+    async def wait(self, timeout: Optional[float]) -> None:
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        self._refill(now)
+        return {
+            "queue_depth": len(self.waiters),
+            "queue_by_priority": {p.name.lower(): n for p, n in self.waiting_by_priority.items()},
+            "in_flight": self.in_flight,
+            "rpm": int(self.rpm),
+            "tpm": int(self.tpm),
+            "requests_available": round(self.requests, 1),
+            "tokens_available": int(self.tokens),
+            "blocked_for_sec": round(max(0.0, self.blocked_until - now), 2),
+            "granted": self.granted,
+            "rate_limited": self.rate_limited,
+            "avg_wait_sec": round(self.wait_seconds_total / self.granted, 3) if self.granted else 0.0,
+            "tokens_used_total": self.tokens_used_total,
+        }
+
+
+class LLMSlot:
+    """Выданное планировщиком разрешение на один запрос к модели"""
+
+    def __init__(self, budget: _ModelBudget, reserved: int) -> None:
+        self._budget = budget
+        self.reserved = reserved
+        self._used: Optional[int] = None
+
+    def observe(self, headers=None, used_tokens: Optional[int] = None) -> None:
+        """Передаёт планировщику заголовки ответа и фактический расход токенов"""
+        if headers is not None:
+            self._budget.observe_headers(headers, time.monotonic())
+        if used_tokens is not None:
+            self._used = used_tokens
+
+
+class LLMScheduler:
+    """
+    Единая точка входа для всех запросов в OpenAI.
+    Держит бюджеты RPM/TPM по моделям, пропускает запросы в порядке приоритета
+    и адаптивно притормаживает по заголовкам rate-limit и ответам 429.
+    """
+
+    def __init__(
+        self,
+        limits: Optional[Dict[str, Dict[str, int]]] = None,
+        default_limits: Optional[Dict[str, int]] = None,
+        max_retries: int = MAX_RATE_LIMIT_RETRIES,
+    ) -> None:
+        self._limits = limits if limits is not None else LLM_MODEL_LIMITS
+        self._default_limits = default_limits or LLM_DEFAULT_LIMITS
+        self._budgets: Dict[str, _ModelBudget] = {}
+        self._seq = itertools.count()
+        self.max_retries = max_retries
+
+    def _budget(self, model: str) -> _ModelBudget:
+        budget = self._budgets.get(model)
+        if budget is None:
+            cfg = self._limits.get(model, self._default_limits)
+            budget = _ModelBudget(model, rpm=cfg["rpm"], tpm=cfg["tpm"])
+            self._budgets[model] = budget
+        return budget
+
+    async def acquire(self, model: str, priority: LLMPriority, tokens: int) -> _ModelBudget:
+        """Ждёт своей очереди и бюджета модели; возвращает бюджет, из которого списан запрос"""
+        budget = self._budget(model)
+        entry = (int(priority), next(self._seq))
+        heapq.heappush(budget.waiters, entry)
+        budget.waiting_by_priority[priority] += 1
+        started = time.monotonic()
+        try:
+            while True:
+                delay = None
+                if budget.waiters[0] == entry:
+                    delay = budget.reserve(tokens, priority, time.monotonic())
+                    if delay <= 0:
+                        heapq.heappop(budget.waiters)
+                        break
+                await budget.wait(delay)
+        except BaseException:
+            budget.waiters.remove(entry)
+            heapq.heapify(budget.waiters)
+            raise
+        finally:
+            budget.waiting_by_priority[priority] -= 1
+            budget.wakeup()
+
+        budget.granted += 1
+        budget.in_flight += 1
+        budget.wait_seconds_total += time.monotonic() - started
+        return budget
+
+    @asynccontextmanager
+    async def slot(self, model: str, priority: LLMPriority, tokens: int) -> AsyncIterator[LLMSlot]:
+        """
+        async with llm_scheduler.slot(model, priority, tokens) as slot:
+            resp = ...
+            slot.observe(headers=..., used_tokens=...)
+        """
+        budget = await self.acquire(model, priority, tokens)
+        slot = LLMSlot(budget, tokens)
+        try:
+            yield slot
+            budget.on_success()
+        except openai.RateLimitError as e:
+            delay = budget.on_rate_limited(getattr(e.response, "headers", None), time.monotonic())
+            await send_dev_telegram_log(
+                f'[LLMScheduler]\n429 от OpenAI\nмодель: {model}\nприоритет: {priority.name}\n'
+                f'пауза модели: {delay:.1f} сек.', 'WARNING'
+            )
+            raise
+        finally:
+            budget.in_flight -= 1
+            budget.settle(slot.reserved, slot._used)
+            budget.wakeup()
+
+    async def _call(self, model: str, priority: LLMPriority, tokens: int, call):
+        """
+        Выполняет call(slot) в слоте модели с повтором на 429.
+        Сам SDK на 429 не повторяет (max_retries=0, см. _no_sdk_retries) — иначе повторы множились бы.
+        """
+        attempt = 0
+        while True:
+            try:
+                async with self.slot(model, priority, tokens) as slot:
+                    return await call(slot)
+            except openai.RateLimitError:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+
+    async def _call_raw(self, raw_method, model: str, priority: LLMPriority, tokens: int, **kwargs):
+        """Вызов метода SDK через with_raw_response с повтором на 429"""
+        async def _once(slot: LLMSlot):
+            raw = await raw_method(**kwargs)
+            parsed = raw.parse()
+            usage = getattr(parsed, "usage", None)
+            slot.observe(headers=raw.headers, used_tokens=getattr(usage, "total_tokens", None))
+            return parsed
+
+        return await self._call(model, priority, tokens, _once)
+
+    @staticmethod
+    def _no_sdk_retries(client: openai.AsyncOpenAI) -> openai.AsyncOpenAI:
+        return client.with_options(max_retries=0)
+
+    async def create_response(self, client: openai.AsyncOpenAI, priority: LLMPriority, **kwargs):
+        """client.responses.create через планировщик"""
+        tokens = estimate_tokens(kwargs.get("instructions"), kwargs.get("input"))
+        return await self._call_raw(
+            self._no_sdk_retries(client).responses.with_raw_response.create, kwargs["model"], priority, tokens, **kwargs
+        )
+
+    async def parse_response(self, client: openai.AsyncOpenAI, priority: LLMPriority, **kwargs):
+        """client.responses.parse (structured output) через планировщик"""
+        tokens = estimate_tokens(kwargs.get("instructions"), kwargs.get("input"))
+        return await self._call_raw(
+            self._no_sdk_retries(client).responses.with_raw_response.parse, kwargs["model"], priority, tokens, **kwargs
+        )
+
+    async def transcribe(self, client: openai.AsyncOpenAI, priority: LLMPriority, tokens: int = DEFAULT_OUTPUT_TOKENS, **kwargs):
+        """client.audio.transcriptions.create через планировщик"""
+        return await self._call_raw(
+            self._no_sdk_retries(client).audio.transcriptions.with_raw_response.create, kwargs["model"], priority, tokens, **kwargs
+        )
+
+    async def run_agent(self, agent, priority: LLMPriority, **kwargs):
+        """
+        Runner.run через планировщик.
+        Слот берётся на каждый вызов модели (ход агента, хендофф), а не на весь прогон:
+        пока агент ждёт инструменты, бюджет свободен для других запросов.
+        Агенты, у которых model — готовый объект Model, а не имя, SDK вызывает в обход провайдера.
+        """
+        provider = _ScheduledModelProvider(self, priority)
+        run_config = kwargs.pop("run_config", None)
+        run_config = dataclasses.replace(run_config, model_provider=provider) if run_config else RunConfig(model_provider=provider)
+        return await Runner.run(agent, run_config=run_config, **kwargs)
+
+    def queue_depth(self, model: str) -> int:
+        """Сколько запросов к модели ждут своей очереди"""
+        budget = self._budgets.get(model)
+        return len(budget.waiters) if budget is not None else 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Метрики очередей и бюджетов по всем моделям"""
+        return {model: budget.snapshot() for model, budget in self._budgets.items()}
+
+
+class _ScheduledModel(Model):
+    """Модель SDK агентов, каждый запрос которой проходит через слот LLMScheduler"""
+
+    def __init__(self, inner: Model, model_name: str, scheduler: LLMScheduler, priority: LLMPriority) -> None:
+        self.inner = inner
+        self.model_name = model_name
+        self.scheduler = scheduler
+        self.priority = priority
+
+    async def get_response(self, system_instructions, input, *args, **kwargs):
+        async def _once(slot: LLMSlot):
+            resp = await self.inner.get_response(system_instructions, input, *args, **kwargs)
+            slot.observe(used_tokens=getattr(resp.usage, "total_tokens", None))
+            return resp
+
+        tokens = estimate_tokens(system_instructions, input)
+        return await self.scheduler._call(self.model_name, self.priority, tokens, _once)
+
+    async def stream_response(self, system_instructions, input, *args, **kwargs):
+        tokens = estimate_tokens(system_instructions, input)
+        async with self.scheduler.slot(self.model_name, self.priority, tokens):
+            async for event in self.inner.stream_response(system_instructions, input, *args, **kwargs):
+                yield event
+
+
+class _ScheduledModelProvider(ModelProvider):
+    """Провайдер моделей для Runner.run: оборачивает модели в _ScheduledModel с приоритетом прогона"""
+
+    # повторы 429 делает планировщик, поэтому у клиента SDK агентов свои повторы выключены
+    _inner: Optional[MultiProvider] = None
+
+    def __init__(self, scheduler: LLMScheduler, priority: LLMPriority) -> None:
+        self.scheduler = scheduler
+        self.priority = priority
+
+    @classmethod
+    def _get_inner(cls) -> MultiProvider:
+        if cls._inner is None:
+            cls._inner = MultiProvider(openai_client=openai.AsyncOpenAI(api_key=OPENAI_TOKEN, max_retries=0))
+        return cls._inner
+
+    def get_model(self, model_name: Optional[str]) -> Model:
+        # None — модель SDK по умолчанию; бюджет считаем по её реальному имени
+        name = model_name or get_default_model()
+        return _ScheduledModel(self._get_inner().get_model(name), name, self.scheduler, self.priority)
+
+
+llm_scheduler = LLMScheduler()
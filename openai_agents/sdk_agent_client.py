@@ -6,12 +6,12 @@ from functools import lru_cache
 from pathlib import Path
 from typing import Any, Dict, List
 
-from agents import Runner
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from chatwoot_api.chatwoot_client import ChatwootClient
 from db.models.chatwoot_conversation import ChatwootConversation
 from green_api.functions.get_instance_settings import get_instance_phone
+from openai_agents.llm_scheduler import llm_scheduler, LLMPriority
 from openai_agents.utils.formation_contact_correspondence import formation_contact_correspondence
 from settings import AGENTS_BY_CODE, INBOX_TO_TRANSPORT
 from openai_agents.agents.router_agent import build_new_router_agent
@@ -156,8 +156,9 @@ class SdkAgentsService:
 
             try:
                 t_start = time.perf_counter()
-                result = await Runner.run(
+                result = await llm_scheduler.run_agent(
                     router,
+                    LLMPriority.INTERACTIVE,
                     input=history,
                     context=Ctx(agent_code=self.agent_code, conversation_id=conv_id, db_session=session), # должно быть доступно в ctx.
                     max_turns=8,
@@ -0,0 +1,189 @@
+import asyncio
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional, Union
+
+from openai import AsyncOpenAI
+
+from openai_agents.llm_scheduler import llm_scheduler, LLMPriority
+from settings import (
+    OPENAI_TOKEN,
+    TRANSCRIBE_MODEL,
+    STT_ENGINE,
+    STT_LOCAL_MODEL,
+    STT_LOCAL_DEVICE,
+    STT_LOCAL_COMPUTE_TYPE,
+    STT_LOCAL_CPU_THREADS,
+    STT_LOCAL_WORKERS,
+    STT_LOCAL_MAX_DURATION,
+    STT_LOCAL_MAX_QUEUE,
+    STT_OPENAI_BUSY_QUEUE,
+)
+
+# file — путь, открытый файл или (имя, байты), как принимает OpenAI SDK
+AudioInput = Union[str, io.IOBase, tuple]
+
+
+@dataclass
+class LocalTranscript:
+    """Ответ локального движка — с полем text, как у транскрипта OpenAI"""
+    text: str
+    duration: float
+    language: Optional[str] = None
+
+
+class OpenAISTTEngine:
+    """Транскрибация через OpenAI API (gpt-4o-transcribe) с учётом бюджета LLMScheduler"""
+    name = "openai"
+
+    def __init__(self, api_key: str = OPENAI_TOKEN, model: str = TRANSCRIBE_MODEL):
+        self.client = AsyncOpenAI(api_key=api_key)
+        self.model = model
+
+    def queue_depth(self) -> int:
+        return llm_scheduler.queue_depth(self.model)
+
+    async def transcribe(self, file: AudioInput, language: str, priority: LLMPriority):
+        return await llm_scheduler.transcribe(self.client, priority, file=file, model=self.model, language=language)
+
+
+class FasterWhisperEngine:
+    """
+    Локальная транскрибация на CPU (faster-whisper / CTranslate2).
+    Модель грузится один раз на процесс при первом обращении, распознавание идёт
+    в собственном пуле потоков на STT_LOCAL_WORKERS задач — остальные ждут в очереди,
+    глубину которой видит роутер.
+    """
+    name = "local"
+
+    _model = None
+    _model_lock = threading.Lock()
+    _executor: Optional[ThreadPoolExecutor] = None
+
+    def __init__(self, model_size: str = STT_LOCAL_MODEL):
+        self.model_size = model_size
+        self._pending = 0
+
+    @staticmethod
+    def is_available() -> bool:
+        try:
+            import faster_whisper  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    @classmethod
+    def _get_model(cls, model_size: str):
+        if cls._model is None:
+            with cls._model_lock:
+                if cls._model is None:
+                    from faster_whisper import WhisperModel
+                    cls._model = WhisperModel(
+                        model_size,
+                        device=STT_LOCAL_DEVICE,
+                        compute_type=STT_LOCAL_COMPUTE_TYPE,
+                        cpu_threads=STT_LOCAL_CPU_THREADS,
+                    )
+        return cls._model
+
+    @classmethod
+    def _get_executor(cls) -> ThreadPoolExecutor:
+        if cls._executor is None:
+            cls._executor = ThreadPoolExecutor(max_workers=STT_LOCAL_WORKERS, thread_name_prefix="stt")
+        return cls._executor
+
+    def queue_depth(self) -> int:
+        return self._pending
+
+    def _run(self, file: AudioInput, language: str) -> LocalTranscript:
+        if isinstance(file, tuple):
+            file = io.BytesIO(file[1])
+        segments, info = self._get_model(self.model_size).transcribe(file, language=language, beam_size=1, vad_filter=True)
+        # segments — генератор, распознавание идёт при итерации
+        text = " ".join(s.text.strip() for s in segments).strip()
+        return LocalTranscript(text=text, duration=info.duration, language=info.language)
+
+    async def transcribe(self, file: AudioInput, language: str, priority: LLMPriority):
+        self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), self._run, file, language)
+        finally:
+            self._pending -= 1
+
+
+class STTRouter:
+    """
+    Выбор движка транскрибации.
+    STT_ENGINE = "openai" | "local" — всегда этот движок; "auto" — локально короткие записи
+    (до STT_LOCAL_MAX_DURATION секунд), пока локальная очередь меньше STT_LOCAL_MAX_QUEUE;
+    длинные — тоже локально, если очередь к OpenAI от STT_OPENAI_BUSY_QUEUE. Иначе — OpenAI.
+    """
+
+    def __init__(self, mode: str = STT_ENGINE):
+        self.mode = mode
+        self.openai = OpenAISTTEngine()
+        self.local = FasterWhisperEngine() if mode != "openai" and FasterWhisperEngine.is_available() else None
+
+    def choose(self, duration: Optional[float]):
+        if self.local is None or self.mode == "openai":
+            return self.openai
+        if self.mode == "local":
+            return self.local
+        if self.local.queue_depth() >= STT_LOCAL_MAX_QUEUE:
+            return self.openai
+        if duration is not None and duration <= STT_LOCAL_MAX_DURATION:
+            return self.local
+        if self.openai.queue_depth() >= STT_OPENAI_BUSY_QUEUE:
+            return self.local
+        return self.openai
+
+    def fallback(self, engine):
+        """Запасной движок, если выбранный упал"""
+        if engine is self.local:
+            return self.openai
+        return None
+
+
+_router: Optional[STTRouter] = None
+
+
+def get_stt_router() -> STTRouter:
+    """Роутер (и локальная модель) — один на процесс"""
+    global _router
+    if _router is None:
+        _router = STTRouter()
+    return _router
+
+
+def ogg_duration(data: bytes) -> Optional[float]:
+    """
+    Длительность OGG (Opus/Vorbis) по granule position последней страницы, без декодирования.
+    Частота granule берётся из заголовка потока: у Opus всегда 48 кГц (минус pre-skip),
+    у Vorbis — sample rate из identification header.
+    None — не OGG, другой кодек или не удалось разобрать.
+    """
+    if not data.startswith(b'OggS') or len(data) < 27:
+        return None
+    segments = data[26]
+    head = data[27 + segments:27 + segments + 16]
+    pre_skip = 0
+    if head.startswith(b'OpusHead') and len(head) >= 12:
+        rate = 48000
+        pre_skip = int.from_bytes(head[10:12], 'little')
+    elif head.startswith(b'\x01vorbis') and len(head) >= 16:
+        rate = int.from_bytes(head[12:16], 'little')
+    else:
+        return None
+    if rate <= 0:
+        return None
+
+    serial = data[14:18]
+    pos = data.rfind(b'OggS')
+    if pos < 0 or pos + 18 > len(data) or data[pos + 14:pos + 18] != serial:
+        return None
+    granule = int.from_bytes(data[pos + 6:pos + 14], 'little', signed=True)
+    if granule <= pre_skip:
+        return None
+    return (granule - pre_skip) / rate
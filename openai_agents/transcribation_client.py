@@ -1,47 +1,91 @@
 from datetime import timezone
+from typing import Optional
 
-from openai import AsyncOpenAI
 from sqlalchemy import select, update
 
 from bx24.bx_utils.parse_call_info import parse_call_info, build_call_summary
 from db.models.bx24_deal import Bx24Deal
 from db.models.bx_processed_call import BxProcessedCall
-from settings import OPENAI_TOKEN, AI_PROXY, TRANSCRIBE_MODEL
+from openai_agents.llm_scheduler import llm_scheduler, LLMPriority
+from openai_agents.stt_engines import get_stt_router, ogg_duration, OpenAISTTEngine
+from settings import TRANSCRIBE_MODEL
 
 from telegram.send_log import send_dev_telegram_log
 
 
 class TranscribeClient:
-    """Класс для работы с Whisper API (транскрибирование аудио)"""
+    """
+    Транскрибирование аудио. Движок (OpenAI или локальный faster-whisper)
+    выбирает STTRouter — см. openai_agents/stt_engines.py.
+    """
 
-    def __init__(self, api_key: str = OPENAI_TOKEN):
-        self.client = AsyncOpenAI(api_key=api_key)
-        # self.client = AsyncOpenAI(api_key=api_key, base_url=AI_PROXY)
+    def __init__(self, engine: Optional[str] = None):
+        self.router = get_stt_router()
+        # принудительный движок: "openai" | "local"
+        self.engine = engine
 
     async def transcribe(
         self,
         audio_file_path: str,
         model: str = TRANSCRIBE_MODEL,
         language: str = "ru",
+        priority: LLMPriority = LLMPriority.MEDIA,
+        duration: Optional[float] = None,
     ):
         """
-        Возвращает объект транскрипта (ответ SDK).
+        Возвращает объект транскрипта (ответ SDK или LocalTranscript) — у обоих есть .text
         """
-        try:
-            # Откроем файл и НЕ закрываем его, пока не завершится await
-            with open(audio_file_path, "rb") as f:
-                kwargs = dict(
-                    file=f,
-                    model=model,
-                    language=language,
-                )
+        return await self._transcribe(audio_file_path, model, language, priority, duration)
 
-                transcript = await self.client.audio.transcriptions.create(**kwargs)
-                return transcript
+    async def transcribe_bytes(
+        self,
+        audio: bytes,
+        file_name: str,
+        model: str = TRANSCRIBE_MODEL,
+        language: str = "ru",
+        priority: LLMPriority = LLMPriority.MEDIA,
+        duration: Optional[float] = None,
+    ):
+        """
+        То же, что transcribe, но аудио уже в памяти (см. utils.ffmpeg_stream_audio.fetch_audio_for_stt).
+        Формат API определяет по расширению file_name.
+        """
+        if duration is None:
+            duration = ogg_duration(audio)
+        return await self._transcribe((file_name, audio), model, language, priority, duration)
+
+    def _pick_engine(self, duration: Optional[float]):
+        if self.engine == "openai":
+            return self.router.openai
+        if self.engine == "local" and self.router.local is not None:
+            return self.router.local
+        return self.router.choose(duration)
+
+    async def _transcribe(self, file, model: str, language: str, priority: LLMPriority, duration: Optional[float]):
+        engine = self._pick_engine(duration)
+        while engine is not None:
+            try:
+                if isinstance(file, str):
+                    # Откроем файл и НЕ закрываем его, пока не завершится await
+                    with open(file, "rb") as f:
+                        return await self._call(engine, f, model, language, priority)
+                return await self._call(engine, file, model, language, priority)
+
+            except Exception as e:
+                fallback = self.router.fallback(engine)
+                await send_dev_telegram_log(
+                    f'[TranscribeClient.transcribe]\nОшибка транскрибации ({engine.name}): {e}'
+                    + (f'\nПовтор через {fallback.name}' if fallback else '')
+                )
+                if fallback is None:
+                    raise RuntimeError(f"Transcribe error: {type(e).__name__}: {e}") from e
+                engine = fallback
 
-        except Exception as e:
-            await send_dev_telegram_log(f'[TranscribeClient.transcribe]\nОшибка транскрибации: {e}')
-            raise RuntimeError(f"Transcribe error: {type(e).__name__}: {e}") from e
+    @staticmethod
+    async def _call(engine, file, model: str, language: str, priority: LLMPriority):
+        if isinstance(engine, OpenAISTTEngine) and model != engine.model:
+            return await llm_scheduler.transcribe(engine.client, priority, file=file, model=model, language=language)
+        return await engine.transcribe(file, language, priority)
 
     async def transcribe_calls_for_deal(self, session_maker, domain, deal_id, need_init=False):
         """
@@ -49,13 +93,13 @@ class TranscribeClient:
         Отправляет транскрибацию в виде комментария в таймлайне в сделке.
         """
         try:
-            async with session_maker() as s:
-                async with s.begin():
-                    deal_obj: Bx24Deal = await Bx24Deal.get_or_create(s, deal_id=deal_id, domain=domain)
-                    if need_init:
-                        ok, conversation_ids, _ = await deal_obj.init_chatwoot(s)
-                        if not ok or not conversation_ids:
-                            return
+            deal_obj: Bx24Deal = await Bx24Deal.load_or_create(deal_id=deal_id, domain=domain)
+            if not deal_obj:
+                return
+            if need_init:
+                ok, conversation_ids, _ = await deal_obj.init_chatwoot()
+                if not ok or not conversation_ids:
+                    return
 
             new_calls = await deal_obj.get_calls_since()
             if not new_calls:
@@ -0,0 +1,294 @@
+import asyncio
+import time
+from collections import defaultdict, deque
+from datetime import datetime, timezone, timedelta
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import select, update, or_, and_, exists, func
+from sqlalchemy.orm import aliased
+
+from bx24.bx_utils.portal_rate_limiter import PortalRateLimiter
+from db.models.outbound_message import (
+    OutboundMessage,
+    enqueue_outbound_message,
+    PRIORITY_INTERACTIVE,
+    PRIORITY_BULK,
+)
+from db.pool_metrics import short_transaction
+from green_api.green_api_client import GreenApiClient, GreenApiError
+from settings import (
+    INBOX_TO_TRANSPORT,
+    OUTBOUND_INSTANCE_RPS,
+    OUTBOUND_INSTANCE_BURST,
+    OUTBOUND_INSTANCE_INFLIGHT,
+    OUTBOUND_MAX_ATTEMPTS,
+    OUTBOUND_LEASE_SEC,
+    OUTBOUND_POLL_INTERVAL,
+)
+from telegram.send_log import send_dev_telegram_log
+from wappi.wappi_client import WappiError
+
+PENDING_STATUSES = ("new", "sending", "retry")
+
+
+class OutboundMetrics:
+    """
+    Метрики отправки по инстансам: отправлено/ошибки/повторы,
+    задержка от постановки в очередь до отправки и сообщений за последнюю минуту.
+    """
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._stats: Dict[str, dict] = {}
+
+    def _get(self, instance_id: str) -> dict:
+        st = self._stats.get(instance_id)
+        if st is None:
+            st = self._stats[instance_id] = {
+                'sent': 0, 'failed': 0, 'retried': 0, 'partial': 0,
+                'latency': deque(maxlen=self.window),
+                'sent_at': deque(maxlen=self.window),
+            }
+        return st
+
+    def observe_sent(self, instance_id: str, latency_sec: float) -> None:
+        st = self._get(instance_id)
+        st['sent'] += 1
+        st['latency'].append(latency_sec)
+        st['sent_at'].append(time.monotonic())
+
+    def observe_error(self, instance_id: str, final: bool) -> None:
+        self._get(instance_id)['failed' if final else 'retried'] += 1
+
+    def observe_partial(self, instance_id: str) -> None:
+        """Сообщение ушло не целиком: часть фрагментов не доставлена"""
+        self._get(instance_id)['partial'] += 1
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        out = {}
+        for instance_id, st in self._stats.items():
+            latency = sorted(st['latency'])
+            out[instance_id] = {
+                'sent': st['sent'],
+                'failed': st['failed'],
+                'retried': st['retried'],
+                'partial': st['partial'],
+                'sent_last_min': sum(1 for ts in st['sent_at'] if now - ts <= 60),
+                'latency_avg_s': round(sum(latency) / len(latency), 2) if latency else 0.0,
+                'latency_p95_s': round(latency[int(len(latency) * 0.95) - 1], 2) if latency else 0.0,
+                'latency_max_s': round(latency[-1], 2) if latency else 0.0,
+            }
+        return out
+
+
+outbound_metrics = OutboundMetrics()
+
+_limiters: Dict[str, PortalRateLimiter] = {}
+_wakeup: Optional[asyncio.Event] = None
+
+
+def _get_limiter(instance_id: str) -> PortalRateLimiter:
+    """Token bucket на инстанс транспорта"""
+    limiter = _limiters.get(instance_id)
+    if limiter is None:
+        limiter = _limiters[instance_id] = PortalRateLimiter(rps=OUTBOUND_INSTANCE_RPS, burst=OUTBOUND_INSTANCE_BURST)
+    return limiter
+
+
+def _wake_dispatcher() -> None:
+    if _wakeup is not None:
+        _wakeup.set()
+
+
+def priority_from_webhook(data: dict) -> int:
+    """Прогревы и рассылки помечаются BULK_SEND_ATTRIBUTES, всё остальное — ответы в диалоге"""
+    attrs = data.get("content_attributes") or {}
+    if isinstance(attrs, dict) and attrs.get("outbound_priority") == "bulk":
+        return PRIORITY_BULK
+    return PRIORITY_INTERACTIVE
+
+
+async def enqueue_outbound(session_maker, transport: str, inbox_id: int, phone: str, content: str, priority: int) -> int:
+    """
+    Ставит исходящее сообщение в очередь инстанса транспорта и будит диспетчер.
+    """
+    cfg = INBOX_TO_TRANSPORT[inbox_id]
+    async with short_transaction(session_maker) as session:
+        msg_id = await enqueue_outbound_message(
+            session,
+            transport=transport,
+            instance_id=cfg.instance_id,
+            inbox_id=inbox_id,
+            chat_id=phone,
+            content=content,
+            priority=priority,
+        )
+    _wake_dispatcher()
+    return msg_id
+
+
+async def _claim(session_maker, inflight: Dict[str, int]) -> list[OutboundMessage]:
+    """
+    Берёт в работу готовые сообщения: только первые неотправленные в своём чате,
+    по приоритету, не больше OUTBOUND_INSTANCE_INFLIGHT одновременно на инстанс.
+    Инстансы с пустым token bucket пропускаются — аренда не тратится на ожидание ведра.
+    """
+    o = OutboundMessage
+    earlier = aliased(OutboundMessage)
+    now = datetime.now(timezone.utc)
+    saturated = [iid for iid, n in inflight.items() if n >= OUTBOUND_INSTANCE_INFLIGHT]
+
+    stmt = (
+        select(o)
+        .where(
+            or_(
+                and_(o.status.in_(("new", "retry")), o.next_run_at <= func.now()),
+                and_(o.status == "sending", o.locked_until < func.now()),
+            ),
+            ~exists().where(
+                earlier.instance_id == o.instance_id,
+                earlier.chat_id == o.chat_id,
+                earlier.id < o.id,
+                earlier.status.in_(PENDING_STATUSES),
+            ),
+        )
+        .order_by(o.priority, o.id)
+        .with_for_update(skip_locked=True, of=o)
+        .limit(OUTBOUND_INSTANCE_INFLIGHT * 8)
+    )
+    if saturated:
+        stmt = stmt.where(o.instance_id.notin_(saturated))
+
+    async with short_transaction(session_maker) as session:
+        rows = (await session.scalars(stmt)).all()
+        picked = []
+        quota = defaultdict(int)
+        for msg in rows:
+            if inflight.get(msg.instance_id, 0) + quota[msg.instance_id] >= OUTBOUND_INSTANCE_INFLIGHT:
+                continue
+            if not _get_limiter(msg.instance_id).has_token():
+                continue
+            quota[msg.instance_id] += 1
+            picked.append(msg)
+        if picked:
+            await session.execute(
+                update(o)
+                .where(o.id.in_([m.id for m in picked]))
+                .values(
+                    status="sending",
+                    attempt=o.attempt + 1,
+                    locked_until=now + timedelta(seconds=OUTBOUND_LEASE_SEC),
+                )
+            )
+    return picked
+
+
+async def _send(msg: OutboundMessage, release: Callable[[], None]) -> None:
+    """
+    Отправка через транспорт инстанса; исключение — сообщение не ушло.
+    Каждый фрагмент (запрос к API транспорта) берёт токен лимитера инстанса.
+    release освобождает слот инстанса, когда все фрагменты ушли и остаётся только ждать доставку файла Wappi.
+    """
+    cfg = INBOX_TO_TRANSPORT[msg.inbox_id]
+    limiter = _get_limiter(msg.instance_id)
+    if msg.transport == "wa":
+        results = await GreenApiClient.for_config(cfg).send_split_message(msg.chat_id, msg.content, limiter=limiter)
+        failed = [r for r in results if not r.ok]
+        if results and len(failed) == len(results):
+            raise GreenApiError(failed[0].error)
+    elif msg.transport == "tg":
+        async with cfg.get_wappi_client() as tg_client:
+            results = await tg_client.send_split_message(msg.chat_id, msg.content, on_accepted=release, limiter=limiter)
+        failed = [r for r in results if not r.ok]
+        # файл с task_id Wappi принял — повтор мог бы продублировать его клиенту
+        if results and all(not r.ok and not r.task_id for r in results):
+            raise WappiError(failed[0].error)
+    else:
+        raise ValueError(f"Unsupported transport: {msg.transport}")
+
+    if failed:
+        # часть фрагментов ушла — повтор продублировал бы их клиенту
+        outbound_metrics.observe_partial(msg.instance_id)
+        await send_dev_telegram_log(
+            f'[outbound_dispatcher]\nНе доставлено {len(failed)} из {len(results)} фрагментов\nmsg_id: {msg.id}\ninbox_id: {msg.inbox_id}',
+            'WARNING'
+        )
+
+
+async def _deliver(session_maker, msg: OutboundMessage, inflight: Dict[str, int]) -> None:
+    released = False
+
+    def release() -> None:
+        nonlocal released
+        if not released:
+            released = True
+            inflight[msg.instance_id] -= 1
+            _wake_dispatcher()
+
+    try:
+        error = None
+        try:
+            await _send(msg, release)
+        except Exception as e:
+            error = e
+
+        now = datetime.now(timezone.utc)
+        attempt = msg.attempt + 1
+        if error is None:
+            values = {"status": "done", "sent_at": now, "locked_until": None, "last_error": None}
+            outbound_metrics.observe_sent(msg.instance_id, (now - msg.created_at).total_seconds())
+        elif attempt >= OUTBOUND_MAX_ATTEMPTS:
+            values = {"status": "failed", "locked_until": None, "last_error": str(error)[:2000]}
+            outbound_metrics.observe_error(msg.instance_id, final=True)
+            await send_dev_telegram_log(
+                f'[outbound_dispatcher]\nСообщение не отправлено после {attempt} попыток\nmsg_id: {msg.id}\ninbox_id: {msg.inbox_id}\nchat: {msg.chat_id}\nERROR: {error}',
+                'ERROR'
+            )
+        else:
+            values = {
+                "status": "retry",
+                "locked_until": None,
+                "last_error": str(error)[:2000],
+                "next_run_at": now + timedelta(seconds=min(300, 5 * 2 ** attempt)),
+            }
+            outbound_metrics.observe_error(msg.instance_id, final=False)
+
+        async with short_transaction(session_maker) as session:
+            await session.execute(update(OutboundMessage).where(OutboundMessage.id == msg.id).values(**values))
+    except Exception as e:
+        await send_dev_telegram_log(f'[outbound_dispatcher]\nmsg_id: {msg.id}\nERROR: {e}', 'ERROR')
+    finally:
+        release()
+
+
+async def run_outbound_dispatcher(app):
+    """
+    Диспетчер исходящих сообщений: FIFO внутри чата, приоритет ответов агентов над рассылками,
+    token bucket на инстанс. Очередь в Postgres — после рестарта отправка продолжается.
+    """
+    global _wakeup
+    _wakeup = asyncio.Event()
+    session_maker = app["db_sessionmaker"]
+    inflight: Dict[str, int] = defaultdict(int)
+    tasks: set[asyncio.Task] = set()
+
+    while True:
+        _wakeup.clear()
+        claimed = []
+        try:
+            claimed = await _claim(session_maker, inflight)
+        except Exception as e:
+            await send_dev_telegram_log(f'[outbound_dispatcher] claim error: {e}', 'ERROR')
+
+        for msg in claimed:
+            inflight[msg.instance_id] += 1
+            task = asyncio.create_task(_deliver(session_maker, msg, inflight))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        if not claimed:
+            try:
+                await asyncio.wait_for(_wakeup.wait(), timeout=OUTBOUND_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,23 @@
+from aiohttp import web
+from sqlalchemy import select, func
+
+from db.models.outbound_message import OutboundMessage
+from outbound.dispatcher import outbound_metrics, PENDING_STATUSES
+
+
+async def handle_outbound_metrics(request: web.Request) -> web.Response:
+    """
+    Возвращает метрики исходящей очереди по инстансам:
+    отправлено/ошибки, задержка постановка→отправка, сообщений за минуту и текущая длина очереди.
+    """
+    async with request.app["db_sessionmaker"]() as session:
+        rows = (await session.execute(
+            select(OutboundMessage.instance_id, func.count())
+            .where(OutboundMessage.status.in_(PENDING_STATUSES))
+            .group_by(OutboundMessage.instance_id)
+        )).all()
+    data = {
+        'queue': {instance_id: count for instance_id, count in rows},
+        'instances': outbound_metrics.snapshot(),
+    }
+    return web.json_response(data, status=200)
@@ -3,6 +3,8 @@ from dotenv import load_dotenv
 
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 
+from bx24.functions.marker_notifier import marker_notifier
+from db.models.bx24_deal import Bx24Deal
 from openai_agents.crons.smart_warm_up import smart_warm_up
 from settings import DATABASE_URL
 
@@ -10,10 +12,13 @@ from settings import DATABASE_URL
 async def main():
     engine = create_async_engine(DATABASE_URL, echo=False, future=True)
     Session = async_sessionmaker(engine, expire_on_commit=False)
+    Bx24Deal.configure_sessionmaker(Session)
 
     async with Session() as session:
         await smart_warm_up(session)
 
+    # уведомления о маркерах уходят в фоне — дожидаемся их до закрытия loop
+    await marker_notifier.drain(timeout=120)
     await engine.dispose()
 
 
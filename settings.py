@@ -72,6 +72,12 @@ but_map_dict = {
     FORESTVOLOGDA_DOMAIN: fv_but,
 }
 
+# Порталы, события сделок которых забираем через event.offline.get (вместо/в дополнение к вебхуку)
+BX_OFFLINE_EVENTS_PORTALS: list[str] = []
+BX_OFFLINE_EVENTS_INTERVAL = 10 # секунд между выборками
+BX_OFFLINE_EVENTS_CONCURRENCY = 4 # сделок синхронизируется одновременно
+BX_OFFLINE_EVENTS_MAX_BATCHES = 20 # пачек по 50 событий за одну выборку
+
 # Database
 DATABASE_USER = os.getenv('DATABASE_USER')
 DATABASE_PASSWORD=os.getenv('DATABASE_PASSWORD')
@@ -91,6 +97,50 @@ MODEL_MAIN = "gpt-5.1"
 MODEL_MINI = "gpt-5-mini"
 TRANSCRIBE_MODEL = "gpt-4o-transcribe"
 
+# Лимиты OpenAI по моделям (запросов и токенов в минуту) для LLMScheduler.
+# Стартовые значения — после первых ответов уточняются по заголовкам x-ratelimit-*
+LLM_MODEL_LIMITS = {
+    MODEL_MAIN: {'rpm': 500, 'tpm': 450_000},
+    MODEL_MINI: {'rpm': 500, 'tpm': 2_000_000},
+    "gpt-5": {'rpm': 500, 'tpm': 450_000},
+    TRANSCRIBE_MODEL: {'rpm': 500, 'tpm': 100_000},
+}
+LLM_DEFAULT_LIMITS = {'rpm': 500, 'tpm': 200_000}
+
+# Транскрибация: "openai" | "local" (faster-whisper на CPU) | "auto" — выбор по длительности и очередям
+# local/auto — только после замеров bench_stt_engines.py и установки requirements-stt.txt
+STT_ENGINE = "openai"
+STT_LOCAL_MODEL = "small"
+STT_LOCAL_DEVICE = "cpu"
+STT_LOCAL_COMPUTE_TYPE = "int8"
+STT_LOCAL_CPU_THREADS = 4
+STT_LOCAL_WORKERS = 1 # одновременных распознаваний на процесс
+STT_LOCAL_MAX_DURATION = 120 # секунд — длиннее в режиме auto уходит в OpenAI
+STT_LOCAL_MAX_QUEUE = 4 # при такой локальной очереди — в OpenAI
+STT_OPENAI_BUSY_QUEUE = 5 # при такой очереди к OpenAI длинные записи тоже распознаём локально
+
+# Предобработка картинок перед vision: уменьшение, перекодирование без EXIF, отправка data URL
+IMAGE_PREPROCESS_ENABLED = True
+IMAGE_MAX_SIDE = 1536 # px по большей стороне; больше для detail=high модель всё равно ужмёт
+IMAGE_FORMAT = "WEBP" # или "JPEG"
+IMAGE_QUALITY = 80
+IMAGE_DETAIL_DEFAULT = "auto" # low | high | auto
+
+# Кэш результатов анализа изображений/документов (суммарный объём summary в БД)
+MEDIA_CACHE_MAX_BYTES = 1024**2 * 50 # 50 МБ
+
+# Пул процессов для извлечения текста из DOCX/XLSX
+DOC_CONVERT_WORKERS = 2
+DOC_CONVERT_TIMEOUT = 60 # секунд на одну конвертацию
+DOC_CONVERT_MEMORY_LIMIT = 1024**3 # 1 ГБ адресного пространства на воркер
+DOC_TEXT_MAX_CHARS = 300_000 # больше — обрезаем перед отправкой в LLM
+DOC_DOWNLOAD_MAX_BYTES = 1024**2 * 50 # документы больше не скачиваем и не анализируем
+
+# Бюджет анализа PDF: страниц в выборке и токенов текста; без текстового слоя — PDF из выбранных страниц
+PDF_MAX_PAGES = 20
+PDF_TOKEN_BUDGET = 40_000
+PDF_MIN_TEXT_CHARS_PER_PAGE = 200 # меньше в среднем — считаем, что текстового слоя нет
+
 SERVER_PROMPT_PATH = '/opt/mbk/mbk_chat/openai_agents/prompts'
 STYLE_BLOCK_PATH = f"{SERVER_PROMPT_PATH}/reusable/style.txt"
 MAIN_BLOCK_PATH = f"{SERVER_PROMPT_PATH}/reusable/main_info.txt"
@@ -103,10 +153,30 @@ PRODUCT_PICKER_PROMPT_PATH = f"{SERVER_PROMPT_PATH}/reusable/product_picker_agen
 ROUTER_PROMPT_PATH = f"{SERVER_PROMPT_PATH}/reusable/router_agent.txt"
 WARMUP_PROMPT_PATH = f"{SERVER_PROMPT_PATH}/reusable/warmup_agent.txt"
 
+# Очередь исходящих сообщений в транспорты (Green API / Wappi)
+OUTBOUND_QUEUE_ENABLED = True
+OUTBOUND_INSTANCE_RPS = 1.0 # сообщений в секунду на один инстанс
+OUTBOUND_INSTANCE_BURST = 3
+OUTBOUND_INSTANCE_INFLIGHT = 2 # одновременно взятых в работу сообщений на инстанс
+OUTBOUND_MAX_ATTEMPTS = 5
+OUTBOUND_LEASE_SEC = 900 # через сколько зависшая отправка снова берётся в работу (дольше ожидания доставки файла Wappi)
+OUTBOUND_POLL_INTERVAL = 1.0
+
+INSTANCE_SETTINGS_TTL = 6 * 3600 # секунд до фонового обновления кэша настроек инстанса
+
 # CHATWOOT
 CHATWOOT_API_TOKEN = os.getenv('CHATWOOT_API_TOKEN')
 CHATWOOT_HOST = os.getenv('CHATWOOT_HOST')
 CHATWOOT_ACCOUNT_ID = os.getenv('CHATWOOT_ACCOUNT_ID')
+# TTL кэша GET-ответов Chatwoot по типу ресурса (секунды); 0 или отсутствие — только схлопывание одновременных запросов
+CHATWOOT_GET_CACHE_TTL: dict[str, float] = {
+    'conversation': 5,
+    'contact': 30,
+}
+CHATWOOT_GET_CACHE_MAX_ITEMS = 2000
+CHATWOOT_LIST_CONCURRENCY = 4 # страниц списка диалогов запрашивается одновременно
+CHATWOOT_BULK_CONCURRENCY = 5 # одновременных отправок при рассылке заметок по диалогам
+MARKER_NOTIFY_COOLDOWN = 600 # секунд, в течение которых повторный маркер в диалоге не шлёт уведомление
 
 AI_OPERATOR_CHATWOOT_IDS = [13, 14]
 
@@ -1,20 +1,29 @@
+import re
+
+MARKERS = [
+    "звонок", "созвон", "перезвон", "в офис", "бот", "робот", "позвон",
+    "встреча", "встретимся", "встретиться", "о встрече", "позови", "шоурум", "шоу рум",
+    "менеджер", "звони", "свяжется"
+]
+
+# Один регекс на все маркеры: маркер должен начинаться с начала слова (окончания допускаются — "перезвоните"),
+# длинные маркеры раньше коротких, пробел внутри маркера — любой пробельный промежуток.
+_MARKERS_RE = re.compile(
+    r"(?<!\w)(?:"
+    + "|".join(re.escape(m).replace(r"\ ", r"\s+") for m in sorted(MARKERS, key=len, reverse=True))
+    + r")",
+    re.IGNORECASE,
+)
 
 
 def check_message_for_markers(message: str):
     """
     Проверяет содержание сообщения.
-    Возвращает True, если в сообщении есть любой из маркеров.
+    Возвращает первый найденный в тексте маркер или None.
     """
-    text = message.lower()
-
-    markers = [
-        "звонок", "созвон", "перезвон", "в офис", " бот", "робот", "позвон",
-        "встреча", "встретимся", "встретиться", "о встрече", "позови", "шоурум", "шоу рум",
-        "менеджер", "звони", "свяжется"
-    ]
-
-    for marker in markers:
-        if marker in text:
-            return marker
-
-    return None
\ No newline at end of file
+    if not message:
+        return None
+    match = _MARKERS_RE.search(message)
+    if not match:
+        return None
+    return " ".join(match.group(0).lower().split())
@@ -0,0 +1,154 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional
+
+from settings import (
+    DOC_CONVERT_WORKERS,
+    DOC_CONVERT_TIMEOUT,
+    DOC_CONVERT_MEMORY_LIMIT,
+    PDF_MAX_PAGES,
+    PDF_TOKEN_BUDGET,
+    PDF_MIN_TEXT_CHARS_PER_PAGE,
+)
+from telegram.send_log import send_dev_telegram_log
+
+
+def _limit_worker_memory(memory_limit: int) -> None:
+    """Инициализатор воркера: ограничивает адресное пространство процесса"""
+    try:
+        import resource
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+    except (ImportError, ValueError, OSError):
+        # не Linux или лимит не поддерживается — работаем без него
+        pass
+
+
+TEXT_EXTENSIONS = (".txt", ".csv", ".md", ".html", ".htm", ".json", ".xml")
+
+
+def _extract_text_job(raw: bytes, ext: str) -> str:
+    """
+    Выполняется в отдельном процессе: DOCX → HTML (без картинок), XLSX → markdown по всем листам,
+    текстовые форматы — как есть. Для неизвестного расширения пробует DOCX, затем XLSX.
+    """
+    from utils.docx_to_html import docx_to_html
+    from utils.xlsx_to_html import xlsx_to_markdown
+
+    if ext == ".docx":
+        return docx_to_html(raw, inline_images=False)
+    if ext in (".xlsx", ".xls"):
+        return xlsx_to_markdown(raw, include_formulas=True, include_comments=True)
+    if ext in TEXT_EXTENSIONS:
+        return raw.decode("utf-8", errors="replace")
+
+    tried = []
+    try:
+        return docx_to_html(raw, inline_images=False)
+    except Exception as e1:
+        tried.append(f"DOCX:{e1}")
+    try:
+        return xlsx_to_markdown(raw, include_formulas=True, include_comments=True)
+    except Exception as e2:
+        tried.append(f"XLSX:{e2}")
+    raise ValueError(f"Неподдерживаемый формат. Попытки: {', '.join(tried)}")
+
+
+def _prepare_pdf_job(raw: bytes, max_pages: int, max_chars: int, min_chars_per_page: int) -> Dict[str, Any]:
+    """Выполняется в отдельном процессе: текстовый слой или урезанный PDF в пределах бюджета"""
+    from utils.pdf_budget import prepare_pdf
+
+    return prepare_pdf(raw, max_pages, max_chars, min_chars_per_page)
+
+
+class DocumentConvertPool:
+    """
+    Пул процессов для тяжёлых конвертаций документов (mammoth, pandas/openpyxl).
+    Держит event loop свободным: одновременно выполняется не больше max_workers задач,
+    каждая ограничена по времени и по памяти. Зависший воркер убивается вместе с пулом,
+    следующий вызов поднимает пул заново.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = DOC_CONVERT_WORKERS,
+        timeout: float = DOC_CONVERT_TIMEOUT,
+        memory_limit: int = DOC_CONVERT_MEMORY_LIMIT,
+    ):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._sem: Optional[asyncio.Semaphore] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_limit_worker_memory,
+                initargs=(self.memory_limit,),
+                max_tasks_per_child=50,
+            )
+        return self._executor
+
+    def _kill_executor(self, executor: ProcessPoolExecutor) -> None:
+        """Принудительно завершает воркеры пула (например, после таймаута задачи)"""
+        if self._executor is executor:
+            self._executor = None
+        for proc in list((getattr(executor, "_processes", None) or {}).values()):
+            try:
+                proc.kill()
+            except Exception:
+                pass
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _run(self, label: str, size: int, fn, *args):
+        """Выполняет fn(*args) в воркере с таймаутом; зависший или упавший пул пересоздаётся"""
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.max_workers)
+
+        async with self._sem:
+            loop = asyncio.get_running_loop()
+            executor = self._get_executor()
+            future = loop.run_in_executor(executor, fn, *args)
+            try:
+                return await asyncio.wait_for(future, timeout=self.timeout)
+            except asyncio.TimeoutError:
+                self._kill_executor(executor)
+                await send_dev_telegram_log(
+                    f'[DocumentConvertPool]\nТаймаут конвертации {label} ({size} байт) > {self.timeout} c',
+                    'ERROR',
+                )
+                raise RuntimeError(f"Конвертация документа превысила {self.timeout} c")
+            except (BrokenProcessPool, MemoryError) as e:
+                self._kill_executor(executor)
+                await send_dev_telegram_log(
+                    f'[DocumentConvertPool]\nВоркер упал при конвертации {label} ({size} байт): {e!r}',
+                    'ERROR',
+                )
+                raise RuntimeError(f"Воркер конвертации упал: {e!r}")
+
+    async def extract_text(self, raw: bytes, ext: str, label: str = "Document") -> str:
+        """
+        Извлекает текст документа (HTML/markdown/plain) в отдельном процессе.
+        Бросает RuntimeError при таймауте/падении воркера и ValueError при неподдерживаемом формате.
+        """
+        return await self._run(label, len(raw), _extract_text_job, raw, ext)
+
+    async def prepare_pdf(self, raw: bytes, label: str = "Document") -> Dict[str, Any]:
+        """
+        PDF в пределах бюджета PDF_MAX_PAGES страниц / PDF_TOKEN_BUDGET токенов (см. utils.pdf_budget.prepare_pdf).
+        Бросает RuntimeError при таймауте/падении воркера и ValueError для зашифрованного PDF.
+        """
+        # ≈3 символа на токен, как в estimate_tokens
+        return await self._run(label, len(raw), _prepare_pdf_job, raw, PDF_MAX_PAGES, PDF_TOKEN_BUDGET * 3, PDF_MIN_TEXT_CHARS_PER_PAGE)
+
+    def shutdown(self) -> None:
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+document_convert_pool = DocumentConvertPool()
@@ -5,18 +5,20 @@ import mammoth
 
 MAX_FILE_SIZE = 10 * 1024 * 1024
 
-def docx_to_html(docx_bytes: bytes) -> str:
+def docx_to_html(docx_bytes: bytes, inline_images: bool = True) -> str:
     """
     Форматирует docx в html
+    inline_images=False — картинки не встраиваются (для отправки в LLM текстом)
     """
 
     if len(docx_bytes) > MAX_FILE_SIZE:
         raise ValueError(f"Файл слишком большой (> {MAX_FILE_SIZE} байт)")
 
     # Картинки инлайним как data-uri, чтобы xhtml2pdf их видел
-    result = mammoth.convert_to_html(
-        io.BytesIO(docx_bytes),
-        convert_image=mammoth.images.inline(mammoth.images.base64),
-    )
+    if inline_images:
+        convert_image = mammoth.images.inline(mammoth.images.base64)
+    else:
+        convert_image = mammoth.images.img_element(lambda image: {"alt": image.alt_text or "изображение"})
+    result = mammoth.convert_to_html(io.BytesIO(docx_bytes), convert_image=convert_image)
     html = result.value
     return re.sub(r"[\x00-\x08\x0B\x0C\x0E-\x1F]", "", html)
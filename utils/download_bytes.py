@@ -1,11 +1,27 @@
+from typing import Optional
+
 import aiohttp
 
 
-async def download_bytes(url: str, timeout: float = 60.0) -> bytes:
-    """
+class DownloadTooLarge(ValueError):
+    pass
 
+
+async def download_bytes(url: str, timeout: float = 60.0, max_bytes: Optional[int] = None) -> bytes:
+    """
+    Скачивает файл в память. С max_bytes читает потоком и прерывает загрузку,
+    как только размер (по Content-Length или по факту) превышает лимит — DownloadTooLarge.
     """
     async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=timeout)) as sess:
         async with sess.get(url, allow_redirects=True) as r:
             r.raise_for_status()
-            return await r.read()
+            if max_bytes is None:
+                return await r.read()
+            if (r.content_length or 0) > max_bytes:
+                raise DownloadTooLarge(f"Файл больше {max_bytes} байт ({r.content_length})")
+            buf = bytearray()
+            async for chunk in r.content.iter_chunked(1024 * 64):
+                buf += chunk
+                if len(buf) > max_bytes:
+                    raise DownloadTooLarge(f"Файл больше {max_bytes} байт")
+            return bytes(buf)
@@ -0,0 +1,120 @@
+import asyncio
+import contextlib
+import os
+import tempfile
+from pathlib import Path
+from typing import AsyncIterator, Optional, Tuple
+
+import aiohttp
+from imageio_ffmpeg import get_ffmpeg_exe
+
+CHUNK = 1024 * 64
+# лимит загрузки файла в Whisper API
+MAX_STT_BYTES = 1024**2 * 25
+FFMPEG_TIMEOUT = 180
+# моно 16 кГц Opus — для распознавания речи достаточно, минута ≈ 180 КБ
+FFMPEG_OUT_ARGS = ('-vn', '-ac', '1', '-ar', '16000', '-c:a', 'libopus', '-b:a', '24k', '-f', 'ogg', 'pipe:1')
+
+
+def _is_ogg(head: bytes) -> bool:
+    """OGG (голосовые WhatsApp/Telegram — Opus) Whisper принимает как есть"""
+    return head.startswith(b'OggS')
+
+
+def _is_mp4(head: bytes) -> bool:
+    """mp4/m4a: индекс (moov) бывает в конце файла, из pipe такой не прочитать"""
+    return head[4:8] == b'ftyp'
+
+
+async def _read_head(resp: aiohttp.ClientResponse, size: int = 12) -> bytes:
+    head = b''
+    while len(head) < size:
+        chunk = await resp.content.read(CHUNK)
+        if not chunk:
+            break
+        head += chunk
+    return head
+
+
+async def _iter_body(head: bytes, resp: aiohttp.ClientResponse) -> AsyncIterator[bytes]:
+    if head:
+        yield head
+    async for chunk in resp.content.iter_chunked(CHUNK):
+        if chunk:
+            yield chunk
+
+
+async def _ffmpeg_to_memory(src: str, feed: Optional[AsyncIterator[bytes]] = None) -> bytes:
+    """
+    ffmpeg src -> сжатый моно Opus в памяти.
+    При feed исходник подаётся в stdin по мере скачивания (src = 'pipe:0').
+    """
+    proc = await asyncio.create_subprocess_exec(
+        get_ffmpeg_exe(), '-hide_banner', '-loglevel', 'error', '-i', src, *FFMPEG_OUT_ARGS,
+        stdin=asyncio.subprocess.PIPE if feed is not None else asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+
+    async def _feed():
+        try:
+            async for chunk in feed:
+                proc.stdin.write(chunk)
+                await proc.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            # ffmpeg завершился раньше — причину покажет код возврата
+            pass
+        finally:
+            proc.stdin.close()
+
+    jobs = [proc.stdout.read(), proc.stderr.read()]
+    if feed is not None:
+        jobs.append(_feed())
+    try:
+        out, err, *_ = await asyncio.wait_for(asyncio.gather(*jobs), timeout=FFMPEG_TIMEOUT)
+        await proc.wait()
+    finally:
+        if proc.returncode is None:
+            with contextlib.suppress(ProcessLookupError):
+                proc.kill()
+            await proc.wait()
+
+    if proc.returncode != 0:
+        raise RuntimeError(err.decode(errors='ignore') or 'ffmpeg failed')
+    if not out:
+        raise RuntimeError('ffmpeg: пустой результат')
+    return out
+
+
+async def fetch_audio_for_stt(session: aiohttp.ClientSession, url: str, file_name: str = 'voice') -> Tuple[str, bytes]:
+    """
+    Скачивает аудио и готовит его к отправке в STT без промежуточных файлов.
+    Возвращает (имя файла для загрузки, содержимое).
+    OGG/Opus отдаётся как есть; остальное на лету перекодируется ffmpeg из потока скачивания.
+    mp4/m4a из pipe не читаются — для них исходник пишется в уникальный temp-файл.
+    """
+    stem = Path(file_name).stem or 'voice'
+    async with session.get(url, timeout=aiohttp.ClientTimeout(total=120)) as resp:
+        resp.raise_for_status()
+        head = await _read_head(resp)
+
+        if _is_ogg(head):
+            buf = bytearray()
+            async for chunk in _iter_body(head, resp):
+                buf += chunk
+                if len(buf) > MAX_STT_BYTES:
+                    raise RuntimeError(f'Аудио больше {MAX_STT_BYTES} байт')
+            return f'{stem}.ogg', bytes(buf)
+
+        if not _is_mp4(head):
+            return f'{stem}.ogg', await _ffmpeg_to_memory('pipe:0', _iter_body(head, resp))
+
+        fd, tmp_path = tempfile.mkstemp(prefix='voice_', suffix=Path(file_name).suffix or '.m4a')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                async for chunk in _iter_body(head, resp):
+                    await asyncio.to_thread(f.write, chunk)
+            return f'{stem}.ogg', await _ffmpeg_to_memory(tmp_path)
+        finally:
+            with contextlib.suppress(Exception):
+                os.remove(tmp_path)
@@ -1,6 +1,7 @@
 from datetime import datetime
 
 from chatwoot_api.chatwoot_client import ChatwootClient
+from openai_agents.llm_scheduler import llm_scheduler, LLMPriority
 from settings import OPENAI_TOKEN
 from telegram.send_log import send_dev_telegram_log
 from utils.normalize_phone import normalize_phone
@@ -131,7 +132,9 @@ async def get_message_from_ai(lead_data: Dict[str, Any], inbox_id: int) -> str:
     history.append({"role": "user", "content": json.dumps(user_payload, ensure_ascii=False)})
     try:
         openai_client = AsyncOpenAI(api_key=OPENAI_TOKEN)
-        resp = await openai_client.responses.parse(
+        resp = await llm_scheduler.parse_response(
+            openai_client,
+            LLMPriority.INTERACTIVE,
             model="gpt-5",
             instructions=prompt,
             input=history,
@@ -0,0 +1,59 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Optional, Tuple, Type
+
+import aiohttp
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class HTTPStatusError(Exception):
+    """Ответ не 2xx — поднимается из одной попытки запроса, решение о повторе принимает request_with_retries"""
+
+    def __init__(self, status: int, body: str, retry_after: Optional[str] = None) -> None:
+        super().__init__(f"HTTP {status}")
+        self.status = status
+        self.body = body
+        self.retry_after = retry_after
+
+
+async def raise_for_status(resp: aiohttp.ClientResponse) -> None:
+    """HTTPStatusError для ответа не 2xx (тело и Retry-After сохраняются)"""
+    if not 200 <= resp.status < 300:
+        raise HTTPStatusError(resp.status, await resp.text(), resp.headers.get("Retry-After"))
+
+
+async def request_with_retries(
+        attempt: Callable[[], Awaitable[Any]],
+        error_cls: Type[Exception],
+        label: str,
+        max_retries: int = 3,
+        base_delay: float = 1.0,
+        retry_statuses: Tuple[int, ...] = RETRY_STATUSES,
+) -> Any:
+    """
+    Выполняет attempt() с повтором на retry_statuses (с учётом Retry-After) и ошибках соединения,
+    экспоненциальная пауза от base_delay.
+    Таймаут и прочие ошибки aiohttp не повторяются: запрос мог дойти до сервера, повтор задвоил бы отправку.
+    Все ошибки HTTP и сети поднимаются как error_cls с label в начале сообщения.
+    """
+    delay = base_delay
+    for n in range(max_retries + 1):
+        try:
+            return await attempt()
+        except HTTPStatusError as e:
+            if e.status not in retry_statuses or n == max_retries:
+                raise error_cls(f"{label}: HTTP {e.status}. Body: {e.body[:500]}") from None
+            retry_after = e.retry_after
+        except aiohttp.ClientConnectorError as e:
+            # соединение не установлено — запрос точно не ушёл, повтор безопасен
+            if n == max_retries:
+                raise error_cls(f"{label}: {e}") from e
+            retry_after = None
+        except asyncio.TimeoutError as e:
+            raise error_cls(f"{label}: таймаут") from e
+        except aiohttp.ClientError as e:
+            raise error_cls(f"{label}: {e!r}") from e
+
+        wait = float(retry_after) if retry_after and retry_after.isdigit() else delay
+        await asyncio.sleep(wait)
+        delay *= 2
@@ -0,0 +1,62 @@
+import base64
+import io
+from dataclasses import dataclass
+from typing import Optional
+
+from PIL import Image, ImageOps
+
+from settings import IMAGE_MAX_SIDE, IMAGE_FORMAT, IMAGE_QUALITY
+
+
+@dataclass
+class PreparedImage:
+    data_url: str
+    width: int
+    height: int
+    source_bytes: int
+    prepared_bytes: int
+
+
+def detect_image_mime(raw: bytes) -> Optional[str]:
+    """
+    MIME по сигнатуре файла для форматов, которые принимает vision-модель (JPEG, PNG, WebP, GIF).
+    None — другой формат (HEIC и т.п.) или не картинка.
+    """
+    if raw.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if raw.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if raw[:4] == b"RIFF" and raw[8:12] == b"WEBP":
+        return "image/webp"
+    if raw.startswith((b"GIF87a", b"GIF89a")):
+        return "image/gif"
+    return None
+
+
+def prepare_image(raw: bytes, max_side: int = IMAGE_MAX_SIDE, fmt: str = IMAGE_FORMAT, quality: int = IMAGE_QUALITY) -> PreparedImage:
+    """
+    Готовит фото к отправке в vision-модель: поворот по EXIF, уменьшение до max_side по большей стороне,
+    перекодирование в WebP/JPEG без метаданных. CPU-задача — вызывать через asyncio.to_thread.
+    """
+    img = Image.open(io.BytesIO(raw))
+    # JPEG декодируется сразу в уменьшенном масштабе (1/2, 1/4, 1/8) — 12 Мп не распаковываем целиком
+    img.draft("RGB", (max_side, max_side))
+    img = ImageOps.exif_transpose(img)
+    img.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+
+    fmt = fmt.upper()
+    if fmt == "JPEG" or img.mode not in ("RGB", "RGBA"):
+        img = img.convert("RGBA" if fmt == "WEBP" and img.mode in ("LA", "P", "PA") else "RGB")
+
+    buf = io.BytesIO()
+    # exif/icc не передаём — в результат метаданные не попадают
+    img.save(buf, format=fmt, quality=quality, optimize=fmt == "JPEG")
+    out = buf.getvalue()
+
+    return PreparedImage(
+        data_url=f"data:image/{fmt.lower()};base64,{base64.b64encode(out).decode('ascii')}",
+        width=img.width,
+        height=img.height,
+        source_bytes=len(raw),
+        prepared_bytes=len(out),
+    )
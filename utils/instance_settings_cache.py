@@ -0,0 +1,75 @@
+import asyncio
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from green_api.green_api_client import GreenApiClient
+from settings import INSTANCE_SETTINGS_TTL
+from telegram.send_log import send_dev_telegram_log
+
+
+class InstanceSettingsCache:
+    """
+    Кэш настроек инстансов транспортов (Green API getSettings / Wappi get/status).
+    Прогревается при старте по BOTS_CFG, обновляется по событию смены состояния или по TTL.
+    Устаревшее значение отдаётся сразу, а обновление идёт в фоне, поэтому на горячем пути
+    в сеть ходим только при самом первом обращении к инстансу.
+    """
+
+    def __init__(self, ttl: float = INSTANCE_SETTINGS_TTL):
+        self.ttl = ttl
+        self._data: Dict[Tuple[str, str], Tuple[float, Dict[str, Any]]] = {}
+        self._refreshing: Dict[Tuple[str, str], asyncio.Task] = {}
+
+    @staticmethod
+    def _key(cfg) -> Tuple[str, str]:
+        return cfg.kind, str(cfg.instance_id)
+
+    @staticmethod
+    async def _fetch(cfg) -> Dict[str, Any]:
+        if cfg.kind == "wa":
+            return await GreenApiClient.for_config(cfg).get_settings()
+        if cfg.kind == "tg":
+            async with cfg.get_wappi_client() as tg_client:
+                return await tg_client.get_instance_settings()
+        raise ValueError(f"Unsupported kind: {cfg.kind}")
+
+    def refresh(self, cfg) -> asyncio.Task:
+        """Запускает (или возвращает уже идущее) обновление настроек инстанса"""
+        key = self._key(cfg)
+        task = self._refreshing.get(key)
+        if task is None or task.done():
+            task = self._refreshing[key] = asyncio.create_task(self._refresh(cfg, key))
+        return task
+
+    async def _refresh(self, cfg, key: Tuple[str, str]) -> Optional[Dict[str, Any]]:
+        try:
+            data = await self._fetch(cfg)
+        except Exception as e:
+            await send_dev_telegram_log(f'[InstanceSettingsCache]\nНе удалось получить настройки инстанса\nkind: {key[0]}\ninstance_id: {key[1]}\nerror: {e}', 'WARNING')
+            cached = self._data.get(key)
+            return cached[1] if cached else None
+        self._data[key] = (time.monotonic() + self.ttl, data)
+        return data
+
+    async def get(self, cfg) -> Optional[Dict[str, Any]]:
+        """Настройки инстанса; в сеть — только если их ещё нет в кэше"""
+        cached = self._data.get(self._key(cfg))
+        if cached is None:
+            return await self.refresh(cfg)
+        if cached[0] <= time.monotonic():
+            self.refresh(cfg)
+        return cached[1]
+
+    async def get_phone(self, cfg) -> Optional[str]:
+        data = await self.get(cfg) or {}
+        if cfg.kind == "wa":
+            return data.get('wid', '').split('@')[0] or None
+        return data.get('phone')
+
+    async def warm_up(self, bots_cfg) -> None:
+        """Заполняет кэш по всем транспортам из конфига агентов"""
+        transports = [t for agent in bots_cfg for t in agent.transports]
+        await asyncio.gather(*(self.refresh(t) for t in transports), return_exceptions=True)
+
+
+instance_settings_cache = InstanceSettingsCache()
@@ -0,0 +1,70 @@
+import io
+import math
+from typing import Any, Dict, List
+
+from pypdf import PdfReader, PdfWriter
+
+
+def select_pages(total: int, max_pages: int) -> List[int]:
+    """
+    Индексы страниц в пределах бюджета: начало документа (аннотация, введение),
+    конец (выводы) и равномерная выборка из середины. Порядок сохраняется.
+    """
+    max_pages = max(0, max_pages)
+    if total <= max_pages:
+        return list(range(total))
+    head = math.ceil(max_pages * 0.4)
+    # при совсем малом бюджете хвост не должен вылезать за max_pages
+    tail = min(max(1, max_pages // 5), max_pages - head)
+    middle = max_pages - head - tail
+    picked = set(range(head)) | set(range(total - tail, total))
+    if middle > 0:
+        span = total - head - tail
+        step = span / (middle + 1)
+        picked |= {head + int(step * (i + 1)) for i in range(middle)}
+    return sorted(picked)
+
+
+def prepare_pdf(raw: bytes, max_pages: int, max_chars: int, min_chars_per_page: int) -> Dict[str, Any]:
+    """
+    Готовит PDF к анализу в пределах бюджета страниц и символов.
+    Есть текстовый слой — mode="text" и текст выбранных страниц (каждой — поровну от max_chars).
+    Текста нет (сканы, макеты) — mode="pdf" и PDF только из выбранных страниц.
+    Выполняется в воркере DocumentConvertPool.
+    """
+    reader = PdfReader(io.BytesIO(raw))
+    if reader.is_encrypted and not reader.decrypt(""):
+        raise ValueError("PDF защищён паролем")
+
+    total = len(reader.pages)
+    pages = select_pages(total, max_pages)
+    result: Dict[str, Any] = {"pages_total": total, "pages": [i + 1 for i in pages]}
+
+    texts = []
+    for i in pages:
+        try:
+            texts.append((reader.pages[i].extract_text() or "").strip())
+        except Exception:
+            texts.append("")
+
+    if pages and sum(len(t) for t in texts) / len(pages) >= min_chars_per_page:
+        per_page = max_chars // len(pages)
+        parts = []
+        for i, text in zip(pages, texts):
+            if len(text) > per_page:
+                text = text[:per_page] + " […]"
+            parts.append(f"--- стр. {i + 1} ---\n{text}")
+        result.update(mode="text", text="\n\n".join(parts))
+        return result
+
+    if len(pages) == total:
+        result.update(mode="pdf", pdf=raw)
+        return result
+
+    writer = PdfWriter()
+    for i in pages:
+        writer.add_page(reader.pages[i])
+    buf = io.BytesIO()
+    writer.write(buf)
+    result.update(mode="pdf", pdf=buf.getvalue())
+    return result
@@ -0,0 +1,290 @@
+import io
+import posixpath
+import re
+import zipfile
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Iterator, Optional
+from xml.etree.ElementTree import iterparse, parse
+
+MAX_ROWS = 500
+MAX_COLS = 100
+
+_NS_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_NS_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_NS_PKG_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+_COMMENTS_REL_TYPE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/comments"
+_REF_RE = re.compile(r"([A-Z]+)(\d+)")
+
+# встроенные numFmtId дат/времени (ECMA-376, 18.8.30); 27–36 и 50–58 — локальные форматы дат
+_BUILTIN_DATE_FMTS = {14: "date", 15: "date", 16: "date", 17: "date", 22: "datetime",
+                      18: "time", 19: "time", 20: "time", 21: "time", 45: "time", 47: "time",
+                      **{i: "date" for i in (*range(27, 37), *range(50, 59))}}
+# в пользовательском формате не считаем литералы "…", [цвет]/[$-локаль] и экранированные символы
+_FMT_LITERALS_RE = re.compile(r'"[^"]*"|\[[^\]]*\]|\\.|_.|\*.')
+
+
+@dataclass
+class XlsxSheet:
+    """Содержимое одного листа: значения (первая строка — заголовок), формулы и комментарии"""
+    name: str
+    rows: list[list[str]] = field(default_factory=list)
+    formulas: list[tuple[str, str]] = field(default_factory=list)
+    comments: list[tuple[str, str]] = field(default_factory=list)
+    truncated: bool = False
+
+    def to_arrow(self):
+        """
+        Таблица значений листа как pyarrow.Table (все колонки строковые).
+        pyarrow — опциональная зависимость, импортируется только здесь.
+        """
+        import pyarrow as pa
+
+        if not self.rows:
+            return pa.table({})
+        header = self.rows[0]
+        names = [h or f"col_{i + 1}" for i, h in enumerate(header)]
+        columns = list(zip(*self.rows[1:])) if len(self.rows) > 1 else [() for _ in names]
+        return pa.table({n: pa.array(list(col), type=pa.string()) for n, col in zip(names, columns)})
+
+
+def _col_index(letters: str) -> int:
+    """'A' → 0, 'AB' → 27"""
+    idx = 0
+    for ch in letters:
+        idx = idx * 26 + (ord(ch) - 64)
+    return idx - 1
+
+
+def _text_of(elem) -> str:
+    """Склеивает все <t> внутри элемента (rich text в sharedStrings/comments/inlineStr)"""
+    return "".join(t.text or "" for t in elem.iter(f"{_NS_MAIN}t"))
+
+
+def _rels(zf: zipfile.ZipFile, part: str) -> dict[str, tuple[str, str]]:
+    """rId → (type, абсолютный путь внутри архива) для части part"""
+    rels_path = posixpath.join(posixpath.dirname(part), "_rels", posixpath.basename(part) + ".rels")
+    if rels_path not in zf.namelist():
+        return {}
+    base = posixpath.dirname(part)
+    out = {}
+    for rel in parse(zf.open(rels_path)).getroot().iter(f"{_NS_PKG_REL}Relationship"):
+        target = rel.get("Target", "")
+        path = target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join(base, target))
+        out[rel.get("Id")] = (rel.get("Type", ""), path)
+    return out
+
+
+def _shared_strings(zf: zipfile.ZipFile) -> list[str]:
+    if "xl/sharedStrings.xml" not in zf.namelist():
+        return []
+    out = []
+    for _, elem in iterparse(zf.open("xl/sharedStrings.xml")):
+        if elem.tag == f"{_NS_MAIN}si":
+            out.append(_text_of(elem))
+            elem.clear()
+    return out
+
+
+def _comments(zf: zipfile.ZipFile, sheet_part: str) -> dict[str, str]:
+    for rel_type, path in _rels(zf, sheet_part).values():
+        if rel_type == _COMMENTS_REL_TYPE and path in zf.namelist():
+            out = {}
+            for _, elem in iterparse(zf.open(path)):
+                if elem.tag == f"{_NS_MAIN}comment":
+                    out[elem.get("ref")] = _text_of(elem)
+                    elem.clear()
+            return out
+    return {}
+
+
+def _date_kind(format_code: str) -> Optional[str]:
+    """'date' | 'datetime' | 'time' для пользовательского формата числа, иначе None"""
+    code = _FMT_LITERALS_RE.sub("", format_code.split(";")[0]).lower()
+    has_date = "d" in code or "y" in code
+    has_time = "h" in code or "s" in code
+    if has_date:
+        return "datetime" if has_time else "date"
+    return "time" if has_time else None
+
+
+def _date_styles(zf: zipfile.ZipFile) -> list[Optional[str]]:
+    """Индекс стиля ячейки (атрибут s) → вид даты/времени или None"""
+    if "xl/styles.xml" not in zf.namelist():
+        return []
+    root = parse(zf.open("xl/styles.xml")).getroot()
+    custom = {}
+    num_fmts = root.find(f"{_NS_MAIN}numFmts")
+    if num_fmts is not None:
+        for nf in num_fmts.iter(f"{_NS_MAIN}numFmt"):
+            custom[int(nf.get("numFmtId", "0"))] = _date_kind(nf.get("formatCode", ""))
+    cell_xfs = root.find(f"{_NS_MAIN}cellXfs")
+    if cell_xfs is None:
+        return []
+    out = []
+    for xf in cell_xfs.iter(f"{_NS_MAIN}xf"):
+        fmt_id = int(xf.get("numFmtId", "0"))
+        out.append(custom[fmt_id] if fmt_id in custom else _BUILTIN_DATE_FMTS.get(fmt_id))
+    return out
+
+
+def _is_date1904(zf: zipfile.ZipFile) -> bool:
+    pr = parse(zf.open("xl/workbook.xml")).getroot().find(f"{_NS_MAIN}workbookPr")
+    return pr is not None and pr.get("date1904") in ("1", "true")
+
+
+def _excel_date(raw: str, kind: str, date1904: bool) -> str:
+    """Серийный номер Excel → ISO-дата/время, как отдавал pandas"""
+    try:
+        serial = float(raw)
+    except ValueError:
+        return raw
+    base = datetime(1904, 1, 1) if date1904 else datetime(1899, 12, 30)
+    dt = base + timedelta(seconds=round(serial * 86400))
+    if kind == "time" and serial < 1:
+        return dt.time().isoformat()
+    if kind == "date" and dt.time() == datetime.min.time():
+        return dt.date().isoformat()
+    return dt.isoformat(sep=" ")
+
+
+def _cell_value(elem, cell_type: Optional[str], shared: list[str],
+                date_styles: list[Optional[str]] = (), date1904: bool = False) -> str:
+    if cell_type == "inlineStr":
+        return _text_of(elem)
+    v = elem.find(f"{_NS_MAIN}v")
+    raw = v.text if v is not None and v.text is not None else ""
+    if cell_type == "s" and raw:
+        i = int(raw)
+        return shared[i] if i < len(shared) else ""
+    if cell_type == "b":
+        return "TRUE" if raw == "1" else "FALSE" if raw else ""
+    if raw and cell_type in (None, "n"):
+        style = int(elem.get("s", "0"))
+        kind = date_styles[style] if style < len(date_styles) else None
+        if kind:
+            return _excel_date(raw, kind, date1904)
+    return raw
+
+
+def _shared_formula(masters: dict[str, tuple[str, str]], si: Optional[str], ref: str) -> Optional[str]:
+    """Формула зависимой ячейки общей формулы: формула главной ячейки со сдвигом ссылок"""
+    master = masters.get(si)
+    if master is None or not ref:
+        return None
+    formula, origin = master
+    if origin == ref:
+        return formula
+    from openpyxl.formula.translate import Translator
+    try:
+        return Translator(formula, origin=origin).translate_formula(ref)
+    except Exception:
+        return None
+
+
+def _read_sheet(zf: zipfile.ZipFile, name: str, part: str, shared: list[str],
+                max_rows: int, max_cols: int, include_formulas: bool, include_comments: bool,
+                date_styles: list[Optional[str]] = (), date1904: bool = False) -> XlsxSheet:
+    """
+    Строки и столбцы стоят на своих местах (по <row r> и адресу ячейки): пустые строки и
+    ячейки сохраняются, max_rows — номер последней читаемой строки листа.
+    """
+    sheet = XlsxSheet(name=name)
+    comments = _comments(zf, part) if include_comments else {}
+    # si → (формула главной ячейки, её адрес) для общих формул
+    masters: dict[str, tuple[str, str]] = {}
+    row: list[str] = []
+    row_num = 0
+
+    for event, elem in iterparse(zf.open(part), events=("start", "end")):
+        tag = elem.tag
+        if event == "start":
+            if tag == f"{_NS_MAIN}row":
+                r = elem.get("r")
+                row_num = int(r) if r and r.isdigit() else row_num + 1
+                if row_num > max_rows:
+                    sheet.truncated = True
+                    break
+                # пропущенные (пустые) строки
+                while len(sheet.rows) < row_num - 1:
+                    sheet.rows.append([])
+                row = []
+            continue
+
+        if tag == f"{_NS_MAIN}c":
+            ref = elem.get("r") or ""
+            m = _REF_RE.match(ref)
+            col = _col_index(m.group(1)) if m else len(row)
+            if col < max_cols:
+                if col > len(row):
+                    row.extend([""] * (col - len(row)))
+                value = _cell_value(elem, elem.get("t"), shared, date_styles, date1904)
+                if col == len(row):
+                    row.append(value)
+                else:
+                    row[col] = value
+            else:
+                sheet.truncated = True
+            if include_formulas:
+                f = elem.find(f"{_NS_MAIN}f")
+                if f is not None:
+                    formula = f.text
+                    if f.get("t") == "shared":
+                        if formula:
+                            masters[f.get("si")] = (f"={formula}", ref)
+                        formula = _shared_formula(masters, f.get("si"), ref)
+                    elif formula:
+                        formula = f"={formula}"
+                    if formula:
+                        sheet.formulas.append((ref, formula))
+            elem.clear()
+        elif tag == f"{_NS_MAIN}row":
+            sheet.rows.append(row)
+            row = []
+            elem.clear()
+
+    # хвостовые пустые строки (строки только с оформлением) не выводим
+    while sheet.rows and not any(sheet.rows[-1]):
+        sheet.rows.pop()
+
+    # комментарии только для попавших в выборку строк
+    for ref, text in comments.items():
+        m = _REF_RE.match(ref)
+        if m and int(m.group(2)) <= max_rows and _col_index(m.group(1)) < max_cols:
+            sheet.comments.append((ref, text))
+
+    width = max((len(r) for r in sheet.rows), default=0)
+    for r in sheet.rows:
+        if len(r) < width:
+            r.extend([""] * (width - len(r)))
+    return sheet
+
+
+def iter_xlsx_sheets(
+    xlsx_bytes: bytes,
+    max_rows: int = MAX_ROWS,
+    max_cols: int = MAX_COLS,
+    include_formulas: bool = True,
+    include_comments: bool = True,
+) -> Iterator[XlsxSheet]:
+    """
+    Потоково читает xlsx за один проход по XML каждого листа: значение, формула и адрес ячейки
+    берутся из одного элемента <c>, комментарии — из связанной части commentsN.xml.
+    Даты (по numFmt стиля ячейки) отдаются в ISO, зависимые ячейки общих формул — со сдвинутыми ссылками.
+    Память ограничена max_rows × max_cols на лист, разобранные элементы XML сразу освобождаются.
+    """
+    with zipfile.ZipFile(io.BytesIO(xlsx_bytes)) as zf:
+        shared = _shared_strings(zf)
+        date_styles = _date_styles(zf)
+        date1904 = _is_date1904(zf)
+        workbook_rels = _rels(zf, "xl/workbook.xml")
+        root = parse(zf.open("xl/workbook.xml")).getroot()
+        for s in root.iter(f"{_NS_MAIN}sheet"):
+            rel = workbook_rels.get(s.get(f"{_NS_REL}id"))
+            if not rel or rel[1] not in zf.namelist():
+                continue
+            yield _read_sheet(
+                zf, s.get("name", ""), rel[1], shared,
+                max_rows, max_cols, include_formulas, include_comments,
+                date_styles, date1904,
+            )
@@ -1,87 +1,108 @@
 import re
-import io
-import pandas as pd
-from openpyxl import load_workbook
+from html import escape
+
+from utils.xlsx_reader import iter_xlsx_sheets
 
-# TODO упростить
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10 МБ, можно поменять под свои нужды
 MAX_ROWS = 500
 
+_CONTROL_CHARS = re.compile(r"[\x00-\x08\x0B\x0C\x0E-\x1F]")
+
+
+def _check_size(xlsx_bytes: bytes) -> None:
+    if len(xlsx_bytes) > MAX_FILE_SIZE:
+        raise ValueError(f"Файл слишком большой (> {MAX_FILE_SIZE} байт)")
+
+
 def xlsx_to_html(xlsx_bytes: bytes, include_formulas=True, include_comments=True) -> str:
     """
-    Форматирует xlsx в html
+    Форматирует xlsx в html: таблица по каждому листу (до MAX_ROWS строк), формулы и комментарии
     """
-    if len(xlsx_bytes) > MAX_FILE_SIZE:
-        raise ValueError(f"Файл слишком большой (> {MAX_FILE_SIZE} байт)")
+    _check_size(xlsx_bytes)
 
     parts: list[str] = []
+    formula_items: list[str] = []
+    comment_items: list[str] = []
+    for sheet in iter_xlsx_sheets(xlsx_bytes, max_rows=MAX_ROWS + 1,
+                                  include_formulas=include_formulas, include_comments=include_comments):
+        parts.append(f"<h2>{escape(sheet.name)}</h2>")
+        if sheet.rows:
+            parts.append("<table border='1'>")
+            parts.append("<tr>" + "".join(f"<th>{escape(v)}</th>" for v in sheet.rows[0]) + "</tr>")
+            for row in sheet.rows[1:]:
+                parts.append("<tr>" + "".join(f"<td>{escape(v)}</td>" for v in row) + "</tr>")
+            parts.append("</table>")
+        for ref, formula in sheet.formulas:
+            formula_items.append(
+                f"<tr><td>{escape(sheet.name)}</td><td>{ref}</td><td><code>{escape(formula)}</code></td></tr>"
+            )
+        for ref, text in sheet.comments:
+            comment_items.append(
+                f"<tr><td>{escape(sheet.name)}</td><td>{ref}</td><td>{escape(text).replace(chr(10), '<br>')}</td></tr>"
+            )
 
-    xls = pd.ExcelFile(io.BytesIO(xlsx_bytes), engine="openpyxl")
-
-    if not xls.sheet_names:
+    if not parts:
         return "<p>Файл не содержит листов</p>"
 
-    first_sheet = xls.sheet_names[0]
-
-    df = xls.parse(sheet_name=first_sheet, dtype=str, nrows=MAX_ROWS)
-    df = df.fillna("")
-
-    parts.append(f"<h2>{first_sheet}</h2>")
-    parts.append(df.to_html(index=False, border=1, escape=True))
-
-    if include_formulas or include_comments:
-        wb = load_workbook(io.BytesIO(xlsx_bytes), data_only=False, read_only=True)
-        ws = wb.worksheets[0]  # только первый лист
-
-        if include_formulas:
-            formula_items = []
-            try:
-                for row in ws.iter_rows(max_row=MAX_ROWS):
-                    for c in row:
-                        val = c.value
-                        # формула — строка, начинающаяся с '='
-                        if isinstance(val, str) and val.startswith("="):
-                            formula_items.append(
-                                f"<tr><td>{ws.title}</td>"
-                                f"<td>{c.coordinate}</td>"
-                                f"<td><code>{val}</code></td></tr>"
-                            )
-            except Exception:
-                pass
-
-            if formula_items:
-                parts.append("<h3>Формулы</h3>")
-                parts.append(
-                    "<table border='1'>"
-                    "<tr><th>Лист</th><th>Адрес</th><th>Формула</th></tr>"
-                )
-                parts.extend(formula_items)
-                parts.append("</table>")
-
-        if include_comments:
-            comment_items = []
-            try:
-                for row in ws.iter_rows(max_row=MAX_ROWS):
-                    for c in row:
-                        comment = c.comment
-                        if comment:
-                            txt = (comment.text or "").replace("\n", "<br>")
-                            comment_items.append(
-                                f"<tr><td>{ws.title}</td>"
-                                f"<td>{c.coordinate}</td>"
-                                f"<td>{txt}</td></tr>"
-                            )
-            except Exception:
-                pass
-
-            if comment_items:
-                parts.append("<h3>Комментарии</h3>")
-                parts.append(
-                    "<table border='1'>"
-                    "<tr><th>Лист</th><th>Адрес</th><th>Комментарий</th></tr>"
-                )
-                parts.extend(comment_items)
-                parts.append("</table>")
-
-    html = "\n".join(parts)
-    return re.sub(r"[\x00-\x08\x0B\x0C\x0E-\x1F]", "", html)
+    if formula_items:
+        parts.append("<h3>Формулы</h3>")
+        parts.append("<table border='1'><tr><th>Лист</th><th>Адрес</th><th>Формула</th></tr>")
+        parts.extend(formula_items)
+        parts.append("</table>")
+
+    if comment_items:
+        parts.append("<h3>Комментарии</h3>")
+        parts.append("<table border='1'><tr><th>Лист</th><th>Адрес</th><th>Комментарий</th></tr>")
+        parts.extend(comment_items)
+        parts.append("</table>")
+
+    return _CONTROL_CHARS.sub("", "\n".join(parts))
+
+
+def _md_cell(value) -> str:
+    """Экранирует значение ячейки для markdown-таблицы"""
+    return str(value).replace("|", "\\|").replace("\r", " ").replace("\n", "<br>").strip()
+
+
+def xlsx_to_markdown(xlsx_bytes: bytes, include_formulas=True, include_comments=True) -> str:
+    """
+    Форматирует xlsx в markdown: по таблице на каждый лист (до MAX_ROWS строк),
+    плюс формулы и комментарии. Для отправки в LLM как input_text.
+    """
+    _check_size(xlsx_bytes)
+
+    parts: list[str] = []
+    formulas: list[str] = []
+    comments: list[str] = []
+    for sheet in iter_xlsx_sheets(xlsx_bytes, max_rows=MAX_ROWS + 1,
+                                  include_formulas=include_formulas, include_comments=include_comments):
+        parts.append(f"## {sheet.name}")
+        if not sheet.rows:
+            parts.append("(пустой лист)")
+            parts.append("")
+            continue
+        header = [_md_cell(c) for c in sheet.rows[0]]
+        parts.append("| " + " | ".join(header) + " |")
+        parts.append("|" + "---|" * len(header))
+        for row in sheet.rows[1:]:
+            parts.append("| " + " | ".join(_md_cell(v) for v in row) + " |")
+        if sheet.truncated:
+            parts.append(f"(показаны первые {MAX_ROWS} строк)")
+        parts.append("")
+        formulas.extend(f"| {_md_cell(sheet.name)} | {ref} | `{_md_cell(f)}` |" for ref, f in sheet.formulas)
+        comments.extend(f"| {_md_cell(sheet.name)} | {ref} | {_md_cell(t)} |" for ref, t in sheet.comments)
+
+    if not parts:
+        return "Файл не содержит листов"
+
+    if formulas:
+        parts.append("### Формулы")
+        parts.append("| Лист | Адрес | Формула |\n|---|---|---|")
+        parts.extend(formulas)
+        parts.append("")
+    if comments:
+        parts.append("### Комментарии")
+        parts.append("| Лист | Адрес | Комментарий |\n|---|---|---|")
+        parts.extend(comments)
+
+    return _CONTROL_CHARS.sub("", "\n".join(parts))
@@ -1,6 +1,4 @@
-import tempfile
 import traceback
-from pathlib import Path
 
 import aiohttp
 from aiohttp import web
@@ -12,9 +10,9 @@ from openai_agents.functions.analyze_image import analyze_image
 from bx24.bx_utils.parse_call_info import _extract_transcription_text
 from openai_agents.transcribation_client import TranscribeClient
 from telegram.send_log import send_dev_telegram_log
-from utils.download_to_temp_file import download_to_temp
-from utils.ffmpeg_convert_to_wav import convert_to_wav_via_imageio_ffmpeg
+from utils.ffmpeg_stream_audio import fetch_audio_for_stt
 from utils.normalize_phone import normalize_phone
+from wappi.task_registry import wappi_task_registry
 from wappi.wappi_client import WappiClient
 
 
@@ -31,6 +29,11 @@ async def inbound_wappi(request, agent_code, inbox_id):
             return web.Response(text="SKIP", status=200)
 
         message_data = messages[0]
+        if message_data.get("wh_type") == 'delivery_status':
+            # завершаем ожидание доставки файла (WappiClient.wait_task_done)
+            for status_data in messages:
+                wappi_task_registry.resolve_from_webhook(status_data)
+            return web.Response(text="OK", status=200)
         if not message_data.get("wh_type") == 'incoming_message':
             return web.Response(text="OK", status=200)
 
@@ -49,14 +52,12 @@ async def inbound_wappi(request, agent_code, inbox_id):
         elif message_data.get('type') == 'ptt':
             async with aiohttp.ClientSession() as session:
                 download_url = message_data.get('file_link')
-                tmp_path = await download_to_temp(session, download_url, 'somefile.mp3')
-                wav_path = Path(tempfile.gettempdir()) / (Path('somefile').stem + ".wav")
-                await convert_to_wav_via_imageio_ffmpeg(tmp_path, str(wav_path))
-                transcript = await TranscribeClient().transcribe(wav_path)
-                audio_text = _extract_transcription_text(transcript)
-                if audio_text and audio_text.strip():
-                    header = "🎤 Голосовое сообщение"
-                    message_text = f"{header}:\nСсылка на файл c аудио: {download_url}\n\n[Транскрибация]:\n{audio_text.strip()}"
+                audio_name, audio = await fetch_audio_for_stt(session, download_url, message_data.get('file_name') or 'voice')
+            transcript = await TranscribeClient().transcribe_bytes(audio, audio_name)
+            audio_text = _extract_transcription_text(transcript)
+            if audio_text and audio_text.strip():
+                header = "🎤 Голосовое сообщение"
+                message_text = f"{header}:\nСсылка на файл c аудио: {download_url}\n\n[Транскрибация]:\n{audio_text.strip()}"
         elif message_data.get('type') == 'document':
             download_url = message_data.get('file_link')
             document_summary = await analyze_document(download_url)
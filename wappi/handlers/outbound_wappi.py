@@ -2,7 +2,8 @@ import traceback
 
 from aiohttp import web
 
-from settings import INBOX_TO_TRANSPORT
+from outbound.dispatcher import enqueue_outbound, priority_from_webhook
+from settings import INBOX_TO_TRANSPORT, OUTBOUND_QUEUE_ENABLED
 from telegram.send_log import send_dev_telegram_log
 from wappi.wappi_client import WappiClient
 
@@ -23,6 +24,11 @@ async def outbound_wappi(request, agent_code, inbox_id):
         if not phone:
             return web.json_response({"status": "not phone"})
 
+        if OUTBOUND_QUEUE_ENABLED:
+            # отправку делает диспетчер инстанса с учётом очереди чата и лимитов
+            await enqueue_outbound(request.app["db_sessionmaker"], "tg", inbox_id, phone, message, priority_from_webhook(data))
+            return web.json_response({"status": "queued"})
+
         async with WappiClient(wappi_token, wappi_instance_id) as tg_client:
             await tg_client.send_split_message(phone, message)
 
@@ -0,0 +1,117 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from telegram.send_log import send_dev_telegram_log
+
+DELIVERED_STATUSES = ('delivered', 'read')
+
+
+class WappiTaskRegistry:
+    """
+    Ожидание доставки асинхронных задач Wappi (отправка файлов).
+    Задачу завершает вебхук delivery_status по task_id; на случай потерянного вебхука
+    один общий фоновый обход раз в SWEEP_INTERVAL секунд опрашивает /task/get по всем ожидающим задачам.
+    """
+    SWEEP_INTERVAL = 30.0
+    SWEEP_CONCURRENCY = 5
+    # вебхук может прийти раньше, чем отправитель начал ждать задачу — такие результаты храним недолго
+    EARLY_TTL = 600.0
+    EARLY_MAX_ITEMS = 1000
+
+    def __init__(self, sweep_interval: float = SWEEP_INTERVAL):
+        self.sweep_interval = sweep_interval
+        # task_id -> (future, (token, profile_id))
+        self._pending: Dict[str, Tuple[asyncio.Future, Tuple[str, str]]] = {}
+        self._sweeper: Optional[asyncio.Task] = None
+        self._early: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+    @staticmethod
+    def is_delivered(payload: Dict[str, Any]) -> bool:
+        response = (payload.get('task') or {}).get('response') or {}
+        return response.get('delivery_status') in DELIVERED_STATUSES
+
+    async def wait(self, task_id: str, token: str, profile_id: str, timeout_sec: float) -> Dict[str, Any]:
+        """
+        Ждёт доставку задачи. Возвращает payload вебхука или /task/get, по таймауту — WappiError.
+        """
+        from wappi.wappi_client import WappiError
+
+        early = self._early.pop(task_id, None)
+        if early is not None and time.monotonic() - early[0] < self.EARLY_TTL:
+            return early[1]
+
+        entry = self._pending.get(task_id)
+        if entry is None:
+            entry = self._pending[task_id] = (asyncio.get_running_loop().create_future(), (token, profile_id))
+        self._ensure_sweeper()
+        try:
+            return await asyncio.wait_for(asyncio.shield(entry[0]), timeout=timeout_sec)
+        except asyncio.TimeoutError:
+            await send_dev_telegram_log(f'[WappiTaskRegistry]\nНедождались доставки файла в ТГ(WAPPI)\ntime: {timeout_sec}\n task_id: {task_id}', 'ERROR')
+            raise WappiError(f"Timeout waiting task {task_id}.")
+        finally:
+            if self._pending.get(task_id) is entry:
+                del self._pending[task_id]
+
+    def resolve(self, task_id: str, payload: Dict[str, Any]) -> bool:
+        entry = self._pending.get(task_id)
+        if entry is None:
+            self._early[task_id] = (time.monotonic(), payload)
+            while len(self._early) > self.EARLY_MAX_ITEMS:
+                self._early.popitem(last=False)
+            return False
+        if entry[0].done():
+            return False
+        entry[0].set_result(payload)
+        return True
+
+    def resolve_from_webhook(self, message_data: Dict[str, Any]) -> bool:
+        """
+        Обрабатывает вебхук delivery_status. Возвращает True, если он завершил ожидающую задачу.
+        """
+        task_id = message_data.get('task_id')
+        if not task_id or message_data.get('status') not in DELIVERED_STATUSES:
+            return False
+        return self.resolve(str(task_id), message_data)
+
+    def _ensure_sweeper(self) -> None:
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.get_running_loop().create_task(self._sweep_loop())
+
+    async def _sweep_loop(self) -> None:
+        while self._pending:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self._sweep()
+            except Exception as e:
+                await send_dev_telegram_log(f'[WappiTaskRegistry]\nОшибка фоновой проверки задач\nerror: {e}', 'ERROR')
+
+    async def _sweep(self) -> None:
+        """Один проход по всем ожидающим задачам: одна сессия на профиль, ограниченная параллельность"""
+        from wappi.wappi_client import WappiClient
+
+        by_profile: Dict[Tuple[str, str], list[str]] = {}
+        for task_id, (fut, creds) in list(self._pending.items()):
+            if not fut.done():
+                by_profile.setdefault(creds, []).append(task_id)
+
+        sem = asyncio.Semaphore(self.SWEEP_CONCURRENCY)
+
+        async def _check(client: WappiClient, task_id: str) -> None:
+            async with sem:
+                try:
+                    payload = await client.get_task(task_id)
+                except Exception as e:
+                    await send_dev_telegram_log(f'[WappiTaskRegistry]\nНе удалось получить задачу {task_id}\nerror: {e}', 'WARNING')
+                    return
+                if isinstance(payload, dict) and self.is_delivered(payload):
+                    self.resolve(task_id, payload)
+
+        for (token, profile_id), task_ids in by_profile.items():
+            async with WappiClient(token, profile_id) as client:
+                await asyncio.gather(*(_check(client, task_id) for task_id in task_ids))
+
+
+wappi_task_registry = WappiTaskRegistry()
@@ -1,7 +1,8 @@
 import asyncio
 import base64
 import time
-from typing import Any, Dict, List, Optional, Tuple, Union
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 import re
 from urllib.parse import urlparse, quote, unquote
 
@@ -10,12 +11,23 @@ import aiohttp
 from telegram.send_log import send_dev_telegram_log
 from utils.normalize_phone import normalize_phone
 from utils.split_message_by_links import split_message_by_links, FILE_LINK_REGEX
+from wappi.task_registry import wappi_task_registry
 
 
 class WappiError(Exception):
     """Исключение клиента Wappi."""
 
 
+@dataclass
+class WappiSendResult:
+    """Результат отправки одного фрагмента сообщения"""
+    kind: str  # 'text' | 'file'
+    content: str
+    ok: bool
+    task_id: Optional[str] = None
+    error: Optional[str] = None
+
+
 class WappiClient:
     """
     Клиент для работы с Wappi Telegram API.
@@ -299,19 +311,35 @@ class WappiClient:
             )
             raise WappiError(e)
 
-    async def send_split_message(self, phone: str, message: str):
-        """
-        Разбивает сообщение по ссылкам и отправляет частями
+    async def send_split_message(
+            self,
+            phone: str,
+            message: str,
+            on_accepted: Optional[Callable[[], None]] = None,
+            limiter=None,
+    ) -> List[WappiSendResult]:
+        """
+        Разбивает сообщение по ссылкам и отправляет частями.
+        Файл уходит асинхронной задачей Wappi: следующий фрагмент ждёт её доставки, чтобы сохранить порядок.
+        on_accepted вызывается, когда ушёл последний фрагмент — дальше остаётся только ждать доставку последнего файла.
+        limiter (token bucket инстанса) — токен на каждый запрос отправки фрагмента.
+        Ошибка фрагмента не прерывает отправку остальных — она попадает в результат.
         """
         message = message or ""
         recipient = normalize_phone(phone).lstrip("+")
+        results: List[WappiSendResult] = []
+
+        parts = [p.lstrip(".,!? \t;:-").strip() for p in split_message_by_links(message)]
+        parts = [txt for txt in parts if len(txt) >= 2]
+        # доставку последнего файла ждём уже после on_accepted
+        last_file: Optional[WappiSendResult] = None
 
-        for part in split_message_by_links(message):
-            txt = part.lstrip(".,!? \t;:-").strip()
-            if len(txt) < 2:
-                continue
+        for i, txt in enumerate(parts):
+            if limiter is not None:
+                await limiter.acquire()
 
             if re.match(FILE_LINK_REGEX, txt, re.IGNORECASE):
+                result = WappiSendResult(kind='file', content=txt, ok=False)
                 try:
                     file_name = self.extract_file_name(txt) if txt.endswith(".pdf") else None
                     resp = await self.send_media_by_url(
@@ -326,22 +354,46 @@ class WappiClient:
                     task_id = self._extract_task_id(resp)
                     if not task_id:
                         raise WappiError(f"No task_id in async send response: {resp}")
+                    result.task_id = task_id
 
-                    await self.wait_task_done(task_id, interval_sec=5.0)
+                    if i == len(parts) - 1:
+                        last_file = result
+                    else:
+                        await self.wait_task_done(task_id, interval_sec=5.0)
+                        result.ok = True
 
                 except Exception as e:
+                    result.error = str(e)
                     await send_dev_telegram_log(
                         f'[WappiClient.send_split_message]\nОшибка при отправке файла: {txt}\nerror: {e}',
                         'ERROR'
                     )
             else:
+                result = WappiSendResult(kind='text', content=txt, ok=False)
                 try:
                     await self.send_message(recipient, txt)
+                    result.ok = True
                 except Exception as e:
+                    result.error = str(e)
                     await send_dev_telegram_log(
                         f'[WappiClient.send_split_message]\nОшибка при отправке текста: {txt}\nerror: {e}',
                         'ERROR'
                     )
+            results.append(result)
+
+        if on_accepted is not None:
+            on_accepted()
+        if last_file is not None:
+            try:
+                await self.wait_task_done(last_file.task_id, interval_sec=5.0)
+                last_file.ok = True
+            except Exception as e:
+                last_file.error = str(e)
+                await send_dev_telegram_log(
+                    f'[WappiClient.send_split_message]\nОшибка при отправке файла: {last_file.content}\nerror: {e}',
+                    'ERROR'
+                )
+        return results
 
     @staticmethod
     def extract_file_name(u: str) -> str:
@@ -499,25 +551,12 @@ class WappiClient:
             timeout_sec: float = 600.0,
     ) -> Dict[str, Any]:
         """
-        Раз в interval_sec опрашивает /tapi/task/get до статуса из success_statuses или ошибки/таймаута.
+        Ждёт доставки задачи: завершение приходит вебхуком delivery_status (см. WappiTaskRegistry),
+        при потере вебхука задачу подхватит общий фоновый опрос /tapi/task/get.
+        interval_sec оставлен для совместимости и не используется.
         Возвращает финальный payload задачи (для логирования/аналитики).
         """
         started = time.monotonic()
-        await send_dev_telegram_log(f'[wait_task_done]\nНачали ожидание доставки файла в ТГ(WAPPI)', 'DEV')
-
-        while True:
-            payload = await self.get_task(task_id)
-
-            response = payload.get('task', {}).get('response')
-
-            if response:
-                delivery_status = response.get('delivery_status')
-                if delivery_status in ['delivered', 'read']:
-                    await send_dev_telegram_log(f'[wait_task_done]\nЗакончили ожидание доставки файла в ТГ(WAPPI)\ntime: {time.monotonic() - started}', 'DEV')
-                    return payload
-
-            if time.monotonic() - started >= timeout_sec:
-                await send_dev_telegram_log(f'[wait_task_done]\nНедождались доставки файла в ТГ(WAPPI)\ntime: {time.monotonic() - started}\n task_id: {task_id}', 'ERROR')
-                raise WappiError(f"Timeout waiting task {task_id}.")
-            await send_dev_telegram_log(f'[wait_task_done]\nОжидаем доставку файла в ТГ(WAPPI)\ntime: {time.monotonic() - started}\n task_id: {task_id}','DEV')
-            await asyncio.sleep(interval_sec)
+        payload = await wappi_task_registry.wait(task_id, self.token, self.profile_id, timeout_sec)
+        await send_dev_telegram_log(f'[wait_task_done]\nЗакончили ожидание доставки файла в ТГ(WAPPI)\ntime: {time.monotonic() - started}', 'DEV')
+        return payload